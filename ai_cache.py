@@ -0,0 +1,194 @@
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+class AIResponseCache:
+    """AI响应缓存：进程内LRU + 可选SQLite磁盘层，按内容哈希寻址"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: int = 86400,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 10000
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+
+        # key -> (过期时间, 值)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        # 磁盘层的连接单独加锁，磁盘读写期间不阻塞内存层
+        self._disk_lock = threading.Lock()
+        # 磁盘命中后待写回的访问时间：key -> accessed_at
+        self._touched: Dict[str, float] = {}
+
+        # 命中统计
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_path:
+            self._init_disk()
+
+    def _init_disk(self):
+        """初始化SQLite磁盘缓存"""
+        self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+        self._disk.execute("PRAGMA journal_mode=WAL")
+        self._disk.execute(
+            "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._disk.execute(
+            "CREATE INDEX IF NOT EXISTS ix_ai_response_cache_accessed_at "
+            "ON ai_response_cache (accessed_at)"
+        )
+        self._disk.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+        """根据模型、提示词和温度计算缓存键"""
+        raw = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，依次查询内存层和磁盘层（磁盘读取在线程池中执行，不阻塞事件循环）"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        if self._disk is not None:
+            row = await asyncio.to_thread(self._read_disk, key, now)
+            if row is not None:
+                value = json.loads(row[0])
+                with self._lock:
+                    # 回填内存层
+                    self._set_memory(key, value, row[1])
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _read_disk(self, key: str, now: float) -> Optional[tuple]:
+        """查询磁盘层；命中时只记录访问时间，下次写入时批量更新，读取路径不提交事务"""
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT value, expires_at FROM ai_response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                self._touched[key] = now
+            return row
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """写入缓存（磁盘写入在线程池中执行）"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._set_memory(key, value, expires_at)
+
+        if self._disk is not None:
+            await asyncio.to_thread(
+                self._write_disk, key, json.dumps(value, ensure_ascii=False), expires_at, now
+            )
+
+    def _write_disk(self, key: str, value: str, expires_at: float, now: float):
+        """写入磁盘层：同一事务中写入条目、更新累计的访问时间并清理过期条目"""
+        with self._disk_lock:
+            touched, self._touched = self._touched, {}
+            if touched:
+                self._disk.executemany(
+                    "UPDATE ai_response_cache SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, touched_key) for touched_key, accessed_at in touched.items()]
+                )
+            self._disk.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._evict_disk(now)
+            self._disk.commit()
+
+    def _set_memory(self, key: str, value: Dict[str, Any], expires_at: float):
+        """写入内存层，超出容量时淘汰最久未使用的条目"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self, now: float):
+        """清理磁盘层的过期条目，并按访问时间裁剪到容量上限"""
+        cursor = self._disk.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (now,))
+        evicted = max(cursor.rowcount, 0)
+        count = self._disk.execute("SELECT COUNT(*) FROM ai_response_cache").fetchone()[0]
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            cursor = self._disk.execute(
+                "DELETE FROM ai_response_cache WHERE key IN ("
+                "SELECT key FROM ai_response_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            evicted += max(cursor.rowcount, 0)
+        with self._lock:
+            self.evictions += evicted
+
+    def clear(self):
+        """清空所有缓存"""
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._touched.clear()
+                self._disk.execute("DELETE FROM ai_response_cache")
+                self._disk.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": self._disk is not None,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / total * 100, 1) if total > 0 else 0
+            }
+
+# 创建全局缓存实例
+ai_response_cache = AIResponseCache(
+    max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=int(os.getenv("AI_CACHE_TTL", "86400")),
+    disk_path=os.getenv("AI_CACHE_DB_PATH") or None,
+    disk_max_entries=int(os.getenv("AI_CACHE_DISK_MAX_ENTRIES", "10000"))
+)
@@ -0,0 +1,289 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+# 当前请求的截止时间（time.monotonic() 时间点），由 RequestDeadlineMiddleware 设置
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# 客户端通过该请求头传入本次请求允许的最长耗时（秒）
+DEADLINE_HEADER = b"x-request-timeout"
+
+def remaining_time() -> Optional[float]:
+    """当前请求剩余的可用时间（秒），没有截止时间时返回None"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+class RequestDeadlineMiddleware:
+    """ASGI中间件：根据 X-Request-Timeout 请求头或默认值设置请求截止时间，供上游调用使用"""
+
+    def __init__(self, app, default_timeout: Optional[float] = None):
+        self.app = app
+        self.default_timeout = default_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self.default_timeout
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    timeout = float(value.decode("latin-1"))
+                except ValueError:
+                    pass
+                break
+
+        if not timeout or timeout <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        token = request_deadline.set(time.monotonic() + timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class UpstreamError(Exception):
+    """上游返回了非成功状态码"""
+
+    # 可重试的上游状态码
+    RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code in self.RETRYABLE_STATUS
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被快速拒绝"""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"{key} 熔断中")
+        self.key = key
+        self.retry_after = retry_after
+
+class DeadlineExceededError(Exception):
+    """请求截止时间已到，不再发起或重试上游调用"""
+
+class CircuitBreaker:
+    """单个上游（模型）的熔断器：连续失败达到阈值后打开，冷却后放行一个探测请求"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self._probing = False
+
+    def before_call(self, key: str):
+        """调用前检查；打开状态或已有探测请求进行中时抛出 CircuitOpenError"""
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                raise CircuitOpenError(key, self.reset_timeout - elapsed)
+            self.state = self.HALF_OPEN
+            self._probing = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                raise CircuitOpenError(key, self.reset_timeout)
+            self._probing = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """调用既不算成功也不算失败（如请求参数错误）时释放探测名额"""
+        self._probing = False
+
+class UpstreamResilience:
+    """上游调用的弹性层：带抖动的指数退避重试（遵循 Retry-After）、按模型熔断、请求截止时间"""
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        attempt_timeout: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # 单次尝试的最长耗时
+        self.attempt_timeout = attempt_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+        # 调用统计
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.deadline_exceeded = 0
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self._breakers[key] = breaker
+        return breaker
+
+    def circuit_state(self, key: str) -> str:
+        """熔断器状态，尚未调用过的路径视为关闭"""
+        breaker = self._breakers.get(key)
+        return breaker.state if breaker else CircuitBreaker.CLOSED
+
+    def is_open(self, key: str) -> bool:
+        """熔断器是否打开且仍在冷却期内（冷却结束后允许探测，不算打开）"""
+        breaker = self._breakers.get(key)
+        if breaker is None or breaker.state != CircuitBreaker.OPEN:
+            return False
+        return time.monotonic() - breaker.opened_at < breaker.reset_timeout
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待时间：全抖动指数退避，上游给出 Retry-After 时不早于该时间"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def call(self, key: str, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        """执行上游调用
+
+        attempt_fn 执行一次请求，失败时抛出 UpstreamError / httpx.TransportError / asyncio.TimeoutError。
+        熔断打开时抛出 CircuitOpenError，截止时间不足时抛出 DeadlineExceededError，
+        重试用尽后抛出最后一次的异常。
+        """
+        self.calls += 1
+        breaker = self._breaker(key)
+        attempt = 0
+        while True:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                self.deadline_exceeded += 1
+                raise DeadlineExceededError("请求截止时间已到")
+
+            try:
+                breaker.before_call(key)
+            except CircuitOpenError:
+                self.short_circuited += 1
+                raise
+
+            timeout = self.attempt_timeout if remaining is None else min(self.attempt_timeout, remaining)
+            self.attempts += 1
+            try:
+                result = await asyncio.wait_for(attempt_fn(), timeout)
+            except UpstreamError as e:
+                if not e.retryable:
+                    breaker.release()
+                    raise
+                error, retry_after = e, e.retry_after
+            except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+                self.timeouts += 1
+                error, retry_after = e, None
+            except httpx.TransportError as e:
+                error, retry_after = e, None
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.record_success()
+                return result
+
+            self.failures += 1
+            breaker.record_failure()
+            if attempt >= self.max_retries or breaker.state == CircuitBreaker.OPEN:
+                raise error
+
+            delay = self.backoff_delay(attempt, retry_after)
+            # 上游要求等待过久或截止时间内来不及重试时直接返回错误
+            if delay > self.max_delay and retry_after is not None:
+                raise error
+            remaining = remaining_time()
+            if remaining is not None and delay >= remaining:
+                raise error
+
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取重试与熔断统计"""
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "deadline_exceeded": self.deadline_exceeded,
+            "open_circuits": sum(1 for b in self._breakers.values() if b.state == CircuitBreaker.OPEN),
+            "circuits": {
+                key: {
+                    "state": breaker.state,
+                    "consecutive_failures": breaker.consecutive_failures,
+                    "opened_count": breaker.opened_count
+                }
+                for key, breaker in self._breakers.items()
+            }
+        }
+
+# 创建全局弹性层实例
+upstream_resilience = UpstreamResilience(
+    max_retries=int(os.getenv("AI_MAX_RETRIES", "2")),
+    base_delay=float(os.getenv("AI_RETRY_BASE_DELAY", "0.5")),
+    max_delay=float(os.getenv("AI_RETRY_MAX_DELAY", "8")),
+    attempt_timeout=float(os.getenv("AI_REQUEST_TIMEOUT", "30")),
+    failure_threshold=int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("AI_CIRCUIT_RESET_TIMEOUT", "30"))
+)
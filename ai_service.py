@@ -1,32 +1,230 @@
 import os
-import requests
+import httpx
 import json
-from typing import List, Dict, Any, Optional
-from enum import Enum
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Awaitable, Tuple
+from urllib.parse import urlsplit
 from fastapi import HTTPException
 import asyncio
+import math
+import time
 from datetime import datetime, timedelta
 
-class AIModel(str, Enum):
-    GPT_5 = "gpt-5"
-    GPT_4O = "gpt-4o"
-    GPT_4O_MINI = "gpt-4o-mini"
-    GPT_4_TURBO = "gpt-4-turbo"
+from ai_cache import ai_response_cache
+from ai_resilience import (
+    upstream_resilience, parse_retry_after, request_deadline, remaining_time,
+    UpstreamError, CircuitOpenError, DeadlineExceededError
+)
+from model_router import AIModel, Route, model_router
+from ai_usage import usage_recorder
 
 class AIService:
     def __init__(self):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
         self.default_model = os.getenv("DEFAULT_MODEL", AIModel.GPT_5)
         
+        # HTTP连接池配置
+        self.request_timeout = float(os.getenv("AI_REQUEST_TIMEOUT", "30"))
+        self.max_connections = int(os.getenv("AI_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        self.max_concurrency_per_host = int(os.getenv("AI_MAX_CONCURRENCY_PER_HOST", "50"))
+        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        # 进行中的非流式请求（请求键 -> 上游调用任务），用于合并相同的并发请求
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 请求键 -> 仍在等待该调用的请求数
+        self._flight_waiters: Dict[str, int] = {}
+        self.coalesced_requests = 0
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取共享的异步HTTP客户端（懒加载，复用长连接）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.request_timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=30.0
+                )
+            )
+        return self._client
+    
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取目标主机的并发限制信号量"""
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    async def close(self):
+        """关闭HTTP客户端，释放连接池"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._host_semaphores.clear()
+        
+    def _to_http_exception(self, error: Exception, model: str) -> HTTPException:
+        """将上游调用失败转换为对应的HTTP错误"""
+        if isinstance(error, UpstreamError):
+            headers = None
+            if error.retry_after is not None:
+                headers = {"Retry-After": str(math.ceil(error.retry_after))}
+            return HTTPException(status_code=error.status_code, detail=error.detail, headers=headers)
+        if isinstance(error, CircuitOpenError):
+            return HTTPException(
+                status_code=503,
+                detail=f"AI服务暂时不可用（{model} 熔断中），请稍后重试",
+                headers={"Retry-After": str(math.ceil(error.retry_after))}
+            )
+        if isinstance(error, (DeadlineExceededError, asyncio.TimeoutError, httpx.TimeoutException)):
+            return HTTPException(status_code=504, detail="AI服务响应超时")
+        return HTTPException(status_code=502, detail=f"网络请求失败: {str(error)}")
+    
+    async def _post_chat_completion(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """发起一次非流式请求，非200响应抛出 UpstreamError"""
+        async with self._get_host_semaphore(url):
+            response = await self._get_client().post(url, headers=headers, json=payload)
+        
+        if response.status_code != 200:
+            raise UpstreamError(
+                response.status_code,
+                f"OpenAI API错误: {response.text}",
+                parse_retry_after(response.headers.get("retry-after"))
+            )
+        return response.json()
+    
+    async def _open_stream(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> httpx.Response:
+        """发起一次流式请求并等待响应头，非200响应抛出 UpstreamError
+
+        成功时占用目标主机的一个并发名额，调用方关闭响应后需释放。
+        """
+        semaphore = self._get_host_semaphore(url)
+        await semaphore.acquire()
+        try:
+            client = self._get_client()
+            response = await client.send(client.build_request("POST", url, headers=headers, json=payload), stream=True)
+            if response.status_code != 200:
+                body = await response.aread()
+                await response.aclose()
+                raise UpstreamError(
+                    response.status_code,
+                    f"OpenAI API错误: {body.decode('utf-8', errors='replace')}",
+                    parse_retry_after(response.headers.get("retry-after"))
+                )
+        except BaseException:
+            semaphore.release()
+            raise
+        return response
+    
+    def _can_fall_back(self, error: Exception) -> bool:
+        """换用其他路径可能成功的错误：上游故障、鉴权或模型不存在、熔断、超时、网络错误"""
+        if isinstance(error, UpstreamError):
+            return error.retryable or error.status_code >= 500 or error.status_code in (401, 403, 404)
+        return isinstance(error, (CircuitOpenError, asyncio.TimeoutError, httpx.HTTPError))
+    
+    async def _call_routed(self, model: str, attempt_fn: Callable[[Route], Awaitable[Any]]) -> Tuple[Route, Any]:
+        """按路由计划依次尝试候选路径（每条路径带重试与熔断），返回 (实际使用的路径, 结果)"""
+        plan = model_router.plan(model)
+        if not plan:
+            raise HTTPException(status_code=400, detail=f"模型 {model} 没有可用的提供方")
+        
+        primary = model_router.routes_for(model_router.resolve(model))[:1]
+        last_error = None
+        for route in plan:
+            try:
+                result = await upstream_resilience.call(
+                    route.key, lambda: model_router.observe(route, lambda: attempt_fn(route))
+                )
+            except (UpstreamError, CircuitOpenError, asyncio.TimeoutError, httpx.HTTPError) as e:
+                last_error = e
+                if not self._can_fall_back(e):
+                    break
+                continue
+            if route not in primary:
+                model_router.fallbacks_used += 1
+            return route, result
+        raise self._to_http_exception(last_error, model)
+        
+    async def _single_flight(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        """合并相同的并发请求：同一键同时只发起一次上游调用，所有等待者共享其结果或异常
+
+        共享调用不继承发起者的请求截止时间，每个等待者按各自的截止时间等待；
+        返回 (结果, 是否复用了其他请求发起的调用)。
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(self._without_deadline(call))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_flight(key, t))
+        else:
+            self.coalesced_requests += 1
+        
+        self._flight_waiters[key] = self._flight_waiters.get(key, 0) + 1
+        try:
+            # 某个等待者被取消（如客户端断开）或超时不影响共享的上游调用
+            remaining = remaining_time()
+            if remaining is None:
+                result = await asyncio.shield(task)
+            else:
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(task), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    if not task.done():
+                        upstream_resilience.deadline_exceeded += 1
+                        raise HTTPException(status_code=504, detail="AI服务响应超时")
+                    result = task.result()
+        finally:
+            self._leave_flight(key, task)
+        return dict(result), shared
+    
+    @staticmethod
+    async def _without_deadline(call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """在不带请求截止时间的上下文中执行共享调用（任务持有独立的上下文副本，不影响发起者）"""
+        request_deadline.set(None)
+        return await call()
+    
+    def _leave_flight(self, key: str, task: asyncio.Task):
+        """等待者离开；所有等待者都已离开时取消尚未完成的上游调用"""
+        if self._inflight.get(key) is not task:
+            return
+        waiters = self._flight_waiters.get(key, 0) - 1
+        if waiters > 0:
+            self._flight_waiters[key] = waiters
+            return
+        self._flight_waiters.pop(key, None)
+        if not task.done():
+            # 立即移出进行中列表，新的相同请求不会加入已取消的调用
+            del self._inflight[key]
+            task.cancel()
+    
+    def _finish_flight(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._flight_waiters.pop(key, None)
+        # 所有等待者都已取消时也取走异常，避免未处理异常的警告
+        if not task.cancelled():
+            task.exception()
+    
+    def _record_usage(self, operation: str, model: str, usage: Dict[str, Any], started: float, cached: bool = False):
+        """记录一次调用的用量事件（只放入内存缓冲区）；缓存命中不消耗上游token"""
+        usage_recorder.record(
+            model, operation,
+            prompt_tokens=0 if cached else int(usage.get("prompt_tokens") or 0),
+            completion_tokens=0 if cached else int(usage.get("completion_tokens") or 0),
+            latency_ms=(time.perf_counter() - started) * 1000,
+            cached=cached
+        )
+    
+    def single_flight_stats(self) -> Dict[str, Any]:
+        """获取请求合并统计"""
+        return {"inflight": len(self._inflight), "coalesced": self.coalesced_requests}
+        
     def get_available_models(self) -> List[Dict[str, str]]:
         """获取可用的AI模型列表"""
-        return [
-            {"id": AIModel.GPT_5, "name": "GPT-5", "provider": "OpenAI", "color": "bg-green-500"},
-            {"id": AIModel.GPT_4O, "name": "GPT-4o", "provider": "OpenAI", "color": "bg-green-600"},
-            {"id": AIModel.GPT_4O_MINI, "name": "GPT-4o Mini", "provider": "OpenAI", "color": "bg-green-400"},
-            {"id": AIModel.GPT_4_TURBO, "name": "GPT-4 Turbo", "provider": "OpenAI", "color": "bg-green-700"},
-        ]
+        return model_router.available_models()
     
     async def chat_completion(
         self, 
@@ -34,57 +232,172 @@ class AIService:
         model: str = None,
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        stream: bool = False
+        stream: bool = False,
+        operation: str = "chat"
     ) -> Dict[str, Any]:
-        """AI对话完成"""
+        """AI对话完成，operation 为用量统计中的操作类型"""
         if not model:
             model = self.default_model
-            
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.openai_api_key}",
-                "Content-Type": "application/json"
+        
+        if stream:
+            # 流式请求：聚合增量内容后返回完整结果
+            content_parts = []
+            usage = {}
+            provider = None
+            async for event in self.stream_chat_completion(messages, model, temperature, max_tokens, operation):
+                if "delta" in event:
+                    content_parts.append(event["delta"])
+                elif "usage" in event:
+                    usage = event["usage"]
+                elif "model" in event:
+                    model, provider = event["model"], event["provider"]
+            return {
+                "content": "".join(content_parts),
+                "model": model,
+                "provider": provider,
+                "usage": usage,
+                "timestamp": datetime.now().isoformat()
             }
-            
+        
+        # 模型、消息和参数都相同的并发请求共享同一次上游调用
+        started = time.perf_counter()
+        key = f"{ai_response_cache.make_key(model, messages, temperature)}:{max_tokens}"
+        result, shared = await self._single_flight(
+            key, lambda: self._chat_completion_once(messages, model, temperature, max_tokens)
+        )
+        self._record_usage(operation, result["model"], result["usage"], started, cached=shared)
+        return result
+    
+    async def _chat_completion_once(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """发起一次非流式上游调用"""
+        try:
             payload = {
-                "model": model,
                 "messages": messages,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
-                "stream": stream
+                "stream": False
             }
             
-            response = requests.post(
-                f"{self.openai_base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"OpenAI API错误: {response.text}"
-                )
-            
-            result = response.json()
+            # 按路由计划选择提供方；每条路径失败时按退避策略重试，主路径慢或不可用时回退到等价模型
+            route, result = await self._call_routed(model, lambda route: self._post_chat_completion(
+                route.provider.url, route.provider.headers(), {**payload, "model": route.upstream_model}
+            ))
             
             if "choices" not in result or not result["choices"]:
                 raise HTTPException(status_code=500, detail="AI响应格式错误")
             
             return {
                 "content": result["choices"][0]["message"]["content"],
-                "model": model,
+                "model": route.model,
+                "provider": route.provider.name,
                 "usage": result.get("usage", {}),
                 "timestamp": datetime.now().isoformat()
             }
             
-        except requests.exceptions.RequestException as e:
-            raise HTTPException(status_code=500, detail=f"网络请求失败: {str(e)}")
+        except HTTPException:
+            raise
+        except (UpstreamError, CircuitOpenError, DeadlineExceededError, asyncio.TimeoutError, httpx.HTTPError) as e:
+            raise self._to_http_exception(e, model)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"AI服务调用失败: {str(e)}")
 
-    async def improve_text(self, text: str, model: str = None) -> Dict[str, Any]:
+    async def cached_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        operation: str = "chat"
+    ) -> Dict[str, Any]:
+        """带响应缓存的AI对话完成，用于输入相同即结果可复用的文本操作"""
+        if not model:
+            model = self.default_model
+        
+        key = ai_response_cache.make_key(model, messages, temperature)
+        if use_cache:
+            started = time.perf_counter()
+            cached = await ai_response_cache.get(key)
+            if cached is not None:
+                self._record_usage(operation, cached.get("model", model), {}, started, cached=True)
+                return {**cached, "cached": True}
+        
+        # 未命中或跳过缓存时请求上游，并刷新缓存；回退到备用模型的结果不写入缓存，
+        # 否则主模型恢复后仍会在缓存有效期内以请求的模型名返回备用模型的结果
+        result = await self.chat_completion(messages, model, temperature=temperature, operation=operation)
+        if result["model"] == model_router.resolve(getattr(model, "value", model)):
+            await ai_response_cache.set(key, result)
+        return result
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        operation: str = "chat"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式AI对话完成
+
+        先产出 {"model": 实际使用的模型, "provider": 提供方}，然后逐个产出 {"delta": 文本} 增量，
+        最后产出 {"usage": 用量}。
+        """
+        if not model:
+            model = self.default_model
+        
+        payload = {
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        
+        started = time.perf_counter()
+        usage = {}
+        try:
+            # 只在收到响应头之前重试或回退，已开始输出的流不重试
+            route, response = await self._call_routed(model, lambda route: self._open_stream(
+                route.provider.url, route.provider.headers(), {**payload, "model": route.upstream_model}
+            ))
+            try:
+                yield {"model": route.model, "provider": route.provider.name}
+                
+                # 解析SSE数据行
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = json.loads(data)
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            yield {"delta": delta}
+                    if chunk.get("usage"):
+                        usage = chunk["usage"]
+                        yield {"usage": usage}
+            finally:
+                await response.aclose()
+                self._get_host_semaphore(route.provider.url).release()
+                # 客户端中途断开时也记录已产生的用量
+                self._record_usage(operation, route.model, usage, started)
+                            
+        except HTTPException:
+            raise
+        except (UpstreamError, CircuitOpenError, DeadlineExceededError, asyncio.TimeoutError, httpx.HTTPError) as e:
+            raise self._to_http_exception(e, model)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=500, detail=f"AI响应格式错误: {str(e)}")
+
+    async def improve_text(self, text: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """改进文本"""
         messages = [
             {
@@ -96,9 +409,9 @@ class AIService:
                 "content": f"请改进以下文本：\n\n{text}"
             }
         ]
-        return await self.chat_completion(messages, model)
+        return await self.cached_chat_completion(messages, model, use_cache=use_cache, operation="improve")
 
-    async def summarize_text(self, text: str, model: str = None) -> Dict[str, Any]:
+    async def summarize_text(self, text: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """总结文本"""
         messages = [
             {
@@ -110,7 +423,7 @@ class AIService:
                 "content": f"请总结以下文本的主要内容：\n\n{text}"
             }
         ]
-        return await self.chat_completion(messages, model)
+        return await self.cached_chat_completion(messages, model, use_cache=use_cache, operation="summarize")
 
     async def expand_text(self, text: str, model: str = None) -> Dict[str, Any]:
         """扩展文本"""
@@ -124,9 +437,9 @@ class AIService:
                 "content": f"请扩展以下文本，添加更多细节和内容：\n\n{text}"
             }
         ]
-        return await self.chat_completion(messages, model)
+        return await self.chat_completion(messages, model, operation="expand")
 
-    async def translate_text(self, text: str, target_language: str = "en", model: str = None) -> Dict[str, Any]:
+    async def translate_text(self, text: str, target_language: str = "en", model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """翻译文本"""
         language_map = {
             "en": "英语",
@@ -150,9 +463,9 @@ class AIService:
                 "content": f"请将以下文本翻译成{target_lang_name}：\n\n{text}"
             }
         ]
-        return await self.chat_completion(messages, model)
+        return await self.cached_chat_completion(messages, model, use_cache=use_cache, operation="translate")
 
-    async def restructure_text(self, text: str, model: str = None) -> Dict[str, Any]:
+    async def restructure_text(self, text: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """重新组织文本结构"""
         messages = [
             {
@@ -164,9 +477,9 @@ class AIService:
                 "content": f"请重新组织以下文本的结构，使其更加清晰有序：\n\n{text}"
             }
         ]
-        return await self.chat_completion(messages, model)
+        return await self.cached_chat_completion(messages, model, use_cache=use_cache, operation="restructure")
 
-    async def generate_tags(self, title: str, content: str, model: str = None) -> Dict[str, Any]:
+    async def generate_tags(self, title: str, content: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """生成智能标签"""
         messages = [
             {
@@ -179,7 +492,7 @@ class AIService:
             }
         ]
         
-        result = await self.chat_completion(messages, model)
+        result = await self.cached_chat_completion(messages, model, use_cache=use_cache, operation="generate_tags")
         
         try:
             # 尝试解析JSON响应
@@ -198,7 +511,8 @@ class AIService:
         return {
             "tags": tags,
             "model": result["model"],
-            "confidence": 0.8
+            "confidence": 0.8,
+            "cached": result.get("cached", False)
         }
 
     async def categorize_note_advanced(
@@ -206,7 +520,8 @@ class AIService:
         title: str, 
         content: str, 
         available_categories: List[str],
-        model: str = None
+        model: str = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """高级笔记分类"""
         categories_str = "、".join(available_categories)
@@ -222,7 +537,7 @@ class AIService:
             }
         ]
         
-        result = await self.chat_completion(messages, model)
+        result = await self.cached_chat_completion(messages, model, use_cache=use_cache, operation="categorize")
         
         try:
             content = result["content"].strip()
@@ -251,7 +566,8 @@ class AIService:
             "folder": folder,
             "reasoning": reasoning,
             "confidence": 0.8,
-            "model": result["model"]
+            "model": result["model"],
+            "cached": result.get("cached", False)
         }
 
     async def parse_tasks_batch(self, text: str, model: str = None) -> Dict[str, Any]:
@@ -279,7 +595,7 @@ class AIService:
             }
         ]
         
-        result = await self.chat_completion(messages, model)
+        result = await self.chat_completion(messages, model, operation="parse_tasks")
         
         try:
             content = result["content"].strip()
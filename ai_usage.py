@@ -0,0 +1,182 @@
+import os
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from sqlalchemy import insert
+
+from database import AsyncSessionLocal
+from models import AIUsage
+
+# 当前请求的用量上下文，由 UsageContextMiddleware 为每个请求创建。
+# 认证依赖是在线程池中执行的同步函数，在其中 set 不会回到请求上下文，因此填写这个可变对象
+usage_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("usage_context", default=None)
+
+def set_usage_user(user_id: int):
+    """记录当前请求的用户，供AI用量归属"""
+    context = usage_context.get()
+    if context is not None:
+        context["user_id"] = user_id
+
+class UsageContextMiddleware:
+    """ASGI中间件：为每个HTTP请求创建用量上下文"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = usage_context.set({"user_id": None})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            usage_context.reset(token)
+
+class UsageRecorder:
+    """AI用量记录器：请求路径上只把事件放入内存缓冲区，由后台任务批量写入 ai_usage 表"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        flush_interval: float = 2.0,
+        batch_size: int = 500,
+        max_buffer: int = 50000,
+        max_retries: int = 3
+    ):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        # 缓冲区达到该数量时立即写入
+        self.batch_size = batch_size
+        # 数据库长时间不可写时缓冲区的上限，超出后丢弃最旧的事件
+        self.max_buffer = max_buffer
+        # 同一批事件连续写入失败的次数上限，超出后丢弃该批，避免无法写入的数据反复重试
+        self.max_retries = max_retries
+        self._failed_attempts = 0
+        self._buffer: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # 统计
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+
+    def record(
+        self,
+        model: str,
+        operation: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency_ms: float = 0.0,
+        cached: bool = False
+    ):
+        """记录一次AI调用；没有用户上下文（如后台脚本）时忽略"""
+        if not self.enabled:
+            return
+        context = usage_context.get()
+        if context is None or context.get("user_id") is None:
+            return
+
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append({
+            "user_id": context["user_id"],
+            "model": str(model)[:50],
+            "operation": operation,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_used": prompt_tokens + completion_tokens,
+            "latency_ms": int(latency_ms),
+            "cached": cached,
+            "created_at": datetime.utcnow()
+        })
+        self.recorded += 1
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        """通过异步会话写入一批事件，与请求路径的写入共用SQLite写锁"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(AIUsage), rows)
+            await db.commit()
+
+    async def flush(self):
+        """将缓冲区中的事件写入数据库；写入失败时放回缓冲区等待下次重试，连续失败 max_retries 次后丢弃该批"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._buffer:
+                rows = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    await self._write(rows)
+                except Exception as e:
+                    self.errors += 1
+                    self._failed_attempts += 1
+                    if self._failed_attempts >= self.max_retries:
+                        self._failed_attempts = 0
+                        self.dropped += len(rows)
+                        print(f"❌ AI用量写入失败，已丢弃 {len(rows)} 条: {e}")
+                    else:
+                        self._buffer.extendleft(reversed(rows))
+                        print(f"❌ AI用量写入失败: {e}")
+                    return
+                self._failed_attempts = 0
+                self.written += len(rows)
+                self.flushes += 1
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # 停止时取消的是等待，进行中的写入继续完成，stop() 中的 flush 在其后写入剩余事件
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        """启动后台批量写入任务"""
+        if self.enabled and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写入剩余事件"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取用量记录器统计"""
+        return {
+            "enabled": self.enabled,
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "errors": self.errors
+        }
+
+# 创建全局用量记录器实例
+usage_recorder = UsageRecorder(
+    enabled=os.getenv("AI_USAGE_TRACKING", "true").lower() == "true",
+    flush_interval=float(os.getenv("AI_USAGE_FLUSH_INTERVAL", "2")),
+    batch_size=int(os.getenv("AI_USAGE_BATCH_SIZE", "500")),
+    max_buffer=int(os.getenv("AI_USAGE_MAX_BUFFER", "50000")),
+    max_retries=int(os.getenv("AI_USAGE_MAX_RETRIES", "3"))
+)
@@ -0,0 +1,64 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import Base, engine, DATABASE_URL
+import models  # noqa: F401  注册所有模型到 Base.metadata
+
+config = context.config
+
+# 应用启动时在进程内执行迁移，由调用方传入连接，不覆盖应用的日志配置
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# SQLite不支持大部分 ALTER TABLE，使用批量模式重建表
+render_as_batch = DATABASE_URL.startswith("sqlite")
+
+# 笔记全文索引表由迁移 0008 直接创建（FTS5虚拟表及其影子表、tsvector表），不在模型中定义
+SEARCH_INDEX_TABLES = ("notes_fts", "notes_search")
+
+def include_object(object, name, type_, reflected, compare_to):
+    """自动生成迁移时忽略全文索引表"""
+    return not (type_ == "table" and reflected and compare_to is None and name.startswith(SEARCH_INDEX_TABLES))
+
+def run_migrations_offline() -> None:
+    """离线模式：只输出SQL脚本，不连接数据库"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=render_as_batch,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """在线模式：使用调用方传入的连接或应用的数据库引擎执行迁移"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
+    with engine.connect() as connection:
+        _run_with_connection(connection)
+
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=render_as_batch,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
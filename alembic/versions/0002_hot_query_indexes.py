@@ -0,0 +1,61 @@
+"""conversation summaries and hot query indexes
+
+各路由常用的 WHERE/ORDER BY 组合对应的复合索引。由 create_all 创建、已包含部分
+索引或表的数据库会跳过已存在的对象。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 03:40:12.517322
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 表名, 列)
+HOT_QUERY_INDEXES = [
+    ('ix_categories_user_id', 'categories', ['user_id']),
+    ('ix_folders_user_id_category', 'folders', ['user_id', 'category']),
+    ('ix_notes_user_id_updated_at', 'notes', ['user_id', 'updated_at']),
+    ('ix_notes_user_id_folder_id', 'notes', ['user_id', 'folder_id', 'updated_at']),
+    ('ix_tasks_user_id_status', 'tasks', ['user_id', 'status', 'category', 'priority', 'ai_generated']),
+    ('ix_tasks_user_id_created_at', 'tasks', ['user_id', 'created_at']),
+    ('ix_conversations_user_id_updated_at', 'conversations', ['user_id', 'updated_at']),
+    ('ix_messages_conversation_id_created_at', 'messages', ['conversation_id', 'created_at']),
+    ('ix_pomodoro_sessions_user_id_started_at', 'pomodoro_sessions', ['user_id', 'started_at']),
+    ('ix_pomodoro_sessions_task_id', 'pomodoro_sessions', ['task_id']),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('conversation_summaries'):
+        op.create_table('conversation_summaries',
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('conversation_id')
+        )
+
+    for name, table, columns in HOT_QUERY_INDEXES:
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(HOT_QUERY_INDEXES):
+        op.drop_index(name, table_name=table)
+
+    op.drop_table('conversation_summaries')
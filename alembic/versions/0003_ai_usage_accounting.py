@@ -0,0 +1,38 @@
+"""ai usage accounting columns
+
+AI用量明细增加分项token、延迟和缓存标记，并按 (user_id, created_at) 建索引供用量统计聚合。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('ai_usage') as batch_op:
+        batch_op.add_column(sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('completion_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('latency_ms', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('cached', sa.Boolean(), nullable=True))
+    op.create_index('ix_ai_usage_user_id_created_at', 'ai_usage', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_usage_user_id_created_at', table_name='ai_usage')
+    with op.batch_alter_table('ai_usage') as batch_op:
+        batch_op.drop_column('cached')
+        batch_op.drop_column('latency_ms')
+        batch_op.drop_column('completion_tokens')
+        batch_op.drop_column('prompt_tokens')
@@ -0,0 +1,132 @@
+"""normalized tags
+
+标签表和笔记/任务的标签关联表（倒排索引），并从 notes.tags、tasks.tags 的JSON字符串回填。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 13:26:08.318402
+
+"""
+import json
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 回填时每批读取的行数
+BACKFILL_BATCH_SIZE = 5000
+MAX_TAG_LENGTH = 50
+
+
+def _parse_tags(value):
+    """解析JSON标签列，规则与应用写入时一致（去空白、截断、去重）"""
+    try:
+        tags = json.loads(value) if value else []
+    except ValueError:
+        return []
+    if not isinstance(tags, list):
+        return []
+    names = [tag.strip()[:MAX_TAG_LENGTH] for tag in tags if isinstance(tag, str)]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _backfill(connection, source: str, link: str, entity_column: str):
+    """按主键分批读取 source 表的 tags 列，创建缺少的标签并写入关联表"""
+    source_table = sa.table(source, sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('tags', sa.Text))
+    tags_table = sa.table('tags', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                          sa.column('name', sa.String), sa.column('created_at', sa.DateTime))
+    link_table = sa.table(link, sa.column(entity_column, sa.Integer), sa.column('tag_id', sa.Integer))
+
+    tag_ids = {(user_id, name): tag_id for tag_id, user_id, name in connection.execute(
+        sa.select(tags_table.c.id, tags_table.c.user_id, tags_table.c.name)
+    )}
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(source_table.c.id, source_table.c.user_id, source_table.c.tags)
+            .where(source_table.c.id > last_id)
+            .order_by(source_table.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        parsed = [(entity_id, user_id, _parse_tags(value)) for entity_id, user_id, value in rows]
+        missing = list(dict.fromkeys(
+            (user_id, name) for _, user_id, names in parsed for name in names if (user_id, name) not in tag_ids
+        ))
+        if missing:
+            now = datetime.utcnow()
+            connection.execute(sa.insert(tags_table), [
+                {'user_id': user_id, 'name': name, 'created_at': now} for user_id, name in missing
+            ])
+            for user_id in {user_id for user_id, _ in missing}:
+                names = [name for missing_user_id, name in missing if missing_user_id == user_id]
+                for tag_id, name in connection.execute(
+                    sa.select(tags_table.c.id, tags_table.c.name)
+                    .where(tags_table.c.user_id == user_id, tags_table.c.name.in_(names))
+                ):
+                    tag_ids[(user_id, name)] = tag_id
+
+        links = [
+            {entity_column: entity_id, 'tag_id': tag_ids[(user_id, name)]}
+            for entity_id, user_id, names in parsed
+            for name in names
+        ]
+        if links:
+            connection.execute(sa.insert(link_table), links)
+
+
+def upgrade() -> None:
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_id_name')
+    )
+    op.create_index('ix_tags_id', 'tags', ['id'], unique=False)
+    op.create_table('note_tags',
+    sa.Column('note_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['note_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('note_id', 'tag_id')
+    )
+    op.create_index('ix_note_tags_tag_id', 'note_tags', ['tag_id', 'note_id'], unique=False)
+    op.create_table('task_tags',
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('task_id', 'tag_id')
+    )
+    op.create_index('ix_task_tags_tag_id', 'task_tags', ['tag_id', 'task_id'], unique=False)
+
+    connection = op.get_bind()
+    _backfill(connection, 'notes', 'note_tags', 'note_id')
+    _backfill(connection, 'tasks', 'task_tags', 'task_id')
+
+    # 更新SQLite的统计信息，否则按标签筛选时查询规划器会沿 updated_at 索引扫描全部笔记
+    if connection.dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_tags_tag_id', table_name='task_tags')
+    op.drop_table('task_tags')
+    op.drop_index('ix_note_tags_tag_id', table_name='note_tags')
+    op.drop_table('note_tags')
+    op.drop_index('ix_tags_id', table_name='tags')
+    op.drop_table('tags')
@@ -0,0 +1,28 @@
+"""task collection version index
+
+按 (user_id, updated_at) 建索引，任务列表的ETag只需扫描索引即可得到集合版本。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:02:44.190736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_id_updated_at', 'tasks', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_id_updated_at', table_name='tasks')
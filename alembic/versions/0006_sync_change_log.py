@@ -0,0 +1,108 @@
+"""sync change log
+
+增量同步的变更日志：笔记、任务、文件夹、分类和番茄钟记录的增删改由数据库触发器写入
+sync_changes（批量 UPDATE/DELETE 等不经过ORM事件的写入同样会被记录），删除记录即墓碑。
+已有数据各回填一条变更，使 since=0 的全量同步可以从日志得到全部数据。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:40:51.730218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (表名, 变更日志中的实体名)
+SYNC_TABLES = [
+    ('notes', 'note'),
+    ('tasks', 'task'),
+    ('folders', 'folder'),
+    ('categories', 'category'),
+    ('pomodoro_sessions', 'pomodoro_session'),
+]
+
+SQLITE_TRIGGER = """
+CREATE TRIGGER {table}_sync_{name} AFTER {event} ON {table}
+BEGIN
+    INSERT INTO sync_changes (user_id, entity, entity_id, deleted, changed_at)
+    VALUES ({row}.user_id, '{entity}', {row}.id, {deleted}, CURRENT_TIMESTAMP);
+END
+"""
+
+POSTGRESQL_FUNCTION = """
+CREATE OR REPLACE FUNCTION sync_log_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO sync_changes (user_id, entity, entity_id, deleted, changed_at)
+        VALUES (OLD.user_id, TG_ARGV[0], OLD.id, true, clock_timestamp() AT TIME ZONE 'utc');
+        RETURN OLD;
+    END IF;
+    INSERT INTO sync_changes (user_id, entity, entity_id, deleted, changed_at)
+    VALUES (NEW.user_id, TG_ARGV[0], NEW.id, false, clock_timestamp() AT TIME ZONE 'utc');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.create_table('sync_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_index('ix_sync_changes_user_id_id', 'sync_changes', ['user_id', 'id'], unique=False)
+    op.create_index('ix_sync_changes_entity_entity_id', 'sync_changes', ['entity', 'entity_id', 'id'], unique=False)
+
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    false = sa.false().compile(dialect=bind.dialect)
+    for table, entity in SYNC_TABLES:
+        op.execute(
+            f"INSERT INTO sync_changes (user_id, entity, entity_id, deleted, changed_at) "
+            f"SELECT user_id, '{entity}', id, {false}, CURRENT_TIMESTAMP FROM {table} ORDER BY id"
+        )
+
+    if dialect == 'sqlite':
+        for table, entity in SYNC_TABLES:
+            for event, row, deleted in (('INSERT', 'NEW', 0), ('UPDATE', 'NEW', 0), ('DELETE', 'OLD', 1)):
+                op.execute(SQLITE_TRIGGER.format(
+                    table=table, name=event.lower(), event=event, row=row, entity=entity, deleted=deleted
+                ))
+    elif dialect == 'postgresql':
+        op.execute(POSTGRESQL_FUNCTION)
+        for table, entity in SYNC_TABLES:
+            op.execute(
+                f"CREATE TRIGGER {table}_sync_log AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION sync_log_change('{entity}')"
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table, _ in SYNC_TABLES:
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_{event.lower()}")
+    elif dialect == 'postgresql':
+        for table, _ in SYNC_TABLES:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_log ON {table}")
+        op.execute("DROP FUNCTION IF EXISTS sync_log_change()")
+
+    op.drop_index('ix_sync_changes_entity_entity_id', table_name='sync_changes')
+    op.drop_index('ix_sync_changes_user_id_id', table_name='sync_changes')
+    op.drop_table('sync_changes')
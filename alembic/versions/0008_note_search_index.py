@@ -0,0 +1,97 @@
+"""note search index
+
+笔记全文索引表：SQLite为FTS5虚拟表 notes_fts，PostgreSQL为 notes_search（tsvector + GIN索引），
+并按当前分词规则（英文单词、中日韩二元组和单字）回填全部笔记。此前由应用启动时创建的索引表会被清空后重建。
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 10:12:41.205837
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 回填时每批读取的行数
+BACKFILL_BATCH_SIZE = 1000
+
+CJK_RANGES = "一-鿿㐀-䶿぀-ヿ가-힯"
+TOKEN_PATTERN = re.compile(f"[{CJK_RANGES}]+|[^\\W_{CJK_RANGES}]+")
+CJK_PATTERN = re.compile(f"^[{CJK_RANGES}]+$")
+
+
+def _segment_text(value):
+    """分词规则与应用写入索引时一致（search.segment_text）"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer((value or "").lower()):
+        word = match.group(0)
+        if CJK_PATTERN.match(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            tokens.extend(word)
+        else:
+            tokens.append(word)
+    return " ".join(tokens)
+
+
+def _backfill(connection, insert_sql):
+    """按主键分批读取笔记并写入索引"""
+    notes = sa.table('notes', sa.column('id', sa.Integer), sa.column('title', sa.String), sa.column('content', sa.Text))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(notes.c.id, notes.c.title, notes.c.content)
+            .where(notes.c.id > last_id)
+            .order_by(notes.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        connection.execute(insert_sql, [
+            {'note_id': note_id, 'title': _segment_text(title), 'content': _segment_text(content)}
+            for note_id, title, content in rows
+        ])
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        try:
+            op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, content, tokenize='unicode61')")
+        except sa.exc.OperationalError as e:
+            # SQLite未编译FTS5时不创建索引，应用退回LIKE查询
+            print(f"⚠️ 未创建笔记全文索引: {e}")
+            return
+        op.execute('DELETE FROM notes_fts')
+        _backfill(connection, sa.text(
+            'INSERT INTO notes_fts (rowid, title, content) VALUES (:note_id, :title, :content)'
+        ))
+    elif connection.dialect.name == 'postgresql':
+        op.execute(
+            'CREATE TABLE IF NOT EXISTS notes_search ('
+            'note_id INTEGER PRIMARY KEY REFERENCES notes(id) ON DELETE CASCADE, '
+            'document TSVECTOR NOT NULL)'
+        )
+        op.execute('CREATE INDEX IF NOT EXISTS ix_notes_search_document ON notes_search USING GIN (document)')
+        op.execute('DELETE FROM notes_search')
+        _backfill(connection, sa.text(
+            "INSERT INTO notes_search (note_id, document) VALUES (:note_id, "
+            "setweight(to_tsvector('simple', :title), 'A') || setweight(to_tsvector('simple', :content), 'B'))"
+        ))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS notes_fts')
+    elif connection.dialect.name == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS notes_search')
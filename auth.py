@@ -1,15 +1,14 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from auth_cache import user_cache, snapshot_user, attach_user, stateless_user, token_revoked
+from passwords import pwd_context
 
 # JWT配置
 SECRET_KEY = "cortex-ai-workspace-secret-key-2025"
@@ -30,16 +29,24 @@ def get_password_hash(password):
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """验证JWT令牌"""
+def token_claims(user: User) -> dict:
+    """生成令牌声明（含令牌版本）；无状态模式下同时携带用户id和状态"""
+    claims = {"sub": user.username, "ver": user.token_version or 0}
+    if user_cache.stateless_tokens:
+        claims.update({"uid": user.id, "active": bool(user.is_active), "su": bool(user.is_superuser)})
+    return claims
+
+def verify_token_payload(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """验证JWT令牌并返回载荷"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,21 +54,41 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     )
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise credentials_exception
-        return username
+        return payload
     except JWTError:
         raise credentials_exception
 
-def get_current_user(username: str = Depends(verify_token), db: Session = Depends(get_db)):
-    """获取当前用户"""
+def verify_token(payload: dict = Depends(verify_token_payload)):
+    """验证JWT令牌"""
+    return payload["sub"]
+
+def get_current_user(payload: dict = Depends(verify_token_payload), db: Session = Depends(get_db)):
+    """获取当前用户（优先使用令牌信息或用户缓存）"""
+    username = payload["sub"]
+    iat = payload.get("iat")
+    
+    user = stateless_user(db, payload)
+    if user is not None:
+        return user
+    
+    cached = user_cache.get(username, iat)
+    if cached is not None:
+        if token_revoked(payload, user_cache.token_version(db, cached["id"])):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        return attach_user(db, cached)
+    
+    loaded_at = time.time()
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
+    if token_revoked(payload, user.token_version):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    user_cache.set(username, iat, snapshot_user(user), loaded_at)
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models import User
+
+class AuthUserCache:
+    """已认证用户缓存：按 (用户名, 令牌签发时间) 缓存用户字段快照，用户变更提交后失效"""
+
+    def __init__(
+        self,
+        ttl_seconds: int = 60,
+        max_entries: int = 10000,
+        stateless_tokens: bool = False,
+        token_version_ttl: float = 5.0
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # 令牌携带用户id和状态，常规请求只需核对令牌版本
+        self.stateless_tokens = stateless_tokens
+        # 令牌版本的缓存时间：其他进程中的吊销最迟在该时间后生效
+        self.token_version_ttl = token_version_ttl
+
+        # (用户名, iat) -> (过期时间, 字段快照)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # 用户名 -> 最近一次失效时间
+        self._invalidated_at: Dict[str, float] = {}
+        # 用户id -> (过期时间, 令牌版本)
+        self._token_versions: Dict[int, tuple] = {}
+        # 用户id -> 最近一次失效时间
+        self._version_invalidated_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str, iat: Optional[int]) -> Optional[Dict[str, Any]]:
+        """读取缓存的用户字段快照"""
+        if self.ttl_seconds <= 0:
+            return None
+
+        key = (username, iat)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, values = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return values
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, username: str, iat: Optional[int], values: Dict[str, Any], loaded_at: float):
+        """写入缓存；数据读取后用户又发生变更时不写入，避免缓存旧数据"""
+        if self.ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            if self._invalidated_at.get(username, 0) >= loaded_at:
+                return
+            self._entries[(username, iat)] = (time.time() + self.ttl_seconds, values)
+            self._entries.move_to_end((username, iat))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str, user_id: Optional[int] = None):
+        """使该用户所有令牌对应的缓存失效"""
+        with self._lock:
+            self._invalidated_at[username] = time.time()
+            for key in [key for key in self._entries if key[0] == username]:
+                del self._entries[key]
+            if user_id is not None:
+                self._version_invalidated_at[user_id] = time.time()
+                self._token_versions.pop(user_id, None)
+
+    def token_version(self, db: Session, user_id: int) -> Optional[int]:
+        """获取用户当前的令牌版本（按主键查询，缓存 token_version_ttl 秒），用户不存在时返回None"""
+        with self._lock:
+            entry = self._token_versions.get(user_id)
+            if entry is not None and entry[0] > time.time():
+                return entry[1]
+
+        loaded_at = time.time()
+        version = db.execute(select(User.token_version).where(User.id == user_id)).scalar()
+        if version is None:
+            return None
+        with self._lock:
+            if self._version_invalidated_at.get(user_id, 0) < loaded_at:
+                self._token_versions[user_id] = (time.time() + self.token_version_ttl, version)
+                while len(self._token_versions) > self.max_entries:
+                    self._token_versions.pop(next(iter(self._token_versions)))
+        return version
+
+    def is_invalidated(self, username: str, iat: Optional[int]) -> bool:
+        """令牌签发后用户是否发生过变更（无状态令牌据此回退到数据库查询）"""
+        if iat is None:
+            return True
+        with self._lock:
+            return self._invalidated_at.get(username, 0) >= iat
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._invalidated_at.clear()
+            self._token_versions.clear()
+            self._version_invalidated_at.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stateless_tokens": self.stateless_tokens,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total > 0 else 0
+            }
+
+def snapshot_user(user: User) -> Dict[str, Any]:
+    """提取用户的列字段快照"""
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+def attach_user(db: Session, values: Dict[str, Any]) -> User:
+    """由字段快照构造用户对象并关联到当前会话，不执行查询
+
+    快照中缺少的字段在首次访问时才从数据库加载。
+    """
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def token_revoked(payload: Dict[str, Any], token_version: Optional[int]) -> bool:
+    """令牌签发后用户的令牌版本是否已提升（修改密码、停用、权限变更），未携带版本的旧令牌视为版本0"""
+    return payload.get("ver", 0) != (token_version or 0)
+
+def stateless_user(db: Session, payload: Dict[str, Any]) -> Optional[User]:
+    """无状态令牌：令牌版本与数据库一致时直接由令牌信息构造用户，否则返回None由调用方查询用户"""
+    if not user_cache.stateless_tokens or "uid" not in payload:
+        return None
+    username = payload["sub"]
+    if user_cache.is_invalidated(username, payload.get("iat")):
+        return None
+    if token_revoked(payload, user_cache.token_version(db, payload["uid"])):
+        return None
+    return attach_user(db, {
+        "id": payload["uid"],
+        "username": username,
+        "is_active": payload.get("active", True),
+        "is_superuser": payload.get("su", False),
+        "token_version": payload.get("ver", 0)
+    })
+
+def revoke_tokens(user: User):
+    """吊销用户已签发的全部令牌（提交后生效，所有进程共享数据库中的版本）"""
+    user.token_version = User.token_version + 1
+
+# 创建全局缓存实例
+user_cache = AuthUserCache(
+    ttl_seconds=int(os.getenv("AUTH_USER_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000")),
+    stateless_tokens=os.getenv("AUTH_STATELESS_TOKENS", "false").lower() == "true",
+    token_version_ttl=float(os.getenv("AUTH_TOKEN_VERSION_TTL", "5"))
+)
+
+# 用户资料、密码或状态变更时使缓存失效：刷新时记录受影响的用户，提交后再次失效，
+# 避免并发请求在提交前读到旧数据并写回缓存
+def _changed_users(session: Session) -> Set[tuple]:
+    users = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            history = inspect(obj).attrs.username.history
+            users.update((name, obj.id) for name in history.sum() if name)
+    return users
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session, flush_context):
+    users = _changed_users(session)
+    if users:
+        session.info.setdefault("invalidated_users", set()).update(users)
+        for username, user_id in users:
+            user_cache.invalidate(username, user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for username, user_id in session.info.pop("invalidated_users", ()):
+        user_cache.invalidate(username, user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidated_users(session):
+    session.info.pop("invalidated_users", None)
@@ -0,0 +1,164 @@
+import os
+import re
+import math
+from datetime import datetime
+from typing import List, Dict, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Message, ConversationSummary
+from search import CJK_RANGES
+from ai_service import ai_service
+
+CJK_CHAR_PATTERN = re.compile(f"[{CJK_RANGES}]")
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """估算文本的token数：中日韩字符约1.5个token，其余字符约4个字符1个token"""
+    if not text:
+        return 0
+    cjk_count = len(CJK_CHAR_PATTERN.findall(text))
+    return math.ceil(cjk_count * 1.5 + (len(text) - cjk_count) / 4)
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """估算单条对话消息占用的token数"""
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+class ConversationContextBuilder:
+    """对话上下文构建：在token预算内保留系统提示词和最近的消息，可选用滚动摘要替代较早消息"""
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        max_messages: int = 200,
+        summary_enabled: bool = False,
+        summary_max_tokens: int = 500,
+        summary_batch_messages: int = 50
+    ):
+        self.token_budget = token_budget
+        # 单次最多读取的消息条数，保证长对话下查询开销不随历史增长
+        self.max_messages = max_messages
+        self.summary_enabled = summary_enabled
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_batch_messages = summary_batch_messages
+        # 正在更新摘要的对话，避免重复生成
+        self._refreshing: Set[int] = set()
+
+    async def build(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        system_prompt: Optional[str] = None,
+        token_budget: Optional[int] = None
+    ) -> Tuple[List[Dict[str, str]], Optional[int]]:
+        """构建发送给模型的消息列表
+
+        返回 (消息列表, 需要更新摘要时摘要应覆盖到的消息id)；最新一条消息总会被保留。
+        """
+        budget = token_budget or self.token_budget
+        head = []
+        if system_prompt:
+            head.append({"role": "system", "content": system_prompt})
+
+        summary = None
+        if self.summary_enabled:
+            summary = await db.get(ConversationSummary, conversation_id)
+            if summary:
+                head.append({"role": "system", "content": f"以下是此前对话的摘要：\n{summary.content}"})
+
+        used = sum(message_tokens(message) for message in head)
+
+        rows = (await db.execute(select(Message.id, Message.role, Message.content).where(
+            Message.conversation_id == conversation_id
+        ).order_by(
+            Message.created_at.desc(), Message.id.desc()
+        ).limit(self.max_messages + 1))).all()
+
+        kept = []
+        newest_dropped_id = None
+        for index, row in enumerate(rows):
+            message = {"role": row.role, "content": row.content}
+            tokens = message_tokens(message)
+            if kept and (used + tokens > budget or index >= self.max_messages):
+                newest_dropped_id = row.id
+                break
+            kept.append(message)
+            used += tokens
+
+        kept.reverse()
+
+        # 有消息被截断且摘要尚未覆盖到这些消息时，需要更新摘要
+        refresh_upto = None
+        if self.summary_enabled and newest_dropped_id is not None:
+            if summary is None or summary.last_message_id < newest_dropped_id:
+                refresh_upto = newest_dropped_id
+
+        return head + kept, refresh_upto
+
+    async def refresh_summary(self, conversation_id: int, upto_message_id: int, model: Optional[str] = None):
+        """将摘要之后、upto_message_id之前的一批消息合并进滚动摘要（在后台任务中执行）"""
+        if conversation_id in self._refreshing:
+            return
+        self._refreshing.add(conversation_id)
+
+        db = AsyncSessionLocal()
+        try:
+            summary = await db.get(ConversationSummary, conversation_id)
+            last_message_id = summary.last_message_id if summary else 0
+            previous = summary.content if summary else ""
+
+            rows = (await db.execute(select(Message.id, Message.role, Message.content).where(
+                Message.conversation_id == conversation_id,
+                Message.id > last_message_id,
+                Message.id <= upto_message_id
+            ).order_by(Message.id).limit(self.summary_batch_messages))).all()
+            if not rows:
+                return
+            # 调用模型前释放数据库连接
+            await db.close()
+
+            transcript = "\n".join(f"{row.role}: {row.content}" for row in rows)
+            messages = [
+                {
+                    "role": "system",
+                    "content": "你是对话摘要助手。请将已有摘要与新的对话内容合并为一份简洁的摘要，保留关键事实、结论、用户偏好和未完成事项，直接输出摘要内容。"
+                },
+                {
+                    "role": "user",
+                    "content": f"已有摘要：\n{previous or '（无）'}\n\n新的对话：\n{transcript}"
+                }
+            ]
+            result = await ai_service.chat_completion(
+                messages, model, temperature=0.3, max_tokens=self.summary_max_tokens,
+                operation="summary"
+            )
+
+            summary = await db.get(ConversationSummary, conversation_id)
+            if summary is None:
+                summary = ConversationSummary(conversation_id=conversation_id)
+                db.add(summary)
+            elif summary.last_message_id >= rows[-1].id:
+                return
+            summary.content = result["content"]
+            summary.last_message_id = rows[-1].id
+            summary.updated_at = datetime.utcnow()
+            await db.commit()
+        except Exception as e:
+            # 摘要失败不影响对话，下次截断时重试
+            await db.rollback()
+            print(f"⚠️ 对话摘要更新失败: {e}")
+        finally:
+            await db.close()
+            self._refreshing.discard(conversation_id)
+
+# 创建全局上下文构建实例
+conversation_context = ConversationContextBuilder(
+    token_budget=int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "6000")),
+    max_messages=int(os.getenv("CHAT_CONTEXT_MAX_MESSAGES", "200")),
+    summary_enabled=os.getenv("CHAT_SUMMARY_ENABLED", "false").lower() == "true",
+    summary_max_tokens=int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "500")),
+    summary_batch_messages=int(os.getenv("CHAT_SUMMARY_BATCH_MESSAGES", "50"))
+)
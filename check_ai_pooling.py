@@ -0,0 +1,107 @@
+"""检查AI上游调用复用连接池、按主机限制并发，且等待上游期间事件循环保持响应
+
+在本地端口上启动模拟上游（fake_upstream.FakeUpstream.serve，带固定延迟），通过ASGI客户端调用 /api/ai/chat：
+先顺序调用，确认复用同一条keep-alive连接；再并发调用，确认上游同时处理的请求数不超过
+AI_MAX_CONCURRENCY_PER_HOST、总耗时接近按该并发数分批的耗时，并在此期间轮询 /health 记录最长响应时间。
+任一项不符合预期时以非零状态退出：
+
+    python check_ai_pooling.py
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+
+_tmpdir = tempfile.TemporaryDirectory()
+_upstream_socket = socket.socket()
+_upstream_socket.bind(("127.0.0.1", 0))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'pooling.db')}"
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{_upstream_socket.getsockname()[1]}/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+os.environ["AI_MAX_CONCURRENCY_PER_HOST"] = "10"
+
+from database import async_engine, run_migrations
+from ai_service import ai_service
+from fake_upstream import FakeUpstream
+from local_app import create_user, app_client
+
+UPSTREAM_DELAY = 0.2
+SEQUENTIAL_CALLS = 10
+CONCURRENT_CALLS = 50
+# /health 允许的最长响应时间
+MAX_HEALTH_MS = 200
+
+upstream = FakeUpstream(delay=UPSTREAM_DELAY)
+
+async def chat(client, headers: dict, text: str) -> int:
+    response = await client.post(
+        "/api/ai/chat", json={"messages": [{"role": "user", "content": text}], "model": "gpt-4o-mini"}, headers=headers
+    )
+    return response.status_code
+
+async def poll_health(client, latencies: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.02)
+
+async def main() -> int:
+    run_migrations()
+    _, headers = create_user("pooling-check")
+    server = await upstream.serve(_upstream_socket)
+    limit = ai_service.max_concurrency_per_host
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        # 1. 顺序调用：复用同一条连接
+        started = time.perf_counter()
+        statuses = [await chat(client, headers, f"顺序 {i}") for i in range(SEQUENTIAL_CALLS)]
+        elapsed = time.perf_counter() - started
+        check(
+            "连接复用",
+            statuses.count(200) == SEQUENTIAL_CALLS and upstream.connections == 1,
+            f"{SEQUENTIAL_CALLS} 次顺序调用 {statuses.count(200)} 次成功，用时 {elapsed:.2f}s，建立 {upstream.connections} 条连接"
+        )
+
+        # 2. 并发调用：按主机限制并发，事件循环保持响应
+        upstream.reset_stats()
+        latencies, stop = [], asyncio.Event()
+        poller = asyncio.create_task(poll_health(client, latencies, stop))
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*[chat(client, headers, f"并发 {i}") for i in range(CONCURRENT_CALLS)])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await poller
+        expected = -(-CONCURRENT_CALLS // limit) * UPSTREAM_DELAY
+        check(
+            "并发限制",
+            statuses.count(200) == CONCURRENT_CALLS and upstream.max_inflight == limit
+            and upstream.connections <= limit and elapsed < expected * 1.5,
+            f"{CONCURRENT_CALLS} 次并发调用 {statuses.count(200)} 次成功，用时 {elapsed:.2f}s（按 {limit} 并发分批约 {expected:.2f}s），"
+            f"上游同时处理最多 {upstream.max_inflight} 个，新建 {upstream.connections} 条连接"
+        )
+        check(
+            "事件循环",
+            latencies and max(latencies) < MAX_HEALTH_MS,
+            f"并发调用期间 /health 请求 {len(latencies)} 次，最长 {max(latencies):.1f}ms"
+        )
+
+    server.close()
+    await ai_service.close()
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ AI上游调用复用连接并限制并发")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,173 @@
+"""检查流式对话回复的保存：客户端中途断开时已生成的内容仍被保存，保存与其他写请求并发时不阻塞事件循环
+
+在临时SQLite数据库上，使用进程内的模拟上游（fake_upstream.FakeUpstream）分多个增量缓慢返回回复，
+直接以ASGI协议调用 main.app：一个请求在收到第一个增量后断开，另一批流式请求与新建笔记的请求并发执行。
+任一项不符合预期时以非零状态退出：
+
+    python check_chat_stream.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'stream.db')}"
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+import httpx
+from sqlalchemy import select, func
+
+from database import SessionLocal, async_engine, run_migrations
+from models import Message
+from ai_service import ai_service
+from fake_upstream import FakeUpstream
+from local_app import create_user, app_client, app
+
+CHUNKS = 5
+CHUNK_DELAY = 0.05
+CONCURRENT_STREAMS = 20
+# 流式请求进行期间持续新建笔记的并发数
+CONCURRENT_WRITERS = 5
+# 事件循环允许的最长停顿
+MAX_LOOP_STALL_MS = 200
+
+upstream = FakeUpstream(content="第一段第二段第三段第四段第五段", stream_chunks=CHUNKS, chunk_delay=CHUNK_DELAY)
+
+async def asgi_stream(path: str, payload: dict, headers: dict, disconnect_after: int = None) -> str:
+    """以ASGI协议发起请求并读取响应体；disconnect_after 不为空时在收到该数量的增量后模拟客户端断开"""
+    body = json.dumps(payload).encode("utf-8")
+    received = []
+    deltas = asyncio.Event()
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await deltas.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            received.append(message.get("body", b"").decode("utf-8"))
+            if disconnect_after is not None and "".join(received).count('"type": "delta"') >= disconnect_after:
+                deltas.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in {**headers, "content-type": "application/json"}.items()],
+        "client": ("127.0.0.1", 12345), "server": ("local-app", 80),
+    }
+    await app(scope, receive, send)
+    return "".join(received)
+
+def assistant_messages(conversation_id: int):
+    with SessionLocal() as db:
+        return db.scalars(select(Message.content).where(
+            Message.conversation_id == conversation_id, Message.role == "assistant"
+        )).all()
+
+async def watch_loop(stalls: list, stop: asyncio.Event):
+    """记录事件循环的最长停顿（毫秒）"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        stalls.append((time.perf_counter() - started) * 1000 - 5)
+
+async def main() -> int:
+    run_migrations()
+    _, headers = create_user("stream-check")
+    ai_service._client = httpx.AsyncClient(transport=upstream.transport())
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        conversation_ids = []
+        for i in range(CONCURRENT_STREAMS + 2):
+            response = await client.post("/api/chat/conversations", json={"title": f"对话 {i}"}, headers=headers)
+            conversation_ids.append(response.json()["id"])
+
+        # 1. 完整的流式回复：done 事件带有已保存的消息
+        body = await asgi_stream(
+            f"/api/chat/conversations/{conversation_ids[0]}/messages", {"content": "你好", "stream": True}, headers
+        )
+        done = json.loads(body.strip().split("\n\n")[-1][len("data: "):])
+        saved = assistant_messages(conversation_ids[0])
+        check(
+            "完整回复",
+            done["type"] == "done" and done["message"] and saved == [upstream.defaults["content"]],
+            f"保存的消息 id {done['message'] and done['message']['id']}，内容 {saved}"
+        )
+
+        # 2. 收到第一个增量后客户端断开：已生成的部分仍被保存
+        body = await asgi_stream(
+            f"/api/chat/conversations/{conversation_ids[1]}/messages", {"content": "你好", "stream": True}, headers,
+            disconnect_after=1
+        )
+        await asyncio.sleep(CHUNK_DELAY * 2)
+        saved = assistant_messages(conversation_ids[1])
+        delta_count = body.count('"type": "delta"')
+        check(
+            "客户端断开",
+            '"type": "done"' not in body and len(saved) == 1 and upstream.defaults["content"].startswith(saved[0]) and saved[0],
+            f"断开前收到 {delta_count} 个增量，保存的内容 {saved}"
+        )
+
+        # 3. 流式保存与持续新建笔记的请求并发：全部成功，事件循环没有被同步提交阻塞
+        stalls, stop = [], asyncio.Event()
+        watcher = asyncio.create_task(watch_loop(stalls, stop))
+        write_statuses = []
+
+        async def writer(index: int):
+            count = 0
+            while not stop.is_set():
+                response = await client.post(
+                    "/api/notes/", json={"title": f"笔记 {index}-{count}", "content": "并发写入", "category": "work"},
+                    headers=headers
+                )
+                write_statuses.append(response.status_code)
+                count += 1
+
+        writers = [asyncio.create_task(writer(i)) for i in range(CONCURRENT_WRITERS)]
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            asgi_stream(f"/api/chat/conversations/{conversation_id}/messages", {"content": "并发", "stream": True}, headers)
+            for conversation_id in conversation_ids[2:]
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(watcher, *writers)
+        with SessionLocal() as db:
+            saved_count = db.scalar(select(func.count(Message.id)).where(
+                Message.conversation_id.in_(conversation_ids[2:]), Message.role == "assistant"
+            ))
+        check(
+            "并发写入",
+            saved_count == CONCURRENT_STREAMS and write_statuses.count(200) == len(write_statuses)
+            and max(stalls) < MAX_LOOP_STALL_MS,
+            f"{saved_count}/{CONCURRENT_STREAMS} 条回复已保存（{elapsed * 1000:.0f}ms），"
+            f"同时新建笔记 {write_statuses.count(200)}/{len(write_statuses)} 成功，事件循环最长停顿 {max(stalls):.1f}ms"
+        )
+
+    await ai_service.close()
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 流式回复保存符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,159 @@
+"""比较SQLite数据库配置档 default 与 production 在纯写入和读写混合负载下的表现
+
+配置档在导入 database 时读取，因此每个配置档在单独的子进程中运行：在临时SQLite文件上写入一批笔记后，
+通过ASGI客户端先只让 WRITERS 个客户端持续新建笔记，再加上 READERS 个持续读取笔记列表的客户端，各持续一段时间，
+统计两类请求的吞吐、延迟分位数和失败数，并确认 production 的连接参数（WAL、外键等）已生效。
+混合负载下单个进程的事件循环已被读取请求占满，写入吞吐主要受CPU限制，因此只比较纯写入阶段的吞吐。
+production 配置档下出现失败的请求、连接参数未生效或纯写入吞吐低于 default 的 MIN_WRITE_SPEEDUP 倍时以非零状态退出：
+
+    python check_db_profile.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import subprocess
+
+PROFILES = ("default", "production")
+WRITERS = 20
+READERS = 80
+# (阶段名称, 读取客户端数, 持续秒数)
+PHASES = (("纯写入", 0, 5.0), ("混合负载", READERS, 8.0))
+MIN_WRITE_SPEEDUP = 1.2
+SEED_NOTES = 500
+USERS = 10
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+async def run_load(client, users, readers: int, duration: float) -> dict:
+    """WRITERS 个客户端持续新建笔记、readers 个客户端持续读取笔记列表，返回两类请求的统计"""
+    results = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    deadline = time.perf_counter() + duration
+
+    async def worker(kind: str, index: int):
+        _, headers = users[index % USERS]
+        count = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    response = await client.post("/api/notes/", json={
+                        "title": f"并发 {index}-{count}", "content": "写入", "category": "work"
+                    }, headers=headers)
+                else:
+                    response = await client.get("/api/notes/", params={"limit": 50}, headers=headers)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                results[kind].append((time.perf_counter() - started) * 1000)
+            else:
+                errors[kind] += 1
+            count += 1
+
+    await asyncio.gather(
+        *[worker("write", i) for i in range(WRITERS)],
+        *[worker("read", i) for i in range(readers)]
+    )
+    return {
+        kind: {
+            "rps": len(latencies) / duration,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "errors": errors[kind]
+        }
+        for kind, latencies in results.items()
+    }
+
+async def run_profile() -> dict:
+    """在当前进程的配置档下依次运行各阶段负载，返回统计结果"""
+    from sqlalchemy import insert
+    from database import engine, async_engine, run_migrations, DB_PROFILE
+    from models import Note
+    from local_app import create_user, app_client
+
+    run_migrations()
+    users = [create_user(f"profile-{i}") for i in range(USERS)]
+    with engine.begin() as conn:
+        conn.execute(insert(Note), [
+            {"title": f"笔记 {i}", "content": "内容" * 100, "category": "work", "tags": "[]", "user_id": users[i % USERS][0]}
+            for i in range(SEED_NOTES)
+        ])
+    with engine.connect() as conn:
+        pragmas = {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "foreign_keys", "busy_timeout", "synchronous")
+        }
+
+    async with app_client() as client:
+        phases = {name: await run_load(client, users, readers, duration) for name, readers, duration in PHASES}
+
+    await async_engine.dispose()
+    return {"profile": DB_PROFILE, "pragmas": pragmas, "phases": phases}
+
+def main() -> int:
+    failures = 0
+    stats = {}
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {
+                **os.environ,
+                "DB_PROFILE": profile,
+                "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'profile.db')}",
+                "AI_CACHE_DB_PATH": "",
+            }
+            output = subprocess.run(
+                [sys.executable, __file__, "--run"], env=env, capture_output=True, text=True, check=True
+            ).stdout
+        stats[profile] = json.loads(output.strip().splitlines()[-1])
+        for phase, _, _ in PHASES:
+            for kind, label in (("write", "写入"), ("read", "读取")):
+                result = stats[profile]["phases"][phase][kind]
+                if result["rps"] or result["errors"]:
+                    print(
+                        f"   {profile:<10} {phase} {label}: {result['rps']:.0f} rps，p50 {result['p50']:.0f}ms，"
+                        f"p99 {result['p99']:.0f}ms，失败 {result['errors']}"
+                    )
+
+    check("default 连接参数", str(stats["default"]["pragmas"]["journal_mode"]).lower() != "wal", json.dumps(stats["default"]["pragmas"]))
+    pragmas = stats["production"]["pragmas"]
+    check(
+        "production 连接参数",
+        str(pragmas["journal_mode"]).lower() == "wal" and pragmas["foreign_keys"] == 1 and pragmas["busy_timeout"] > 0,
+        json.dumps(pragmas)
+    )
+    production_errors = sum(
+        result["errors"] for phase in stats["production"]["phases"].values() for result in phase.values()
+    )
+    check("production 失败请求", production_errors == 0, f"{production_errors} 个请求失败")
+    default_rps = stats["default"]["phases"][PHASES[0][0]]["write"]["rps"]
+    production_rps = stats["production"]["phases"][PHASES[0][0]]["write"]["rps"]
+    check(
+        "纯写入吞吐",
+        production_rps >= default_rps * MIN_WRITE_SPEEDUP,
+        f"production {production_rps:.0f} rps，default {default_rps:.0f} rps（{production_rps / default_rps:.2f}x，"
+        f"要求不低于 {MIN_WRITE_SPEEDUP}x）"
+    )
+
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ production 配置档的连接参数生效，写入吞吐高于 default")
+    return 0
+
+if __name__ == "__main__":
+    if "--run" in sys.argv:
+        print(json.dumps(asyncio.run(run_profile())))
+    else:
+        sys.exit(main())
@@ -0,0 +1,145 @@
+"""检查列表和单篇笔记的ETag/304，以及 If-Match 的乐观并发控制，并比较轮询时的传输量和耗时
+
+在临时SQLite数据库上写入1000篇笔记（每篇500字），通过ASGI客户端轮询 GET /api/notes/ 200次，每20次修改一篇笔记：
+分别以不带和带 If-None-Match 的方式轮询，统计响应字节数、304次数和耗时，并确认修改、删除后下一次轮询拿到新内容；
+再检查单篇笔记的304、任务列表的304，以及8个带相同 If-Match 的并发修改只有一个成功。
+任一项不符合预期时以非零状态退出：
+
+    python check_etags.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'etags.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from sqlalchemy import insert
+
+from database import engine, async_engine, run_migrations
+from models import Note
+from local_app import create_user, app_client
+
+NOTES = 1000
+CONTENT_LENGTH = 500
+POLLS = 200
+EDIT_EVERY = 20
+CONCURRENT_UPDATES = 8
+
+def seed_notes(user_id: int):
+    now = datetime.utcnow() - timedelta(hours=1)
+    with engine.begin() as conn:
+        conn.execute(insert(Note), [
+            {"title": f"笔记 {i}", "content": "内" * CONTENT_LENGTH, "category": "work", "tags": "[]",
+             "user_id": user_id, "created_at": now, "updated_at": now + timedelta(seconds=i)}
+            for i in range(NOTES)
+        ])
+
+async def poll(client, headers: dict, note_id: int, conditional: bool) -> dict:
+    """轮询笔记列表，每 EDIT_EVERY 次修改一篇笔记；返回传输字节数、耗时和304次数，并检查修改后拿到新内容"""
+    etag, body, timings = None, None, []
+    transferred, not_modified, stale = 0, 0, 0
+    for i in range(POLLS):
+        edited = None
+        if i and i % EDIT_EVERY == 0:
+            edited = f"第 {i} 次轮询前修改（{'条件' if conditional else '普通'}请求）"
+            response = await client.put(f"/api/notes/{note_id}", json={"title": edited}, headers=headers)
+            assert response.status_code == 200, response.text
+        request_headers = {**headers, "If-None-Match": etag} if conditional and etag else headers
+        started = time.perf_counter()
+        response = await client.get("/api/notes/", headers=request_headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        transferred += len(response.content)
+        if response.status_code == 304:
+            not_modified += 1
+        else:
+            etag, body = response.headers["etag"], response.json()
+        if edited and edited not in {note["title"] for note in body}:
+            stale += 1
+    return {
+        "bytes": transferred, "p50": statistics.median(timings), "mean": statistics.mean(timings),
+        "not_modified": not_modified, "stale": stale
+    }
+
+async def main() -> int:
+    run_migrations()
+    user_id, headers = create_user("etag-check")
+    seed_notes(user_id)
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        note_id = (await client.get("/api/notes/", params={"limit": 1}, headers=headers)).json()[0]["id"]
+
+        # 1. 轮询列表：普通请求与条件请求
+        plain = await poll(client, headers, note_id, conditional=False)
+        conditional = await poll(client, headers, note_id, conditional=True)
+        edits = (POLLS - 1) // EDIT_EVERY
+        for label, result in (("普通请求", plain), ("If-None-Match", conditional)):
+            print(
+                f"   {label}: {result['bytes'] / 1024 / 1024:.1f}MB，p50 {result['p50']:.1f}ms，"
+                f"平均 {result['mean']:.1f}ms，{result['not_modified']} 次304"
+            )
+        check(
+            "列表轮询",
+            conditional["not_modified"] == POLLS - edits - 1 and conditional["stale"] == 0 and plain["stale"] == 0
+            and conditional["bytes"] * 10 < plain["bytes"] and conditional["p50"] < plain["p50"],
+            f"{POLLS} 次轮询、{edits} 次修改: {conditional['not_modified']} 次304，修改后拿到旧内容 {conditional['stale']} 次，"
+            f"传输量为普通请求的 {conditional['bytes'] / plain['bytes'] * 100:.1f}%"
+        )
+
+        # 2. 删除改变集合版本；查询参数不同时ETag不同
+        created = await client.post("/api/notes/", json={"title": "待删除", "category": "work"}, headers=headers)
+        listed = await client.get("/api/notes/", headers=headers)
+        await client.delete(f"/api/notes/{created.json()['id']}", headers=headers)
+        after_delete = await client.get("/api/notes/", headers={**headers, "If-None-Match": listed.headers["etag"]})
+        filtered = await client.get("/api/notes/", params={"category": "work"}, headers=headers)
+        check(
+            "删除与查询参数",
+            after_delete.status_code == 200 and filtered.headers["etag"] != after_delete.headers["etag"],
+            f"删除后条件请求状态 {after_delete.status_code}，按分类筛选的ETag与全部列表{'不同' if filtered.headers['etag'] != after_delete.headers['etag'] else '相同'}"
+        )
+
+        # 3. 单篇笔记和任务列表
+        note = await client.get(f"/api/notes/{note_id}", headers=headers)
+        cached = await client.get(f"/api/notes/{note_id}", headers={**headers, "If-None-Match": note.headers["etag"]})
+        await client.post("/api/tasks/", json={"title": "任务", "category": "work"}, headers=headers)
+        tasks = await client.get("/api/tasks/", headers=headers)
+        tasks_cached = await client.get("/api/tasks/", headers={**headers, "If-None-Match": tasks.headers["etag"]})
+        check(
+            "单篇笔记与任务列表",
+            cached.status_code == 304 and not cached.content and tasks_cached.status_code == 304,
+            f"单篇笔记条件请求 {cached.status_code}（{len(note.content)} 字节 → {len(cached.content)} 字节），任务列表条件请求 {tasks_cached.status_code}"
+        )
+
+        # 4. If-Match：带相同ETag的并发修改只有一个成功
+        etag = (await client.get(f"/api/notes/{note_id}", headers=headers)).headers["etag"]
+        responses = await asyncio.gather(*[
+            client.put(f"/api/notes/{note_id}", json={"content": f"并发修改 {i}"}, headers={**headers, "If-Match": etag})
+            for i in range(CONCURRENT_UPDATES)
+        ])
+        statuses = sorted(response.status_code for response in responses)
+        check(
+            "If-Match",
+            statuses == [200] + [412] * (CONCURRENT_UPDATES - 1),
+            f"{CONCURRENT_UPDATES} 个并发修改: {statuses.count(200)} 个成功，{statuses.count(412)} 个412"
+        )
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ ETag与条件请求符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,127 @@
+"""检查任务列表快速响应路径（FAST_JSON_RESPONSES）的序列化耗时与输出
+
+在临时SQLite数据库上写入5000个任务，按任务列表接口的投影查询后，分别按默认路径
+（response_model 校验 + JSONResponse）和快速路径（RowSerializer 字典 + ORJSONResponse）生成响应体，
+比较中位耗时并确认两者的JSON内容一致。未安装orjson、内容不一致或快速路径提速不足2倍时以非零状态退出：
+
+    python check_json_responses.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'json.db')}"
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from sqlalchemy import select, insert
+
+from database import SessionLocal, run_migrations
+from models import User, Task
+from fast_json import ORJSONResponse
+from routers.tasks import router as tasks_router, TASK_LIST_COLUMNS, task_serializer
+
+TASKS = 5000
+ROUNDS = 7
+MIN_SPEEDUP = 2.0
+
+def task_list_route() -> APIRoute:
+    return next(
+        route for route in tasks_router.routes
+        if isinstance(route, APIRoute) and route.path == "/" and "GET" in route.methods
+    )
+
+async def default_body(route: APIRoute, rows) -> bytes:
+    """默认路径：序列化器字典经 response_model 校验后由 JSONResponse 编码（与 FastAPI 请求处理一致）"""
+    content = await serialize_response(
+        field=route.secure_cloned_response_field,
+        response_content=task_serializer.many(rows),
+        exclude_unset=route.response_model_exclude_unset,
+        is_coroutine=True
+    )
+    return JSONResponse(content).body
+
+async def fast_body(route: APIRoute, rows) -> bytes:
+    """快速路径：序列化器字典直接由 ORJSONResponse 编码"""
+    return ORJSONResponse(task_serializer.many(rows)).body
+
+async def timed(build, route: APIRoute, rows) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        await build(route, rows)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def main() -> int:
+    if ORJSONResponse is None:
+        print("❌ 未安装orjson，无法使用快速响应路径")
+        return 1
+
+    run_migrations()
+    with SessionLocal() as db:
+        user = User(username="json-check", hashed_password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        start = datetime(2024, 1, 1, 8, 30, 15, 123456)
+        db.execute(insert(Task), [
+            {
+                "title": f"任务 {i}",
+                "description": "描述" * 20 if i % 3 else None,
+                "status": ("todo", "in_progress", "completed")[i % 3],
+                "priority": ("low", "medium", "high")[i % 3],
+                "category": ("work", "study", "life")[i % 3],
+                "due_date": start + timedelta(days=i % 30) if i % 2 else None,
+                "estimated_time": 30 + i % 90,
+                "tags": json.dumps(["标签", f"tag-{i % 7}"], ensure_ascii=False) if i % 4 else None,
+                "subtasks": json.dumps([{"title": "子任务", "completed": bool(i % 2)}], ensure_ascii=False),
+                "ai_generated": bool(i % 5 == 0),
+                "user_id": user_id,
+                "created_at": start + timedelta(minutes=i),
+                "updated_at": start + timedelta(minutes=i)
+            }
+            for i in range(TASKS)
+        ])
+        db.commit()
+        rows = db.execute(
+            select(*TASK_LIST_COLUMNS.values()).where(Task.user_id == user_id)
+            .order_by(Task.created_at.desc(), Task.id.desc())
+        ).all()
+
+    route = task_list_route()
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    default, fast = await default_body(route, rows), await fast_body(route, rows)
+    check(
+        "响应内容一致",
+        json.loads(default) == json.loads(fast),
+        f"{len(rows)} 个任务，默认路径 {len(default) / 1024:.0f}KB，快速路径 {len(fast) / 1024:.0f}KB"
+    )
+
+    default_ms, fast_ms = await timed(default_body, route, rows), await timed(fast_body, route, rows)
+    check(
+        "序列化耗时",
+        default_ms >= fast_ms * MIN_SPEEDUP,
+        f"默认路径 {default_ms:.1f}ms，快速路径 {fast_ms:.1f}ms（{default_ms / fast_ms:.1f}倍）"
+    )
+
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 快速响应路径输出一致且耗时符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,141 @@
+"""检查模型路由在主模型变慢、故障和恢复时的表现
+
+使用进程内的模拟上游（fake_upstream.FakeUpstream），对 gpt-5（备用模型 gpt-4o）依次注入高延迟和持续503，
+对比关闭与开启回退时的延迟和成功率，并检查回退结果不写入缓存、主模型恢复且旧样本过期后流量回到主模型。
+任一项不符合预期时以非零状态退出：
+
+    python check_model_routing.py
+"""
+import os
+import sys
+import time
+import asyncio
+import statistics
+import collections
+
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["OPENROUTER_API_KEY"] = ""
+os.environ["AI_CACHE_DB_PATH"] = ""
+os.environ["AI_MODEL_FALLBACK"] = "true"
+os.environ["AI_ROUTER_MIN_SAMPLES"] = "10"
+os.environ["AI_ROUTER_SLOW_P95_MS"] = "100"
+os.environ["AI_ROUTER_MAX_AGE"] = "1"
+os.environ["AI_MAX_RETRIES"] = "1"
+os.environ["AI_RETRY_BASE_DELAY"] = "0.01"
+os.environ["AI_REQUEST_TIMEOUT"] = "1"
+os.environ["AI_CIRCUIT_FAILURE_THRESHOLD"] = "5"
+os.environ["AI_CIRCUIT_RESET_TIMEOUT"] = "0.5"
+
+import httpx
+from fastapi import HTTPException
+
+from ai_service import ai_service
+from ai_resilience import upstream_resilience
+from model_router import model_router
+from fake_upstream import FakeUpstream
+
+PRIMARY = "gpt-5"
+FALLBACK = "gpt-4o"
+CALLS = 20
+
+upstream = FakeUpstream(seed=17, delay=0.005)
+counter = 0
+
+async def call():
+    """发起一次不会被合并的请求，返回 (状态码, 实际使用的模型, 耗时毫秒)"""
+    global counter
+    counter += 1
+    started = time.perf_counter()
+    try:
+        result = await ai_service.chat_completion([{"role": "user", "content": f"routing-{counter}"}], PRIMARY)
+        status, model = 200, result["model"]
+    except HTTPException as e:
+        status, model = e.status_code, None
+    return status, model, (time.perf_counter() - started) * 1000
+
+async def sequence(n: int, concurrent: bool = False):
+    if concurrent:
+        results = await asyncio.gather(*[call() for _ in range(n)])
+    else:
+        results = [await call() for _ in range(n)]
+    return (
+        collections.Counter(status for status, _, _ in results),
+        collections.Counter(model for _, model, _ in results if model),
+        [elapsed for _, _, elapsed in results]
+    )
+
+async def main() -> int:
+    ai_service._client = httpx.AsyncClient(transport=upstream.transport())
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    # 1. 主模型变慢：关闭回退时每次都等待主模型（并发发出，使样本都在统计时长内）；
+    #    开启后主模型p95超过阈值即改用备用模型
+    upstream.configure(PRIMARY, delay=0.15)
+    model_router.fallback_enabled = False
+    _, _, without_fallback = await sequence(CALLS, concurrent=True)
+    model_router.fallback_enabled = True
+    _, models, with_fallback = await sequence(CALLS)
+    check(
+        "主模型变慢",
+        models[FALLBACK] == CALLS and statistics.median(with_fallback) < statistics.median(without_fallback) / 3,
+        f"关闭回退 p50 {statistics.median(without_fallback):.0f}ms，开启回退 p50 {statistics.median(with_fallback):.0f}ms，"
+        f"{models[FALLBACK]}/{CALLS} 由 {FALLBACK} 返回"
+    )
+    upstream.configure(PRIMARY, delay=0.005)
+    await asyncio.sleep(model_router.max_age)
+
+    # 2. 主模型持续503：关闭回退时全部失败；开启后全部由备用模型返回，熔断后不再访问主模型
+    upstream.configure(PRIMARY, fail_rate=1.0, fail_status=503)
+    model_router.fallback_enabled = False
+    statuses, _, _ = await sequence(CALLS)
+    model_router.fallback_enabled = True
+    await asyncio.sleep(upstream_resilience.reset_timeout)
+    upstream.reset_stats()
+    fallbacks_before = model_router.fallbacks_used
+    with_fallback, models, _ = await sequence(CALLS)
+    check(
+        "主模型故障",
+        statuses[200] == 0 and with_fallback == {200: CALLS} and models[FALLBACK] == CALLS
+        and model_router.fallbacks_used - fallbacks_before == CALLS and upstream.calls[PRIMARY] <= 2,
+        f"关闭回退成功 {statuses[200]}/{CALLS}，开启回退成功 {with_fallback[200]}/{CALLS}，"
+        f"期间主模型请求 {upstream.calls[PRIMARY]} 次"
+    )
+
+    # 3. 回退结果不写入缓存：相同输入再次请求仍访问上游
+    messages = [{"role": "user", "content": "routing-cache"}]
+    upstream.reset_stats()
+    first = await ai_service.cached_chat_completion(messages, PRIMARY)
+    second = await ai_service.cached_chat_completion(messages, PRIMARY)
+    check(
+        "回退结果不缓存",
+        first["model"] == second["model"] == FALLBACK and "cached" not in second and upstream.calls[FALLBACK] == 2,
+        f"两次均由 {second['model']} 返回，备用模型请求 {upstream.calls[FALLBACK]} 次"
+    )
+
+    # 4. 主模型恢复：熔断冷却、旧样本过期后流量回到主模型，其结果正常缓存
+    upstream.configure(PRIMARY, fail_rate=0.0)
+    await asyncio.sleep(max(model_router.max_age, upstream_resilience.reset_timeout))
+    upstream.reset_stats()
+    first = await ai_service.cached_chat_completion(messages, PRIMARY)
+    second = await ai_service.cached_chat_completion(messages, PRIMARY)
+    check(
+        "主模型恢复",
+        first["model"] == PRIMARY and second.get("cached") is True and upstream.calls == {PRIMARY: 1},
+        f"恢复后由 {first['model']} 返回，第二次{'命中' if second.get('cached') else '未命中'}缓存，上游请求 {dict(upstream.calls)}"
+    )
+
+    print({route["upstream_model"]: route for route in model_router.routing_table()["models"][PRIMARY]["routes"]})
+    await ai_service.close()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 模型路由、回退和恢复符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,143 @@
+"""比较逐篇调用 /api/notes/{id}/generate-tags 与批量接口 /api/notes/batch/ai 的耗时，并检查并发上限和批量写回
+
+在临时SQLite数据库上写入一批笔记，使用进程内的模拟上游（fake_upstream.FakeUpstream，固定延迟）：
+先由客户端逐篇调用单篇接口，再以不同的 concurrency 调用批量接口，记录总耗时、首个事件的延迟和上游同时处理的请求数；
+最后以 apply=true 批量写回标签，确认标签索引可以查到全部笔记。任一项不符合预期时以非零状态退出：
+
+    python check_note_batch_ai.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'batch_ai.db')}"
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+import httpx
+
+from database import async_engine, run_migrations
+from ai_service import ai_service
+from fake_upstream import FakeUpstream
+from local_app import create_user, app_client, app
+
+NOTES = 60
+UPSTREAM_DELAY = 0.1
+CONCURRENCY_LEVELS = (8, 32)
+MODEL = "gpt-4o-mini"
+# 并发数为8时相对逐篇调用的最低提速
+MIN_SPEEDUP = 5.0
+
+upstream = FakeUpstream(delay=UPSTREAM_DELAY, content=json.dumps({"tags": ["批量", "AI"]}, ensure_ascii=False))
+
+async def batch_events(payload: dict, headers: dict):
+    """以ASGI协议调用批量接口，返回 (事件列表, 首个事件的延迟s, 总耗时s)"""
+    body = json.dumps(payload).encode("utf-8")
+    chunks, first_event = [], None
+    started = time.perf_counter()
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal first_event
+        if message["type"] == "http.response.body" and message.get("body"):
+            if first_event is None:
+                first_event = time.perf_counter() - started
+            chunks.append(message["body"].decode("utf-8"))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/notes/batch/ai", "raw_path": b"/api/notes/batch/ai", "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 12345), "server": ("local-app", 80),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in {**headers, "content-type": "application/json"}.items()],
+    }
+    await app(scope, receive, send)
+    events = [json.loads(event[len("data: "):]) for event in "".join(chunks).split("\n\n") if event.startswith("data: ")]
+    return events, first_event, time.perf_counter() - started
+
+async def main() -> int:
+    run_migrations()
+    _, headers = create_user("batch-ai-check")
+    ai_service._client = httpx.AsyncClient(transport=upstream.transport())
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        note_ids = []
+        for i in range(NOTES):
+            response = await client.post("/api/notes/", json={
+                "title": f"笔记 {i}", "content": f"第 {i} 篇笔记的内容", "category": "work"
+            }, headers=headers)
+            note_ids.append(response.json()["id"])
+
+        # 1. 逐篇调用单篇接口
+        started = time.perf_counter()
+        for note_id in note_ids:
+            response = await client.post(
+                f"/api/notes/{note_id}/generate-tags", json={"model": MODEL, "use_cache": False}, headers=headers
+            )
+            assert response.status_code == 200, response.text
+        sequential = time.perf_counter() - started
+        print(f"   逐篇调用: {sequential:.2f}s")
+
+        # 2. 批量接口：按并发上限分批调用上游
+        timings = {}
+        for concurrency in CONCURRENCY_LEVELS:
+            upstream.reset_stats()
+            events, first_event, elapsed = await batch_events({
+                "note_ids": note_ids + [0], "operation": "generate_tags", "model": MODEL,
+                "use_cache": False, "concurrency": concurrency
+            }, headers)
+            timings[concurrency] = elapsed
+            results = [event for event in events if event["type"] == "result"]
+            missing = [event for event in events if event["type"] == "error" and event["status_code"] == 404]
+            check(
+                f"concurrency={concurrency}",
+                len(results) == NOTES and len(missing) == 1 and events[-1]["type"] == "done"
+                and upstream.max_inflight == concurrency,
+                f"用时 {elapsed:.2f}s（逐篇调用的 {sequential / elapsed:.1f}x），首个事件 {first_event * 1000:.0f}ms，"
+                f"{len(results)} 个结果、{len(missing)} 个404，上游同时处理最多 {upstream.max_inflight} 个"
+            )
+        check(
+            "批量提速",
+            sequential / timings[CONCURRENCY_LEVELS[0]] >= MIN_SPEEDUP and timings[CONCURRENCY_LEVELS[1]] < timings[CONCURRENCY_LEVELS[0]],
+            f"concurrency={CONCURRENCY_LEVELS[0]} 比逐篇调用快 {sequential / timings[CONCURRENCY_LEVELS[0]]:.1f}x"
+            f"（要求不低于 {MIN_SPEEDUP:.0f}x），concurrency={CONCURRENCY_LEVELS[1]} 用时更短"
+        )
+
+        # 3. apply=true：全部完成后批量写回标签，标签索引同步更新
+        events, _, _ = await batch_events({
+            "note_ids": note_ids, "operation": "generate_tags", "model": MODEL, "apply": True
+        }, headers)
+        tagged = await client.get("/api/notes/", params={"tag": "批量", "fields": "tags"}, headers=headers)
+        check(
+            "批量写回",
+            events[-1]["type"] == "done" and events[-1]["updated"] == NOTES and len(tagged.json()) == NOTES
+            and all(note["tags"] == ["批量", "AI"] for note in tagged.json()),
+            f"写回 {events[-1].get('updated')} 篇，按标签“批量”筛选得到 {len(tagged.json())} 篇"
+        )
+
+    await ai_service.close()
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 批量AI处理符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,127 @@
+"""检查笔记全文搜索的召回不低于原先的LIKE查询，包括单个中文字符位于词首、词中和词尾的情况
+
+在临时SQLite数据库上先迁移到 0007 并直接写入一批笔记，再升级到最新版本，由迁移 0008 创建并回填索引；
+之后通过接口新建和修改笔记（由ORM事件维护索引），对每个查询比较 /api/notes/search 与 /api/notes/?search=
+的命中和按LIKE语义的预期结果。任一项不符合预期时以非零状态退出：
+
+    python check_note_search.py
+"""
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'search.db')}"
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import text
+
+from database import engine, async_engine, run_migrations, ALEMBIC_INI, Base
+from search import note_search_index
+from local_app import create_user, app_client
+
+# 迁移前已有的笔记（由迁移回填索引）
+EXISTING_NOTES = [
+    ("我爱你", "一句话"),
+    ("你好世界", "hello world"),
+    ("周报", "本周完成了搜索功能，下周继续优化"),
+    ("Shopping list", "milk, eggs and 面包"),
+]
+# 迁移后通过接口创建的笔记（由ORM事件写入索引）
+CREATED_NOTES = [
+    ("读书笔记", "今天读完了《百年孤独》"),
+    ("会议", "和你讨论了项目进度"),
+    ("English note", "The quick brown fox"),
+]
+QUERIES = [
+    "我", "爱", "你",          # 同一词组的词首、词中、词尾
+    "好", "界", "包", "独",
+    "我爱你", "你好", "搜索功能", "hello", "fox", "quick brown", "不存在",
+]
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    return config
+
+def like_matches(notes, query: str):
+    """原LIKE查询的命中：标题或内容包含整个查询串（SQLite的LIKE对ASCII不区分大小写）"""
+    query = query.lower()
+    return {
+        note_id for note_id, title, content in notes
+        if query in title.lower() or query in (content or "").lower()
+    }
+
+async def main() -> int:
+    config = alembic_config()
+    command.upgrade(config, "0007")
+    user_id, headers = create_user("search-check")
+    with engine.begin() as conn:
+        now = datetime.utcnow()
+        for title, content in EXISTING_NOTES:
+            conn.execute(text(
+                "INSERT INTO notes (title, content, category, tags, user_id, created_at, updated_at) "
+                "VALUES (:title, :content, 'life', '[]', :user_id, :now, :now)"
+            ), {"title": title, "content": content, "user_id": user_id, "now": now})
+
+    run_migrations()
+    note_search_index.setup()
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    with engine.connect() as conn:
+        indexed = conn.execute(text("SELECT COUNT(*) FROM notes_fts")).scalar()
+        # 全文索引表不在模型中定义（与 alembic/env.py 的 include_object 一致）
+        drift = [
+            diff for diff in compare_metadata(MigrationContext.configure(conn), Base.metadata)
+            if not (diff[0] == "remove_table" and diff[1].name.startswith(("notes_fts", "notes_search")))
+        ]
+    check(
+        "迁移回填",
+        note_search_index.ready and indexed == len(EXISTING_NOTES) and not drift,
+        f"索引 {indexed}/{len(EXISTING_NOTES)} 条已有笔记，模型与迁移差异 {drift or '无'}"
+    )
+
+    async with app_client() as client:
+        for title, content in CREATED_NOTES:
+            response = await client.post("/api/notes/", json={"title": title, "content": content, "category": "study"}, headers=headers)
+            assert response.status_code == 200, response.text
+        # 修改后的内容同样可以搜索到
+        last_id = response.json()["id"]
+        response = await client.put(f"/api/notes/{last_id}", json={"content": "The quick brown fox jumps"}, headers=headers)
+        assert response.status_code == 200, response.text
+
+        with engine.connect() as conn:
+            notes = conn.execute(text("SELECT id, title, content FROM notes WHERE user_id = :user_id"), {"user_id": user_id}).all()
+
+        for query in QUERIES:
+            expected = like_matches(notes, query)
+            searched = await client.get("/api/notes/search", params={"q": query, "limit": 100}, headers=headers)
+            listed = await client.get("/api/notes/", params={"search": query}, headers=headers)
+            search_ids = {item["id"] for item in searched.json()["items"]}
+            list_ids = {item["id"] for item in listed.json()}
+            # 多字查询按二元组全部命中匹配，可能多于LIKE的结果；单字和常见查询应与LIKE一致
+            check(
+                f"搜索“{query}”",
+                search_ids >= expected and list_ids >= expected and (len(query) > 1 or search_ids == expected),
+                f"LIKE {sorted(expected)}，全文搜索 {sorted(search_ids)}，列表筛选 {sorted(list_ids)}"
+            )
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 全文搜索的召回不低于LIKE查询")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
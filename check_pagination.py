@@ -0,0 +1,142 @@
+"""检查笔记列表的键集分页：逐页遍历不重复、不遗漏，且每页耗时不随页深增长
+
+在临时SQLite数据库上为一个用户写入20000篇笔记（每篇500字，部分笔记的 updated_at 相同），
+通过ASGI客户端按 X-Next-Cursor 逐页读取全部笔记，检查顺序和完整性；
+再比较首页、末页（键集）与不分页的全量列表的耗时和响应大小，并打印同一深度的OFFSET查询耗时作为对照。
+任一项不符合预期时以非零状态退出：
+
+    python check_pagination.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'pagination.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from sqlalchemy import insert, select
+
+from database import engine, async_engine, run_migrations
+from models import Note
+from pagination import NEXT_CURSOR_HEADER
+from local_app import create_user, app_client
+
+NOTES = 20000
+CONTENT_LENGTH = 500
+# 每多少篇笔记共用同一个 updated_at，检查按id区分同一时刻的笔记
+SAME_TIMESTAMP = 7
+PAGE_SIZE = 50
+WALK_PAGE_SIZE = 200
+ROUNDS = 7
+FIELDS = "title,tags"
+# 末页耗时相对首页的上限，以及首页相对全量列表的最低提速
+MAX_DEEP_PAGE_RATIO = 1.5
+MIN_FIRST_PAGE_SPEEDUP = 10.0
+
+def seed_notes(user_id: int):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "title": f"笔记 {i}", "content": "内" * CONTENT_LENGTH, "category": ("work", "study", "life")[i % 3],
+            "tags": '["标签"]', "user_id": user_id, "created_at": now,
+            "updated_at": now - timedelta(seconds=i // SAME_TIMESTAMP)
+        }
+        for i in range(NOTES)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Note), rows)
+
+async def timed_get(client, headers: dict, params: dict):
+    """多次请求同一页，返回 (中位耗时ms, 响应字节数, 最后一次响应)"""
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        response = await client.get("/api/notes/", params=params, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(timings), len(response.content), response
+
+def timed_offset(user_id: int, offset: int) -> float:
+    """同一深度的OFFSET分页查询耗时（ms），作为对照"""
+    stmt = (
+        select(Note.id, Note.title, Note.tags, Note.category, Note.created_at, Note.updated_at)
+        .where(Note.user_id == user_id)
+        .order_by(Note.updated_at.desc(), Note.id.desc())
+        .offset(offset).limit(PAGE_SIZE)
+    )
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            conn.execute(stmt).all()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def main() -> int:
+    run_migrations()
+    user_id, headers = create_user("pagination-check")
+    seed_notes(user_id)
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        # 1. 逐页遍历：不重复、不遗漏，按 (updated_at, id) 倒序
+        seen, keys, pages, cursor, last_cursor = [], [], 0, None, None
+        while True:
+            params = {"limit": WALK_PAGE_SIZE, "fields": "updated_at"}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/api/notes/", params=params, headers=headers)
+            pages += 1
+            items = response.json()
+            seen.extend(item["id"] for item in items)
+            keys.extend((item["updated_at"], item["id"]) for item in items)
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            if not cursor:
+                break
+            last_cursor = cursor
+        check(
+            "逐页遍历",
+            len(seen) == NOTES and len(set(seen)) == NOTES and keys == sorted(keys, reverse=True),
+            f"{pages} 页共 {len(seen)} 篇（不重复 {len(set(seen))} 篇），顺序{'正确' if keys == sorted(keys, reverse=True) else '错误'}"
+        )
+
+        # 2. 首页、末页与全量列表
+        first_ms, first_bytes, _ = await timed_get(client, headers, {"limit": PAGE_SIZE, "fields": FIELDS})
+        deep_ms, deep_bytes, _ = await timed_get(client, headers, {"limit": PAGE_SIZE, "fields": FIELDS, "cursor": last_cursor})
+        full_ms, full_bytes, _ = await timed_get(client, headers, {})
+        offset_first_ms = timed_offset(user_id, 0)
+        offset_deep_ms = timed_offset(user_id, NOTES - PAGE_SIZE)
+        print(f"   首页（limit={PAGE_SIZE}, fields={FIELDS}）: {first_ms:.1f}ms，{first_bytes / 1024:.1f}KB")
+        print(f"   末页（键集游标）: {deep_ms:.1f}ms，{deep_bytes / 1024:.1f}KB")
+        print(f"   不分页全量列表: {full_ms:.1f}ms，{full_bytes / 1024 / 1024:.1f}MB")
+        print(f"   对照：OFFSET 0 查询 {offset_first_ms:.2f}ms，OFFSET {NOTES - PAGE_SIZE} 查询 {offset_deep_ms:.2f}ms")
+        check(
+            "首页耗时",
+            full_ms / first_ms >= MIN_FIRST_PAGE_SPEEDUP,
+            f"首页比全量列表快 {full_ms / first_ms:.0f}x（要求不低于 {MIN_FIRST_PAGE_SPEEDUP:.0f}x）"
+        )
+        check(
+            "页深无关",
+            deep_ms <= first_ms * MAX_DEEP_PAGE_RATIO,
+            f"末页耗时为首页的 {deep_ms / first_ms:.1f}x（要求不超过 {MAX_DEEP_PAGE_RATIO}x）"
+        )
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 键集分页符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
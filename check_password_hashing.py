@@ -0,0 +1,142 @@
+"""检查密码哈希在有界线程池中执行：并发登录期间事件循环保持响应，超出容量时返回429，成本变更后登录时重新哈希
+
+在临时SQLite数据库上注册用户后，通过ASGI客户端并发登录并轮询 /health，记录 /health 的最长响应时间和事件循环的最长停顿，
+并打印在事件循环中直接计算bcrypt（改动前的做法）时的停顿作为对照；再以超过
+PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE 的并发登录，确认多出的请求得到带 Retry-After 的429。
+任一项不符合预期时以非零状态退出：
+
+    python check_password_hashing.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'passwords.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+os.environ["BCRYPT_ROUNDS"] = "10"
+os.environ["PASSWORD_HASH_WORKERS"] = "2"
+os.environ["PASSWORD_HASH_QUEUE_SIZE"] = "8"
+
+from sqlalchemy import select
+
+from database import SessionLocal, async_engine, run_migrations
+from models import User
+from passwords import pwd_context, password_hasher, BCRYPT_ROUNDS
+from local_app import app_client
+
+PASSWORD = "correct-horse"
+# 不超过线程池容量的并发登录数，以及超出容量的并发登录数
+WITHIN_CAPACITY = 10
+OVER_CAPACITY = 40
+MAX_HEALTH_MS = 200
+
+async def poll_health(client, latencies: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+async def watch_loop(stalls: list, stop: asyncio.Event):
+    """记录事件循环的最长停顿（毫秒）"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        stalls.append((time.perf_counter() - started) * 1000 - 5)
+
+async def login_burst(client, count: int):
+    """并发登录 count 次，返回 (响应列表, 用时s, /health 最长响应时间ms, 事件循环最长停顿ms)"""
+    latencies, stalls, stop = [], [], asyncio.Event()
+    watchers = [
+        asyncio.create_task(poll_health(client, latencies, stop)),
+        asyncio.create_task(watch_loop(stalls, stop))
+    ]
+    started = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/api/auth/login", json={"username": "hash-check", "password": PASSWORD}) for _ in range(count)
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*watchers)
+    return responses, elapsed, max(latencies), max(stalls)
+
+async def blocking_baseline(count: int) -> float:
+    """对照：在事件循环中直接验证密码（改动前的做法），返回事件循环最长停顿ms"""
+    stored = pwd_context.hash(PASSWORD)
+    stalls, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stalls, stop))
+
+    async def verify():
+        await asyncio.sleep(0.01)
+        pwd_context.verify(PASSWORD, stored)
+
+    await asyncio.gather(*[verify() for _ in range(count)])
+    stop.set()
+    await watcher
+    return max(stalls)
+
+async def main() -> int:
+    run_migrations()
+    capacity = password_hasher.max_workers + password_hasher.max_queue
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        response = await client.post("/api/auth/register", json={"username": "hash-check", "password": PASSWORD})
+        assert response.status_code == 200, response.text
+
+        # 1. 不超过容量的并发登录：全部成功，事件循环保持响应
+        responses, elapsed, health_ms, stall_ms = await login_burst(client, WITHIN_CAPACITY)
+        statuses = [response.status_code for response in responses]
+        baseline_ms = await blocking_baseline(WITHIN_CAPACITY)
+        check(
+            "并发登录",
+            statuses.count(200) == WITHIN_CAPACITY and health_ms < MAX_HEALTH_MS and stall_ms < MAX_HEALTH_MS,
+            f"{WITHIN_CAPACITY} 个并发登录 {statuses.count(200)} 个成功，用时 {elapsed:.2f}s，/health 最长 {health_ms:.1f}ms，"
+            f"事件循环最长停顿 {stall_ms:.1f}ms（在事件循环中直接计算bcrypt时为 {baseline_ms:.1f}ms）"
+        )
+
+        # 2. 超出容量：多出的请求立即得到429，其余正常完成
+        responses, elapsed, health_ms, stall_ms = await login_burst(client, OVER_CAPACITY)
+        statuses = [response.status_code for response in responses]
+        rejected = [response for response in responses if response.status_code == 429]
+        check(
+            "容量限制",
+            statuses.count(200) >= capacity and rejected and statuses.count(200) + len(rejected) == OVER_CAPACITY
+            and all(response.headers.get("retry-after") for response in rejected)
+            and health_ms < MAX_HEALTH_MS and stall_ms < MAX_HEALTH_MS,
+            f"{OVER_CAPACITY} 个并发登录（容量 {capacity}）: {statuses.count(200)} 个成功，{len(rejected)} 个429，"
+            f"用时 {elapsed:.2f}s，/health 最长 {health_ms:.1f}ms，事件循环最长停顿 {stall_ms:.1f}ms"
+        )
+
+        # 3. 哈希成本与配置不一致的密码在登录时重新哈希
+        with SessionLocal() as db:
+            user = db.scalar(select(User).where(User.username == "hash-check"))
+            user.hashed_password = pwd_context.hash(PASSWORD, rounds=4)
+            db.commit()
+        response = await client.post("/api/auth/login", json={"username": "hash-check", "password": PASSWORD})
+        with SessionLocal() as db:
+            stored = db.scalar(select(User.hashed_password).where(User.username == "hash-check"))
+        check(
+            "登录时重新哈希",
+            response.status_code == 200 and stored.startswith(f"$2b${BCRYPT_ROUNDS:02d}$"),
+            f"登录状态 {response.status_code}，存储的哈希前缀 {stored[:7]}"
+        )
+
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 密码哈希不阻塞事件循环")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,183 @@
+"""检查 GET /api/pomodoro/stats 的分组查询结果与逐日循环查询一致，并比较两者在 days=7/30/365 时的耗时
+
+在临时SQLite数据库上为一个用户写入跨越一年多、主题和类型各异的番茄钟记录：部分日期没有记录，
+今日零点、前一日23:59:59等边界时刻各有记录，另一个用户的记录不应计入。
+参照实现按改动前的方式逐日、逐项查询后在Python中汇总。任一项不一致时以非零状态退出：
+
+    python check_pomodoro_stats.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'pomodoro.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from sqlalchemy import event
+
+from database import SessionLocal, async_engine, run_migrations
+from models import PomodoroSession
+from local_app import create_user, app_client
+
+PERIODS = (1, 7, 30, 365)
+BENCHMARK_PERIODS = (7, 30, 365)
+BENCHMARK_ROUNDS = 5
+# 写入记录覆盖的天数（超过最长统计区间，区间之前的记录不应计入）
+HISTORY_DAYS = 400
+THEMES = ("classic", "forest", "ocean", None)
+SESSION_TYPES = ("work", "work", "short_break", "long_break")
+
+def seed_sessions(user_id: int, today_start: datetime) -> int:
+    """写入番茄钟记录：每3天中有1天没有记录，另外在今日零点及其前后写入边界记录"""
+    sessions = []
+    for day in range(HISTORY_DAYS):
+        if day % 3 == 1:
+            continue
+        day_start = today_start - timedelta(days=day)
+        for i in range(day % 4 + 1):
+            sessions.append(PomodoroSession(
+                user_id=user_id,
+                session_type=SESSION_TYPES[(day + i) % len(SESSION_TYPES)],
+                duration=15 + (day + i) % 20,
+                completed=(day + i) % 5 != 0,
+                theme=THEMES[(day + i) % len(THEMES)],
+                started_at=day_start + timedelta(hours=8 + i, minutes=day % 60)
+            ))
+    for started_at in (
+        today_start,                            # 今日零点：计入今日
+        today_start - timedelta(seconds=1),     # 前一日最后一秒：计入前一日
+        today_start + timedelta(seconds=1),
+    ):
+        sessions.append(PomodoroSession(
+            user_id=user_id, session_type="work", duration=25, completed=True, theme="forest", started_at=started_at
+        ))
+    with SessionLocal() as db:
+        db.add_all(sessions)
+        db.commit()
+    return len(sessions)
+
+def reference_stats(user_id: int, days: int) -> dict:
+    """参照实现：与改动前相同，逐项计数并逐日查询后在Python中求和"""
+    with SessionLocal() as db:
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        today_start = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        sessions = db.query(PomodoroSession).filter(PomodoroSession.user_id == user_id)
+
+        total_sessions = sessions.filter(PomodoroSession.started_at >= start_date).count()
+        completed_sessions = sessions.filter(
+            PomodoroSession.started_at >= start_date, PomodoroSession.completed == True
+        ).count()
+        work_sessions = sessions.filter(
+            PomodoroSession.started_at >= start_date, PomodoroSession.session_type == "work",
+            PomodoroSession.completed == True
+        ).all()
+        today_sessions = sessions.filter(
+            PomodoroSession.started_at >= today_start, PomodoroSession.completed == True
+        ).all()
+
+        daily_stats = []
+        for i in range(days):
+            day_start = today_start - timedelta(days=i)
+            day_sessions = sessions.filter(
+                PomodoroSession.started_at >= day_start,
+                PomodoroSession.started_at < day_start + timedelta(days=1),
+                PomodoroSession.session_type == "work",
+                PomodoroSession.completed == True
+            ).all()
+            daily_stats.append({
+                "date": day_start.date().isoformat(),
+                "sessions": len(day_sessions),
+                "focus_time": sum(session.duration for session in day_sessions)
+            })
+
+        theme_stats = {}
+        for session in sessions.filter(PomodoroSession.started_at >= start_date).all():
+            theme = session.theme or "classic"
+            theme_stats[theme] = theme_stats.get(theme, 0) + 1
+
+        return {
+            "total_sessions": total_sessions,
+            "completed_sessions": completed_sessions,
+            "work_sessions": len(work_sessions),
+            "completion_rate": round(completed_sessions / total_sessions * 100, 1) if total_sessions > 0 else 0,
+            "total_focus_time": sum(session.duration for session in work_sessions),
+            "average_daily_sessions": round(len(work_sessions) / days, 1),
+            "today_sessions": len(today_sessions),
+            "today_focus_time": sum(session.duration for session in today_sessions if session.session_type == "work"),
+            "daily_stats": list(reversed(daily_stats)),
+            "theme_stats": theme_stats,
+            "period_days": days
+        }
+
+async def main() -> int:
+    run_migrations()
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    user_id, headers = create_user("pomodoro-check")
+    other_user_id, _ = create_user("pomodoro-other")
+    seeded = seed_sessions(user_id, today_start)
+    seed_sessions(other_user_id, today_start)
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    statements = []
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement)
+    )
+
+    async with app_client() as client:
+        for days in PERIODS:
+            statements.clear()
+            response = await client.get("/api/pomodoro/stats", params={"days": days}, headers=headers)
+            stats = response.json()
+            expected = reference_stats(user_id, days)
+            mismatched = [key for key in expected if stats.get(key) != expected[key]]
+            empty_days = sum(1 for day in expected["daily_stats"] if day["sessions"] == 0)
+            check(
+                f"days={days}",
+                response.status_code == 200 and not mismatched,
+                f"{len(statements)} 条查询，{len(stats['daily_stats'])} 天中 {empty_days} 天没有记录，"
+                f"今日 {stats['today_sessions']} 个/{stats['today_focus_time']} 分钟，"
+                f"不一致的字段 {mismatched or '无'}"
+            )
+        # 今日零点和前一日最后一秒的记录分别计入今日和前一日（今日原有的一条记录未完成，前一日没有其他记录）
+        daily = stats["daily_stats"]
+        check(
+            "今日边界",
+            daily[-1]["date"] == today_start.date().isoformat() and daily[-1]["sessions"] == 2
+            and daily[-2]["sessions"] == 1 and stats["today_sessions"] == expected["today_sessions"],
+            f"今日 {daily[-1]}，前一日 {daily[-2]}（共写入 {seeded} 条记录）"
+        )
+
+        # 分组查询的耗时包含经由ASGI请求接口的开销，逐日查询直接调用参照实现
+        print("耗时对比（中位数）:")
+        for days in BENCHMARK_PERIODS:
+            grouped, looped = [], []
+            for _ in range(BENCHMARK_ROUNDS):
+                started = time.perf_counter()
+                await client.get("/api/pomodoro/stats", params={"days": days}, headers=headers)
+                grouped.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                reference_stats(user_id, days)
+                looped.append(time.perf_counter() - started)
+            grouped_ms, looped_ms = sorted(grouped)[len(grouped) // 2] * 1000, sorted(looped)[len(looped) // 2] * 1000
+            print(f"   days={days}: 分组查询（接口） {grouped_ms:.1f}ms，逐日查询 {looped_ms:.1f}ms（{looped_ms / grouped_ms:.1f}x）")
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 番茄钟统计与逐日查询结果一致")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,138 @@
+"""检查列表接口的SQL语句数不随数据量增长（没有逐行查询的N+1）
+
+在临时SQLite数据库上为两个用户分别准备少量和大量的数据（文件夹及其中的笔记、任务、对话、番茄钟记录），
+通过ASGI客户端请求各列表接口，用 before_cursor_execute 事件统计每次请求执行的语句数。
+两个用户的语句数应相同，文件夹侧栏应只用一条查询取得文件夹及笔记数。任一项不符合预期时以非零状态退出：
+
+    python check_query_counts.py
+"""
+import os
+import sys
+import asyncio
+import tempfile
+from collections import Counter
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'queries.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from sqlalchemy import event
+
+from database import SessionLocal, engine, async_engine, run_migrations
+from models import Conversation, Message
+from local_app import create_user, app_client
+
+# 少量和大量数据的规模（文件夹数；任务、对话、番茄钟记录数与之相同）
+SMALL = 2
+LARGE = 40
+NOTES_PER_FOLDER = 3
+CATEGORIES = ("work", "study", "life")
+
+LIST_ENDPOINTS = [
+    "/api/notes/folders/",
+    "/api/notes/",
+    "/api/notes/categories/",
+    "/api/tags/",
+    "/api/tasks/",
+    "/api/chat/conversations",
+    "/api/pomodoro/sessions",
+]
+
+statements = []
+
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+async def seed(client, user_id: int, headers: dict, size: int) -> dict:
+    """准备 size 个文件夹（每个含 NOTES_PER_FOLDER 篇带标签的笔记）及同样数量的任务、对话和番茄钟记录，返回各文件夹的笔记数"""
+    note_counts = {}
+    for i in range(size):
+        category = CATEGORIES[i % 3]
+        response = await client.post("/api/notes/folders/", json={"name": f"文件夹 {i}", "category": category}, headers=headers)
+        folder_id = response.json()["id"]
+        note_counts[folder_id] = NOTES_PER_FOLDER
+        for j in range(NOTES_PER_FOLDER):
+            response = await client.post("/api/notes/", json={
+                "title": f"笔记 {i}-{j}", "content": "内容", "category": category,
+                "folder_id": folder_id, "tags": [f"标签{j}", f"文件夹{i}"]
+            }, headers=headers)
+            assert response.status_code == 200, response.text
+        response = await client.post("/api/tasks/", json={
+            "title": f"任务 {i}", "category": category, "tags": [f"标签{i % 5}"],
+            "subtasks": [{"title": "子任务", "completed": False}]
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        response = await client.post("/api/pomodoro/sessions", json={"session_type": "work", "duration": 25}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    with SessionLocal() as db:
+        for i in range(size):
+            conversation = Conversation(title=f"对话 {i}", user_id=user_id)
+            db.add(conversation)
+            db.flush()
+            db.add(Message(conversation_id=conversation.id, role="user", content="你好"))
+        db.commit()
+    return note_counts
+
+async def count_statements(client, path: str, headers: dict):
+    """请求接口，返回 (响应, 执行的语句列表)"""
+    statements.clear()
+    response = await client.get(path, headers=headers)
+    return response, list(statements)
+
+async def main() -> int:
+    run_migrations()
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        users = {}
+        for label, size in (("small", SMALL), ("large", LARGE)):
+            user_id, headers = create_user(f"queries-{label}")
+            users[label] = (headers, await seed(client, user_id, headers, size))
+
+        event.listen(engine, "before_cursor_execute", record_statement)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record_statement)
+
+        for path in LIST_ENDPOINTS:
+            counts = {}
+            for label, (headers, _) in users.items():
+                # 先请求一次，排除连接建立等首次请求的开销
+                await count_statements(client, path, headers)
+                response, executed = await count_statements(client, path, headers)
+                assert response.status_code == 200, f"{path}: {response.status_code} {response.text[:200]}"
+                counts[label] = (len(response.json()), executed)
+            (small_rows, small_statements), (large_rows, large_statements) = counts["small"], counts["large"]
+            check(
+                path,
+                len(small_statements) == len(large_statements),
+                f"{small_rows} 项 {len(small_statements)} 条语句，{large_rows} 项 {len(large_statements)} 条语句"
+            )
+            if len(small_statements) != len(large_statements):
+                repeated = Counter(large_statements).most_common(1)[0]
+                print(f"   重复最多的语句（{repeated[1]} 次）: {' '.join(repeated[0].split())[:160]}")
+
+        # 文件夹侧栏：一条查询取得文件夹和笔记数，且笔记数正确
+        headers, note_counts = users["large"]
+        response, executed = await count_statements(client, "/api/notes/folders/", headers)
+        folder_queries = [statement for statement in executed if "FROM folders" in statement]
+        returned = {folder["id"]: folder["note_count"] for folder in response.json()}
+        check(
+            "文件夹笔记数",
+            len(folder_queries) == 1 and returned == note_counts,
+            f"{len(returned)} 个文件夹用 {len(folder_queries)} 条查询，笔记数与实际{'一致' if returned == note_counts else '不一致'}"
+        )
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 列表接口的语句数不随数据量增长")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,165 @@
+"""检查热点查询的执行计划是否使用了对应的复合索引
+
+在临时SQLite数据库上执行全部迁移，对各路由的常用查询运行 EXPLAIN QUERY PLAN，
+未使用预期索引或需要额外排序时以非零状态退出：
+
+    python check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'plans.db')}"
+
+from sqlalchemy import select, func, and_
+
+from database import engine, run_migrations
+from models import Note, Folder, Task, Conversation, Message, PomodoroSession, AIUsage, SyncChange
+from tags import tag_filter, tag_counts_query
+
+USER_ID = 1
+SINCE = datetime(2024, 1, 1)
+
+# (名称, 查询, 预期使用的索引, 是否允许额外排序)
+HOT_QUERIES = [
+    (
+        "笔记列表",
+        select(Note).where(Note.user_id == USER_ID)
+        .order_by(Note.updated_at.desc(), Note.id.desc()).limit(50),
+        "ix_notes_user_id_updated_at", False
+    ),
+    (
+        "文件夹内笔记列表",
+        select(Note).where(Note.user_id == USER_ID, Note.folder_id == 1)
+        .order_by(Note.updated_at.desc(), Note.id.desc()).limit(50),
+        "ix_notes_user_id_folder_id", False
+    ),
+    (
+        "文件夹笔记数量",
+        select(Folder, func.count(Note.id)).outerjoin(
+            Note, and_(Note.folder_id == Folder.id, Note.user_id == USER_ID)
+        ).where(Folder.user_id == USER_ID).group_by(Folder.id),
+        "ix_notes_user_id_folder_id", True
+    ),
+    (
+        "文件夹列表",
+        select(Folder).where(Folder.user_id == USER_ID, Folder.category == "work"),
+        "ix_folders_user_id_category", True
+    ),
+    (
+        "按标签筛选笔记",
+        select(Note.id).where(Note.user_id == USER_ID, tag_filter("note", Note.id, USER_ID, ["a", "b"], "all")),
+        "ix_note_tags_tag_id", True
+    ),
+    (
+        "按标签筛选任务",
+        select(Task.id).where(Task.user_id == USER_ID, tag_filter("task", Task.id, USER_ID, ["a"])),
+        "ix_task_tags_tag_id", True
+    ),
+    (
+        "标签计数",
+        tag_counts_query(USER_ID),
+        "ix_note_tags_tag_id", True
+    ),
+    (
+        "笔记集合版本",
+        select(func.count(), func.max(Note.updated_at)).where(Note.user_id == USER_ID),
+        # 两个以 (user_id, ..., updated_at) 开头的索引都可以覆盖该查询
+        "ix_notes_user_id_", False
+    ),
+    (
+        "任务集合版本",
+        select(func.count(), func.max(Task.updated_at)).where(Task.user_id == USER_ID),
+        "ix_tasks_user_id_updated_at", False
+    ),
+    (
+        "任务列表",
+        select(Task).where(Task.user_id == USER_ID)
+        .order_by(Task.created_at.desc(), Task.id.desc()).limit(50),
+        "ix_tasks_user_id_created_at", False
+    ),
+    (
+        "按状态筛选任务",
+        select(Task).where(Task.user_id == USER_ID, Task.status == "todo"),
+        "ix_tasks_user_id_status", True
+    ),
+    (
+        "任务统计",
+        select(Task.status, func.count(Task.id)).where(Task.user_id == USER_ID).group_by(Task.status),
+        "ix_tasks_user_id_status", False
+    ),
+    (
+        "对话列表",
+        select(Conversation).where(Conversation.user_id == USER_ID)
+        .order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(50),
+        "ix_conversations_user_id_updated_at", False
+    ),
+    (
+        "对话上下文",
+        select(Message.id, Message.role, Message.content).where(Message.conversation_id == 1)
+        .order_by(Message.created_at.desc(), Message.id.desc()).limit(201),
+        "ix_messages_conversation_id_created_at", False
+    ),
+    (
+        "番茄钟统计",
+        select(func.count(PomodoroSession.id)).where(
+            PomodoroSession.user_id == USER_ID, PomodoroSession.started_at >= SINCE
+        ),
+        "ix_pomodoro_sessions_user_id_started_at", False
+    ),
+    (
+        "任务番茄钟记录",
+        select(PomodoroSession).where(PomodoroSession.task_id == 1),
+        "ix_pomodoro_sessions_task_id", True
+    ),
+    (
+        "AI用量汇总",
+        select(AIUsage.operation, AIUsage.model, func.count(AIUsage.id), func.sum(AIUsage.tokens_used))
+        .where(AIUsage.user_id == USER_ID).group_by(AIUsage.operation, AIUsage.model),
+        "ix_ai_usage_user_id_created_at", True
+    ),
+    (
+        "本月AI用量",
+        select(func.count(AIUsage.id), func.sum(AIUsage.tokens_used)).where(
+            AIUsage.user_id == USER_ID, AIUsage.created_at >= SINCE
+        ),
+        "ix_ai_usage_user_id_created_at", False
+    ),
+    (
+        "增量同步",
+        select(SyncChange.id, SyncChange.entity, SyncChange.entity_id, SyncChange.deleted)
+        .where(SyncChange.user_id == USER_ID, SyncChange.id > 100).order_by(SyncChange.id).limit(1001),
+        "ix_sync_changes_user_id_id", False
+    ),
+]
+
+def explain(connection, stmt):
+    """返回查询计划的每一步描述"""
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+def main() -> int:
+    run_migrations()
+
+    failures = 0
+    with engine.connect() as connection:
+        for name, stmt, index_name, allow_sort in HOT_QUERIES:
+            plan = explain(connection, stmt)
+            uses_index = any(index_name in step for step in plan)
+            sorts = any("TEMP B-TREE" in step for step in plan) and not allow_sort
+            ok = uses_index and not sorts
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name}: {' | '.join(plan)}")
+
+    if failures:
+        print(f"❌ {failures} 个查询未使用预期索引")
+        return 1
+    print("✅ 所有热点查询均使用索引")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
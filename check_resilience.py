@@ -0,0 +1,129 @@
+"""检查上游重试、熔断和请求截止时间在注入延迟和错误时的表现
+
+使用进程内的模拟上游（fake_upstream.FakeUpstream），依次注入随机503、带 Retry-After 的429、
+上游挂起，以及熔断冷却后的恢复；关闭模型回退，只检查单条路径上的弹性层。任一项不符合预期时以非零状态退出：
+
+    python check_resilience.py
+"""
+import os
+import sys
+import time
+import asyncio
+import random
+import collections
+
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+os.environ["AI_MODEL_FALLBACK"] = "false"
+os.environ["AI_MAX_RETRIES"] = "2"
+os.environ["AI_RETRY_BASE_DELAY"] = "0.01"
+os.environ["AI_RETRY_MAX_DELAY"] = "1"
+os.environ["AI_REQUEST_TIMEOUT"] = "0.2"
+os.environ["AI_CIRCUIT_FAILURE_THRESHOLD"] = "5"
+os.environ["AI_CIRCUIT_RESET_TIMEOUT"] = "0.5"
+
+import httpx
+from fastapi import HTTPException
+
+from ai_service import ai_service
+from ai_resilience import upstream_resilience, request_deadline
+from model_router import model_router
+from fake_upstream import FakeUpstream
+
+MODEL = "gpt-4o-mini"
+CALLS = 200
+CONCURRENCY = 20
+
+upstream = FakeUpstream(seed=7, delay=0.005)
+counter = 0
+
+async def call(deadline: float = None):
+    """发起一次不会被合并的请求，返回 (状态码, 耗时秒)"""
+    global counter
+    counter += 1
+    token = request_deadline.set(time.monotonic() + deadline if deadline is not None else None)
+    started = time.perf_counter()
+    try:
+        await ai_service.chat_completion([{"role": "user", "content": f"resilience-{counter}"}], MODEL)
+        status = 200
+    except HTTPException as e:
+        status = e.status_code
+    finally:
+        request_deadline.reset(token)
+    return status, time.perf_counter() - started
+
+async def burst(n: int, concurrency: int, deadline: float = None):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await call(deadline)
+
+    results = await asyncio.gather(*[one() for _ in range(n)])
+    return collections.Counter(status for status, _ in results), [elapsed for _, elapsed in results]
+
+async def main() -> int:
+    random.seed(7)
+    ai_service._client = httpx.AsyncClient(transport=upstream.transport())
+    route_key = model_router.routes_for(MODEL)[0].key
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    # 1. 20% 的请求随机返回503：关闭重试与开启重试对比成功率
+    upstream.configure(fail_rate=0.2, fail_status=503)
+    upstream_resilience.max_retries = 0
+    no_retry, _ = await burst(CALLS, CONCURRENCY)
+    upstream_resilience.max_retries = 2
+    upstream.reset_stats()
+    with_retry, _ = await burst(CALLS, CONCURRENCY)
+    check(
+        "随机503",
+        with_retry[200] >= CALLS * 0.97 and with_retry[200] > no_retry[200],
+        f"不重试成功 {no_retry[200]}/{CALLS}，重试后成功 {with_retry[200]}/{CALLS}，上游请求 {upstream.calls[MODEL]} 次"
+    )
+    upstream.configure(fail_rate=0.0)
+    await call()  # 成功一次，重置连续失败计数
+
+    # 2. 429 + Retry-After：等待上游要求的时间后重试成功
+    upstream.configure(fail_next=1, fail_status=429, retry_after=0.3)
+    status, elapsed = await call()
+    check("429 Retry-After", status == 200 and elapsed >= 0.3, f"状态 {status}，耗时 {elapsed * 1000:.0f}ms")
+    upstream.configure(retry_after=None, fail_status=503)
+
+    # 3. 请求截止时间：上游挂起时在截止时间内返回504，而不是等待所有重试
+    upstream.configure(delay=5)
+    status, elapsed = await call(deadline=0.3)
+    check("截止时间", status == 504 and elapsed < 0.4, f"状态 {status}，耗时 {elapsed * 1000:.0f}ms")
+
+    # 4. 上游挂起：单次尝试超时，连续失败达到阈值后熔断，之后的请求不再访问上游
+    upstream.reset_stats()
+    hung, _ = await burst(4, 1)
+    calls_before = upstream.calls[MODEL]
+    short, elapsed = await burst(20, 5)
+    check(
+        "上游挂起后熔断",
+        upstream_resilience.circuit_state(route_key) == "open" and short == {503: 20}
+        and upstream.calls[MODEL] == calls_before and max(elapsed) < 0.05,
+        f"挂起期间 {dict(hung)}，熔断后 {dict(short)}，最慢 {max(elapsed) * 1000:.1f}ms，上游请求 {calls_before} 次"
+    )
+
+    # 5. 冷却后上游恢复：放行探测请求，成功后熔断关闭
+    upstream.configure(delay=0.005)
+    await asyncio.sleep(upstream_resilience.reset_timeout)
+    status, _ = await call()
+    check("熔断恢复", status == 200 and upstream_resilience.circuit_state(route_key) == "closed", f"状态 {status}")
+
+    print(upstream_resilience.stats()["circuits"][route_key])
+    await ai_service.close()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 重试、熔断和截止时间符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
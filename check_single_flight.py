@@ -0,0 +1,117 @@
+"""检查相同的并发AI请求是否只触发一次上游调用
+
+使用进程内的模拟上游（固定延迟、记录调用次数），并发发起20个相同请求，
+上游调用次数不为1、或某个请求的截止时间影响了其他请求时以非零状态退出：
+
+    python check_single_flight.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+import httpx
+from fastapi import HTTPException
+
+from ai_service import ai_service
+from ai_resilience import request_deadline
+
+CONCURRENCY = 20
+UPSTREAM_DELAY = 0.2
+
+upstream_calls = []
+
+async def fake_upstream(request: httpx.Request) -> httpx.Response:
+    """模拟上游：返回固定的标签结果；请求内容包含 "bad" 时返回400"""
+    payload = json.loads(request.content)
+    upstream_calls.append(payload)
+    await asyncio.sleep(UPSTREAM_DELAY)
+    if "bad" in payload["messages"][-1]["content"]:
+        return httpx.Response(400, json={"error": "bad request"})
+    content = json.dumps({"tags": ["笔记", "测试"], "confidence": 0.9}, ensure_ascii=False)
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": content}}],
+        "usage": {"total_tokens": 10}
+    })
+
+async def fire(title: str, content: str):
+    """并发发起相同请求（跳过响应缓存），返回各请求的结果或异常"""
+    return await asyncio.gather(
+        *[ai_service.generate_tags(title, content, use_cache=False) for _ in range(CONCURRENCY)],
+        return_exceptions=True
+    )
+
+async def with_deadline(timeout, coro):
+    """在带请求截止时间的上下文中执行（相当于 X-Request-Timeout 请求头）"""
+    if timeout is not None:
+        request_deadline.set(time.monotonic() + timeout)
+    return await coro
+
+async def fire_with_deadlines(timeouts):
+    """按各自的截止时间并发发起相同请求"""
+    return await asyncio.gather(
+        *[with_deadline(t, ai_service.generate_tags("截止时间", "共享调用", use_cache=False)) for t in timeouts],
+        return_exceptions=True
+    )
+
+async def main() -> int:
+    ai_service._client = httpx.AsyncClient(transport=httpx.MockTransport(fake_upstream))
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    results = await fire("周会纪要", "讨论了下周的发布计划")
+    ok = len(upstream_calls) == 1 and all(isinstance(r, dict) and r["tags"] == ["笔记", "测试"] for r in results)
+    check(f"{CONCURRENCY}个相同请求", ok, f"上游调用 {len(upstream_calls)} 次")
+
+    upstream_calls.clear()
+    results = await fire("周会纪要", "bad")
+    ok = len(upstream_calls) == 1 and all(isinstance(r, HTTPException) and r.status_code == 400 for r in results)
+    check(f"{CONCURRENCY}个相同的失败请求", ok, f"上游调用 {len(upstream_calls)} 次，均返回 {results[0]!r}")
+
+    upstream_calls.clear()
+    await fire("周会纪要", "讨论了下周的发布计划")
+    check("上一批完成后再次请求", len(upstream_calls) == 1, f"上游调用 {len(upstream_calls)} 次")
+
+    upstream_calls.clear()
+    await asyncio.gather(fire("周会纪要", "内容A"), fire("周会纪要", "内容B"))
+    check("两组不同的请求", len(upstream_calls) == 2, f"上游调用 {len(upstream_calls)} 次")
+
+    upstream_calls.clear()
+    results = await fire_with_deadlines([UPSTREAM_DELAY / 4] + [None] * (CONCURRENCY - 1))
+    ok = (
+        len(upstream_calls) == 1
+        and isinstance(results[0], HTTPException) and results[0].status_code == 504
+        and all(isinstance(r, dict) for r in results[1:])
+    )
+    check("发起者截止时间较短", ok, f"上游调用 {len(upstream_calls)} 次，发起者 {results[0]!r}")
+
+    upstream_calls.clear()
+    results = await fire_with_deadlines([None] + [UPSTREAM_DELAY / 4] * (CONCURRENCY - 1))
+    ok = isinstance(results[0], dict) and all(isinstance(r, HTTPException) and r.status_code == 504 for r in results[1:])
+    check("等待者截止时间较短", ok, f"上游调用 {len(upstream_calls)} 次，发起者得到结果")
+
+    upstream_calls.clear()
+    results = await fire_with_deadlines([UPSTREAM_DELAY / 4] * CONCURRENCY)
+    await asyncio.sleep(0)
+    ok = all(isinstance(r, HTTPException) and r.status_code == 504 for r in results) and not ai_service._inflight
+    check("所有等待者都超时", ok, "共享调用已取消")
+
+    check("进行中的请求已清理", not ai_service._inflight, f"剩余 {len(ai_service._inflight)} 个")
+
+    await ai_service.close()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 相同的并发请求共享同一次上游调用")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
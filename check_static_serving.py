@@ -0,0 +1,136 @@
+"""检查前端静态文件服务的缓存头、压缩、304与路径处理，并与改造前的逐请求读文件方式对比吞吐
+
+使用进程内的ASGI客户端请求 main.app（静态文件清单），与按改造前方式（每次请求检查文件系统并返回
+FileResponse）实现的对照应用比较构建产物和SPA回退路由的每秒请求数。任一项不符合预期时以非零状态退出：
+
+    python check_static_serving.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'static.db')}"
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse
+
+from main import app
+from static_files import static_manifest, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+
+REQUESTS = 300
+SPA_ROUTE = "/notes/42"
+
+# 对照应用使用与 main.app 相同的中间件，只替换前端路由
+baseline_app = FastAPI()
+baseline_app.user_middleware = list(app.user_middleware)
+
+@baseline_app.get("/{full_path:path}")
+async def baseline_frontend(full_path: str):
+    """改造前的前端路由：每次请求检查文件是否存在并以 FileResponse 返回"""
+    if full_path.startswith("api/"):
+        raise HTTPException(status_code=404, detail="API endpoint not found")
+    static_file_path = f"static/{full_path}"
+    if os.path.exists(static_file_path) and os.path.isfile(static_file_path):
+        return FileResponse(static_file_path)
+    if os.path.exists("static/index.html"):
+        return FileResponse("static/index.html")
+    raise HTTPException(status_code=404, detail="File not found")
+
+def hashed_asset() -> str:
+    """清单中最大的带哈希构建产物"""
+    assets = [path for path, f in static_manifest.files.items() if f.cache_control == IMMUTABLE_CACHE_CONTROL]
+    return max(assets, key=lambda path: len(static_manifest.files[path].bodies["identity"]))
+
+async def throughput(target, path: str) -> float:
+    """顺序发起请求并读取原始响应体（不在客户端解压），返回每秒请求数"""
+    headers = {"Accept-Encoding": "gzip, br"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=target), base_url="http://static-check") as client:
+        started = None
+        for i in range(REQUESTS + 1):
+            async with client.stream("GET", path, headers=headers) as response:
+                assert response.status_code == 200
+                async for _ in response.aiter_raw():
+                    pass
+            if i == 0:
+                # 第一次请求为预热
+                started = time.perf_counter()
+        return REQUESTS / (time.perf_counter() - started)
+
+async def main() -> int:
+    if not os.path.isfile("static/index.html"):
+        print("❌ 未找到 static/index.html，请在项目根目录运行")
+        return 1
+    static_manifest.load()
+    asset = hashed_asset()
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://static-check") as client:
+        with open(f"static/{asset}", "rb") as f:
+            asset_content = f.read()
+        with open("static/index.html", "rb") as f:
+            index_content = f.read()
+
+        response = await client.get(f"/{asset}", headers={"Accept-Encoding": "gzip"})
+        # httpx 自动解压响应内容，传输的字节数为压缩后的大小
+        encoding = response.headers.get("content-encoding")
+        check(
+            "构建产物",
+            response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL and encoding == "gzip"
+            and response.content == asset_content and response.headers.get("vary") == "Accept-Encoding",
+            f"/{asset} {response.headers['cache-control']}，{encoding} {response.num_bytes_downloaded / 1024:.0f}KB / {len(asset_content) / 1024:.0f}KB"
+        )
+
+        revalidated = await client.get(f"/{asset}", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]
+        })
+        identity = await client.get(f"/{asset}", headers={"Accept-Encoding": "identity"})
+        check(
+            "ETag与304",
+            revalidated.status_code == 304 and not revalidated.content
+            and identity.headers["etag"] != response.headers["etag"] and identity.content == asset_content,
+            f"If-None-Match 返回 {revalidated.status_code}，未压缩版本使用不同的ETag {identity.headers['etag']}"
+        )
+
+        spa = await client.get(SPA_ROUTE, headers={"Accept-Encoding": "identity"})
+        check(
+            "SPA回退",
+            spa.status_code == 200 and spa.content == index_content
+            and spa.headers["cache-control"] == REVALIDATE_CACHE_CONTROL,
+            f"{SPA_ROUTE} 返回 index.html，{spa.headers['cache-control']}"
+        )
+
+        missing = await client.get("/assets/index-missing0.js")
+        api = await client.get("/api/missing")
+        traversal = [
+            await client.get(path, headers={"Accept-Encoding": "identity"})
+            for path in ("/%2e%2e/main.py", "/assets/%2e%2e/%2e%2e/main.py", "/..%2fmain.py")
+        ]
+        check(
+            "未知路径",
+            missing.status_code == 404 and api.status_code == 404
+            and all(r.status_code == 200 and r.content == index_content for r in traversal)
+            and static_manifest.lookup("../main.py") is static_manifest.files["index.html"],
+            f"缺失的构建产物 {missing.status_code}，未知API {api.status_code}，含 .. 的路径均返回 index.html"
+        )
+
+    for name, path in (("构建产物", f"/{asset}"), ("SPA回退", SPA_ROUTE)):
+        before, after = await throughput(baseline_app, path), await throughput(app, path)
+        check(f"{name}吞吐", after > before, f"改造前 {before:.0f} req/s，清单 {after:.0f} req/s（{after / before:.1f}倍）")
+
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 静态文件服务符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,226 @@
+"""检查增量同步 /api/sync 的游标正确性，并比较增量同步与重新拉取完整列表的传输量和耗时
+
+在临时SQLite数据库上写入50000条数据（笔记和任务），由数据库触发器记录变更日志。客户端在本地维护一份副本：
+先以 since=0 分页全量同步，再分别模拟落后1分钟（少量通过接口的修改、新建和删除）和落后1周（约10%的数据被修改或删除，
+需要多页）的客户端增量同步，每次同步后副本都应与服务端数据一致，且没有遗漏或重复；分页过程中插入的修改和删除也应在后续页中返回。
+最后清理墓碑，确认早于水位线的游标得到410，而 since=0 的全量同步仍可以分页越过水位线。并打印各场景与重新拉取笔记和任务完整列表的传输量和耗时。
+任一项不符合预期时以非零状态退出：
+
+    python check_sync.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'sync.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from sqlalchemy import insert, select, update, delete
+
+from database import engine, async_engine, run_migrations
+from models import Note, Task
+from sync_log import sync_log
+from local_app import create_user, app_client
+
+NOTES = 40000
+TASKS = 10000
+PAGE_SIZE = 5000
+# 落后1周的客户端：被修改和被删除的数据比例
+WEEK_UPDATED = 0.08
+WEEK_DELETED = 0.02
+# 落后1分钟的增量同步相对重新拉取完整列表的最低提速
+MIN_SPEEDUP = 20.0
+
+# 响应中的集合名 -> 模型
+COLLECTIONS = {"notes": Note, "tasks": Task}
+
+def seed(user_id: int):
+    now = datetime.utcnow() - timedelta(days=7)
+    with engine.begin() as conn:
+        conn.execute(insert(Note), [
+            {"title": f"笔记 {i}", "content": "同步" * 100, "category": "work", "tags": "[]",
+             "user_id": user_id, "created_at": now, "updated_at": now}
+            for i in range(NOTES)
+        ])
+        conn.execute(insert(Task), [
+            {"title": f"任务 {i}", "category": "work", "user_id": user_id, "created_at": now, "updated_at": now}
+            for i in range(TASKS)
+        ])
+
+def server_state() -> dict:
+    """服务端当前的笔记和任务：{(集合名, id): 标题}"""
+    state = {}
+    with engine.connect() as conn:
+        for collection, model in COLLECTIONS.items():
+            for row_id, title in conn.execute(select(model.id, model.title)):
+                state[(collection, row_id)] = title
+    return state
+
+async def sync(client, headers: dict, replica: dict, since: int, limit: int = PAGE_SIZE, between_pages=None) -> dict:
+    """从 since 开始分页增量同步并应用到副本，返回统计；between_pages 在第一页之后调用一次，用于模拟分页期间的写入"""
+    cursor, pages, transferred, upserted, deleted = since, 0, 0, 0, 0
+    seen = set()
+    duplicates = 0
+    started = time.perf_counter()
+    while True:
+        response = await client.get("/api/sync", params={"since": cursor, "limit": limit}, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages += 1
+        transferred += len(response.content)
+        for collection in COLLECTIONS:
+            for row in body["changes"][collection]["upserted"]:
+                key = (collection, row["id"])
+                duplicates += key in seen
+                seen.add(key)
+                replica[key] = row["title"]
+                upserted += 1
+            for row_id in body["changes"][collection]["deleted"]:
+                replica.pop((collection, row_id), None)
+                deleted += 1
+        assert abs(body["cursor"]) >= abs(cursor)
+        cursor = body["cursor"]
+        if between_pages and pages == 1:
+            await between_pages()
+        if not body["has_more"]:
+            break
+    return {
+        "cursor": cursor, "pages": pages, "bytes": transferred, "upserted": upserted, "deleted": deleted,
+        "duplicates": duplicates, "seconds": time.perf_counter() - started
+    }
+
+async def refetch(client, headers: dict) -> dict:
+    """对照：重新拉取笔记和任务的完整列表"""
+    started = time.perf_counter()
+    transferred = 0
+    for path in ("/api/notes/", "/api/tasks/"):
+        response = await client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+        transferred += len(response.content)
+    return {"bytes": transferred, "seconds": time.perf_counter() - started}
+
+async def main() -> int:
+    run_migrations()
+    user_id, headers = create_user("sync-check")
+    seed(user_id)
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    def report(label: str, result: dict, baseline: dict):
+        print(
+            f"   {label}: {result['pages']} 页，{result['bytes'] / 1024:.0f}KB，{result['seconds'] * 1000:.0f}ms"
+            f"（重新拉取完整列表 {baseline['bytes'] / 1024:.0f}KB，{baseline['seconds'] * 1000:.0f}ms）"
+        )
+
+    async with app_client() as client:
+        baseline = await refetch(client, headers)
+        replica = {}
+
+        # 1. since=0 全量同步
+        full = await sync(client, headers, replica, 0)
+        report("全量同步", full, baseline)
+        check(
+            "全量同步",
+            replica == server_state() and full["upserted"] == NOTES + TASKS and full["duplicates"] == 0
+            and full["pages"] == (NOTES + TASKS) // PAGE_SIZE,
+            f"{full['upserted']} 条，{full['pages']} 页，重复 {full['duplicates']} 条"
+        )
+        cursor = full["cursor"]
+
+        # 2. 落后1分钟：少量通过接口的修改、新建和删除
+        note_ids = sorted(row_id for collection, row_id in replica if collection == "notes")
+        task_ids = sorted(row_id for collection, row_id in replica if collection == "tasks")
+        for note_id in note_ids[:5]:
+            await client.put(f"/api/notes/{note_id}", json={"title": f"已修改 {note_id}"}, headers=headers)
+        await client.put(f"/api/tasks/{task_ids[0]}", json={"title": "已修改的任务"}, headers=headers)
+        for i in range(3):
+            await client.post("/api/notes/", json={"title": f"新笔记 {i}", "category": "work"}, headers=headers)
+        await client.delete(f"/api/notes/{note_ids[-1]}", headers=headers)
+        await client.delete(f"/api/tasks/{task_ids[-1]}", headers=headers)
+        baseline = await refetch(client, headers)
+        minute = await sync(client, headers, replica, cursor)
+        report("落后1分钟", minute, baseline)
+        speedup = baseline["seconds"] / minute["seconds"]
+        check(
+            "落后1分钟",
+            replica == server_state() and minute["upserted"] == 9 and minute["deleted"] == 2 and minute["pages"] == 1
+            and speedup >= MIN_SPEEDUP,
+            f"{minute['upserted']} 条修改/新建、{minute['deleted']} 条删除，比重新拉取完整列表快 {speedup:.0f}x"
+            f"（要求不低于 {MIN_SPEEDUP:.0f}x）"
+        )
+        cursor = minute["cursor"]
+
+        # 3. 落后1周：约10%的数据被修改或删除，需要多页
+        updated_notes = note_ids[:int(NOTES * WEEK_UPDATED)]
+        deleted_notes = note_ids[-int(NOTES * WEEK_DELETED):-1]
+        updated_tasks = task_ids[:int(TASKS * WEEK_UPDATED)]
+        with engine.begin() as conn:
+            conn.execute(update(Note).where(Note.id.in_(updated_notes)).values(title="本周修改", updated_at=datetime.utcnow()))
+            conn.execute(update(Task).where(Task.id.in_(updated_tasks)).values(title="本周修改", updated_at=datetime.utcnow()))
+            conn.execute(delete(Note).where(Note.id.in_(deleted_notes)))
+        baseline = await refetch(client, headers)
+        week = await sync(client, headers, replica, cursor, limit=1000)
+        report("落后1周", week, baseline)
+        expected_upserts = len(updated_notes) + len(updated_tasks)
+        check(
+            "落后1周",
+            replica == server_state() and week["upserted"] == expected_upserts
+            and week["deleted"] == len(deleted_notes) and week["duplicates"] == 0 and week["pages"] > 1,
+            f"{week['upserted']} 条修改、{week['deleted']} 条删除（预期 {expected_upserts} 条、{len(deleted_notes)} 条），"
+            f"{week['pages']} 页，重复 {week['duplicates']} 条"
+        )
+        cursor = week["cursor"]
+
+        # 4. 分页期间的写入：已返回的数据被修改、尚未返回的数据被删除，都应在后续页中返回
+        with engine.begin() as conn:
+            conn.execute(update(Note).where(Note.id.in_(note_ids[:3000])).values(title="分页前修改"))
+
+        async def write_between_pages():
+            with engine.begin() as conn:
+                conn.execute(update(Note).where(Note.id == note_ids[0]).values(title="分页期间修改"))
+                conn.execute(delete(Note).where(Note.id == note_ids[2500]))
+                conn.execute(insert(Note).values(title="分页期间新建", category="work", tags="[]", user_id=user_id))
+
+        during = await sync(client, headers, replica, cursor, limit=1000, between_pages=write_between_pages)
+        check(
+            "分页期间的写入",
+            replica == server_state() and replica[("notes", note_ids[0])] == "分页期间修改"
+            and ("notes", note_ids[2500]) not in replica,
+            f"{during['pages']} 页，{during['upserted']} 条修改/新建、{during['deleted']} 条删除，副本与服务端一致"
+        )
+        cursor = during["cursor"]
+
+        # 5. 清理墓碑：早于水位线的游标得到410，最新的游标和分页越过水位线的全量同步不受影响
+        tombstone_days = sync_log.tombstone_days
+        sync_log.tombstone_days = -1
+        compacted = sync_log.compact()
+        sync_log.tombstone_days = tombstone_days
+        expired = await client.get("/api/sync", params={"since": full["cursor"]}, headers=headers)
+        current = await client.get("/api/sync", params={"since": cursor}, headers=headers)
+        resynced = {}
+        resync = await sync(client, headers, resynced, 0)
+        check(
+            "墓碑清理",
+            expired.status_code == 410 and current.status_code == 200 and not current.json()["has_more"]
+            and resynced == server_state() and resync["pages"] > 1 and resync["duplicates"] == 0,
+            f"清理 {compacted['superseded']} 条被覆盖的变更、{compacted['tombstones']} 个墓碑；过期游标状态 {expired.status_code}，"
+            f"最新游标状态 {current.status_code}，重新全量同步 {resync['pages']} 页、{len(resynced)} 条与服务端一致"
+        )
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 增量同步的游标正确")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
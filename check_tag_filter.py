@@ -0,0 +1,154 @@
+"""检查按标签筛选笔记的结果与JSON列一致，并比较标签索引与扫描JSON列的耗时
+
+在临时SQLite数据库上先迁移到 0003，直接写入50000篇带JSON标签的笔记（500个标签，频率不均），
+再升级到最新版本，由迁移 0004 回填标签关联表。之后通过接口按常见标签、罕见标签、多个标签（any/all）筛选，
+结果应与按JSON列计算的预期一致；并打印回填、LIKE扫描、标签索引查询和接口的耗时。任一项不符合预期时以非零状态退出：
+
+    python check_tag_filter.py
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'tags.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import select, text
+
+from database import SessionLocal, engine, async_engine, ALEMBIC_INI
+from models import User, Note
+from tags import tag_filter
+from routers.auth import create_access_token, token_claims
+from local_app import app_client
+
+NOTES = 50000
+TAGS = 500
+TAGS_PER_NOTE = 3
+ROUNDS = 7
+# 标签索引查询相对LIKE扫描的最低提速：罕见标签应明显更快；常见标签（约13%的笔记）命中行多，只要求不慢于扫描
+MIN_SPEEDUP = {"tag0": 1.0, "tag400": 5.0}
+
+# (名称, 标签, 模式)
+FILTERS = [
+    ("常见标签", ["tag0"], "any"),
+    ("罕见标签", ["tag400"], "any"),
+    ("任一标签", ["tag3", "tag300"], "any"),
+    ("全部标签", ["tag0", "tag1"], "all"),
+    ("不存在的标签", ["missing"], "any"),
+]
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    return config
+
+def seeded_tags() -> list:
+    """每篇笔记的标签：标签序号按平方分布抽取，序号越小越常见"""
+    rng = random.Random(0)
+    return [
+        list(dict.fromkeys(f"tag{int(TAGS * rng.random() ** 2)}" for _ in range(TAGS_PER_NOTE)))
+        for _ in range(NOTES)
+    ]
+
+def median_ms(run) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def main() -> int:
+    config = alembic_config()
+    command.upgrade(config, "0003")
+    note_tags = seeded_tags()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        # 0003 时的用户表还没有后续迁移增加的列，直接插入
+        user_id = conn.execute(text(
+            "INSERT INTO users (username, hashed_password, is_active, is_superuser, created_at, updated_at) "
+            "VALUES ('tags-check', 'x', 1, 0, :now, :now) RETURNING id"
+        ), {"now": now}).scalar()
+        conn.execute(text(
+            "INSERT INTO notes (title, content, category, tags, user_id, created_at, updated_at) "
+            "VALUES (:title, '', 'work', :tags, :user_id, :now, :updated_at)"
+        ), [
+            {"title": f"笔记 {i}", "tags": json.dumps(tags), "user_id": user_id, "now": now,
+             "updated_at": now - timedelta(seconds=i)}
+            for i, tags in enumerate(note_tags)
+        ])
+        note_ids = [row[0] for row in conn.execute(text("SELECT id FROM notes ORDER BY id"))]
+
+    started = time.perf_counter()
+    command.upgrade(config, "head")
+    print(f"   升级回填 {NOTES} 篇笔记的标签: {time.perf_counter() - started:.1f}s")
+    with SessionLocal() as db:
+        token = create_access_token(token_claims(db.get(User, user_id)), timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        # 1. 筛选结果与JSON列一致
+        for name, tags, mode in FILTERS:
+            match = all if mode == "all" else any
+            expected = {note_id for note_id, names in zip(note_ids, note_tags) if match(tag in names for tag in tags)}
+            response = await client.get(
+                "/api/notes/", params={"tag": tags, "tag_mode": mode, "fields": "tags"}, headers=headers
+            )
+            returned = {note["id"] for note in response.json()}
+            check(
+                f"{name} {'+'.join(tags)}（{mode}）",
+                response.status_code == 200 and returned == expected,
+                f"预期 {len(expected)} 篇，返回 {len(returned)} 篇"
+            )
+
+        # 2. 标签索引与扫描JSON列的耗时
+        for tag, min_speedup in MIN_SPEEDUP.items():
+            with engine.connect() as conn:
+                like_stmt = select(Note.id).where(Note.user_id == user_id, Note.tags.like(f'%"{tag}"%'))
+                index_stmt = select(Note.id).where(Note.user_id == user_id, tag_filter("note", Note.id, user_id, [tag]))
+                like_count = len(conn.execute(like_stmt).all())
+                index_count = len(conn.execute(index_stmt).all())
+                like_ms = median_ms(lambda: conn.execute(like_stmt).all())
+                index_ms = median_ms(lambda: conn.execute(index_stmt).all())
+            check(
+                f"{tag} 全部匹配",
+                like_count == index_count and like_ms / index_ms >= min_speedup,
+                f"{index_count} 篇，LIKE扫描 {like_ms:.1f}ms，标签索引 {index_ms:.1f}ms（{like_ms / index_ms:.1f}x，要求不低于 {min_speedup:.0f}x）"
+            )
+
+        for label, path, params in (
+            ("GET ?tag=tag7&limit=50", "/api/notes/", {"tag": "tag7", "limit": 50}),
+            ("GET ?tag=tag7&tag=tag300&tag_mode=all", "/api/notes/", {"tag": ["tag7", "tag300"], "tag_mode": "all"}),
+            (f"GET /api/tags/（{TAGS} 个标签）", "/api/tags/", {}),
+        ):
+            timings = []
+            for _ in range(ROUNDS):
+                started = time.perf_counter()
+                response = await client.get(path, params=params, headers=headers)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"   {label}: p50 {statistics.median(timings):.1f}ms，{len(response.json())} 项")
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ 标签筛选与JSON列一致")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
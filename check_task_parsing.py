@@ -0,0 +1,115 @@
+"""端到端检查 POST /api/tasks/parse-tasks：AI解析文本后以单条多行INSERT批量创建任务
+
+在临时SQLite数据库上，使用进程内的模拟上游（fake_upstream.FakeUpstream）返回固定的任务列表，
+通过ASGI客户端调用接口，检查返回顺序、字段映射、标签索引，并统计写入 tasks 表的INSERT语句数。
+任一项不符合预期时以非零状态退出：
+
+    python check_task_parsing.py
+"""
+import os
+import sys
+import json
+import asyncio
+import tempfile
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'parse.db')}"
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+import httpx
+from sqlalchemy import event
+
+from database import async_engine, run_migrations
+from ai_service import ai_service
+from fake_upstream import FakeUpstream
+from local_app import create_user, app_client
+
+MODEL = "gpt-4o-mini"
+TASKS = 50
+PROJECTS = ("工作", "学习", "生活")
+CATEGORIES = ("work", "study", "life")
+
+# 模拟AI返回的任务：子任务为标题字符串，截止日期为ISO日期，每隔几项缺少或带有无效的字段
+PARSED_TASKS = [
+    {
+        "title": f"解析任务 {i}",
+        "description": f"第 {i} 项",
+        "priority": ("high", "medium", "low")[i % 3],
+        "due_date": "2024-01-20" if i % 4 else "下周一",
+        "estimated_time": 30 + i,
+        "project": PROJECTS[i % 3],
+        "tags": ["AI解析", f"批次{i % 2}"],
+        "subtasks": [f"子任务 {i}-1", f"子任务 {i}-2"]
+    }
+    for i in range(TASKS)
+]
+
+async def main() -> int:
+    run_migrations()
+    _, headers = create_user("parse-check")
+    upstream = FakeUpstream(content=json.dumps({"tasks": PARSED_TASKS}, ensure_ascii=False))
+    ai_service._client = httpx.AsyncClient(transport=upstream.transport())
+
+    inserts = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO TASKS"):
+            inserts.append(statement)
+
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    async with app_client() as client:
+        response = await client.post("/api/tasks/parse-tasks", json={"text": "整理下周的计划", "model": MODEL}, headers=headers)
+        if response.status_code != 200:
+            print(f"❌ 接口状态: {response.status_code} {response.text[:200]}")
+            await ai_service.close()
+            await async_engine.dispose()
+            return 1
+        body = response.json()
+        tasks = body["tasks"]
+
+        check(
+            "批量插入",
+            body["total_count"] == TASKS and len(inserts) == 1,
+            f"创建 {body['total_count']} 个任务，tasks 表INSERT语句 {len(inserts)} 条，上游请求 {sum(upstream.calls.values())} 次"
+        )
+        check(
+            "返回顺序",
+            [task["title"] for task in tasks] == [task["title"] for task in PARSED_TASKS]
+            and [task["id"] for task in tasks] == sorted(task["id"] for task in tasks),
+            "与AI返回的顺序一致"
+        )
+        check(
+            "字段映射",
+            [task["category"] for task in tasks] == [CATEGORIES[i % 3] for i in range(TASKS)]
+            and all(task["ai_generated"] and task["ai_model"] == MODEL and task["status"] == "todo" for task in tasks)
+            and tasks[1]["subtasks"] == [{"title": "子任务 1-1", "completed": False}, {"title": "子任务 1-2", "completed": False}]
+            and tasks[1]["due_date"].startswith("2024-01-20") and tasks[0]["due_date"] is None,
+            f"分类 {tasks[0]['category']}/{tasks[1]['category']}/{tasks[2]['category']}，"
+            f"子任务 {tasks[1]['subtasks'][0]}，无效日期 {tasks[0]['due_date']}"
+        )
+
+        listed = await client.get("/api/tasks/", params={"tag": "批次1"}, headers=headers)
+        check(
+            "标签索引",
+            listed.status_code == 200 and len(listed.json()) == TASKS // 2,
+            f"按标签“批次1”筛选得到 {len(listed.json()) if listed.status_code == 200 else listed.status_code} 个任务"
+        )
+
+    await ai_service.close()
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ AI解析任务接口符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
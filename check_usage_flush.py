@@ -0,0 +1,128 @@
+"""检查AI用量的批量写入与请求路径的写入共用SQLite写锁，且写入失败的批次只重试有限次数
+
+在临时SQLite数据库上，多个并发请求持续新建笔记的同时，后台记录器反复批量写入用量事件：
+每条 ai_usage 的INSERT都应在异步引擎上、持有写锁时执行，且两类写入全部成功。
+随后放入一条无法写入的事件（operation 为空），确认该批在 max_retries 次失败后被丢弃，之后的事件正常写入。
+任一项不符合预期时以非零状态退出：
+
+    python check_usage_flush.py
+"""
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'usage_flush.db')}"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+from sqlalchemy import event, select, func
+
+from database import SessionLocal, SQLiteAsyncSession, engine, async_engine, run_migrations
+from models import AIUsage, Note
+from ai_usage import UsageRecorder, usage_context
+from local_app import create_user, app_client
+
+# 并发新建笔记的请求数
+CONCURRENT_WRITERS = 5
+# 写入期间记录用量事件的轮数和每轮事件数
+RECORD_ROUNDS = 20
+EVENTS_PER_ROUND = 50
+MAX_RETRIES = 3
+
+async def main() -> int:
+    run_migrations()
+    user_id, headers = create_user("usage-flush-check")
+    recorder = UsageRecorder(flush_interval=0.01, batch_size=EVENTS_PER_ROUND, max_retries=MAX_RETRIES)
+    usage_context.set({"user_id": user_id})
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    # 记录每条 ai_usage 的INSERT执行时所在的引擎以及写锁状态
+    usage_inserts = []
+
+    def watch(engine_name: str):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("INSERT INTO AI_USAGE"):
+                lock = SQLiteAsyncSession._write_lock
+                usage_inserts.append((engine_name, lock is not None and lock.locked()))
+        return before_cursor_execute
+
+    event.listen(engine, "before_cursor_execute", watch("sync"))
+    event.listen(async_engine.sync_engine, "before_cursor_execute", watch("async"))
+
+    # 1. 批量写入与持续新建笔记的请求并发
+    recorder.start()
+    stop = asyncio.Event()
+    write_statuses = []
+
+    async with app_client() as client:
+        async def writer(index: int):
+            count = 0
+            while not stop.is_set():
+                response = await client.post(
+                    "/api/notes/", json={"title": f"笔记 {index}-{count}", "content": "并发写入", "category": "work"},
+                    headers=headers
+                )
+                write_statuses.append(response.status_code)
+                count += 1
+
+        writers = [asyncio.create_task(writer(i)) for i in range(CONCURRENT_WRITERS)]
+        for round_index in range(RECORD_ROUNDS):
+            for i in range(EVENTS_PER_ROUND):
+                recorder.record("gpt-4o-mini", "chat", prompt_tokens=10, completion_tokens=2, latency_ms=round_index)
+            await asyncio.sleep(0.01)
+        await recorder.stop()
+        stop.set()
+        await asyncio.gather(*writers)
+
+    with SessionLocal() as db:
+        usage_rows = db.scalar(select(func.count(AIUsage.id)))
+        note_rows = db.scalar(select(func.count(Note.id)))
+    expected_events = RECORD_ROUNDS * EVENTS_PER_ROUND
+    check(
+        "并发写入",
+        usage_rows == expected_events and recorder.errors == 0
+        and write_statuses.count(200) == len(write_statuses) == note_rows,
+        f"用量 {usage_rows}/{expected_events} 条（{recorder.flushes} 次批量写入，{recorder.errors} 次失败），"
+        f"同时新建笔记 {write_statuses.count(200)}/{len(write_statuses)} 成功"
+    )
+    outside_lock = [insert for insert in usage_inserts if insert != ("async", True)]
+    check(
+        "共用写锁",
+        usage_inserts and not outside_lock,
+        f"ai_usage 的INSERT {len(usage_inserts)} 条，未经异步会话或未持有写锁的 {len(outside_lock)} 条"
+    )
+
+    # 2. 无法写入的批次：连续失败 max_retries 次后丢弃，之后的事件正常写入
+    recorder._buffer.append({
+        "user_id": user_id, "model": "gpt-4o-mini", "operation": None, "prompt_tokens": 0,
+        "completion_tokens": 0, "tokens_used": 0, "latency_ms": 0, "cached": False, "created_at": datetime.utcnow()
+    })
+    for _ in range(MAX_RETRIES + 2):
+        await recorder.flush()
+    failed_attempts, dropped = recorder.errors, recorder.dropped
+    recorder.record("gpt-4o-mini", "chat", prompt_tokens=1, completion_tokens=1)
+    await recorder.flush()
+    with SessionLocal() as db:
+        usage_rows = db.scalar(select(func.count(AIUsage.id)))
+    check(
+        "有限重试",
+        failed_attempts == MAX_RETRIES and dropped == 1 and not recorder._buffer and usage_rows == expected_events + 1,
+        f"写入失败 {failed_attempts} 次后丢弃 {dropped} 条，之后的事件写入后共 {usage_rows} 条"
+    )
+
+    await async_engine.dispose()
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        return 1
+    print("✅ AI用量批量写入符合预期")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
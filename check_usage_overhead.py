@@ -0,0 +1,93 @@
+"""检查AI用量记录对请求路径的额外耗时
+
+在临时SQLite数据库上，使用进程内的模拟上游（无延迟）交替执行关闭/开启用量记录的多轮调用，
+比较每次调用的平均耗时，并确认事件全部批量写入 ai_usage。额外耗时不低于1ms时以非零状态退出：
+
+    python check_usage_overhead.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import statistics
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'usage.db')}"
+os.environ["OPENAI_BASE_URL"] = "http://fake-upstream/v1"
+os.environ["AI_CACHE_DB_PATH"] = ""
+
+import httpx
+from sqlalchemy import select, func
+
+from database import SessionLocal, run_migrations
+from models import User, AIUsage
+from ai_service import ai_service
+from ai_usage import usage_recorder, usage_context
+
+ROUNDS = 10
+CALLS_PER_ROUND = 200
+MAX_OVERHEAD_MS = 1.0
+
+async def fake_upstream(request: httpx.Request) -> httpx.Response:
+    """模拟上游：立即返回带用量的结果"""
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": "ok"}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+    })
+
+async def timed_round(enabled: bool, round_index: int) -> float:
+    """执行一轮调用，返回每次调用的平均耗时（毫秒）"""
+    usage_recorder.enabled = enabled
+    started = time.perf_counter()
+    for i in range(CALLS_PER_ROUND):
+        messages = [{"role": "user", "content": f"{enabled}-{round_index}-{i}"}]
+        await ai_service.chat_completion(messages, "gpt-4o-mini")
+    return (time.perf_counter() - started) * 1000 / CALLS_PER_ROUND
+
+async def main() -> int:
+    run_migrations()
+    db = SessionLocal()
+    user = User(username="usage-check", hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    ai_service._client = httpx.AsyncClient(transport=httpx.MockTransport(fake_upstream))
+    usage_context.set({"user_id": user_id})
+    usage_recorder.start()
+
+    # 预热连接和路由
+    await timed_round(False, -1)
+
+    baseline, tracked = [], []
+    for round_index in range(ROUNDS):
+        baseline.append(await timed_round(False, round_index))
+        tracked.append(await timed_round(True, round_index))
+
+    usage_recorder.enabled = True
+    await usage_recorder.stop()
+    await ai_service.close()
+
+    with SessionLocal() as db:
+        rows, tokens = db.execute(
+            select(func.count(AIUsage.id), func.sum(AIUsage.tokens_used)).where(AIUsage.user_id == user_id)
+        ).one()
+
+    overhead = statistics.median(tracked) - statistics.median(baseline)
+    expected_rows = ROUNDS * CALLS_PER_ROUND
+    print(f"关闭用量记录: 每次调用 {statistics.median(baseline):.3f}ms（中位数）")
+    print(f"开启用量记录: 每次调用 {statistics.median(tracked):.3f}ms（中位数）")
+    print(f"额外耗时: {overhead:.3f}ms，写入 {rows}/{expected_rows} 条、{usage_recorder.flushes} 次批量写入，共 {tokens} tokens")
+    print(json.dumps(usage_recorder.stats(), ensure_ascii=False))
+
+    if overhead >= MAX_OVERHEAD_MS or rows != expected_rows:
+        print("❌ 用量记录额外耗时过高或记录缺失")
+        return 1
+    print(f"✅ 用量记录每次调用额外耗时低于 {MAX_OVERHEAD_MS}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
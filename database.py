@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import asyncio
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,21 +13,185 @@ load_dotenv()
 # 数据库URL配置
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cortex_workspace.db")
 
-# 创建数据库引擎
+def _async_database_url(url: str) -> str:
+    """将同步数据库URL转换为对应的异步驱动URL"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+# 异步数据库URL（默认由DATABASE_URL推导）
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+
+# 数据库配置档：default 保持SQLite默认设置；production 需显式开启，启用WAL等优化和外键约束
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+
+# SQLite连接参数（每个新连接建立时设置）
+SQLITE_PRAGMAS = {
+    # 写入不阻塞读取
+    "journal_mode": "WAL",
+    # WAL模式下仅在检查点时同步，兼顾安全与写入性能
+    "synchronous": "NORMAL",
+    # 数据库被锁定时等待的毫秒数，而不是立即报错
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    # 负数表示以KiB为单位
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024)),
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+}
+
+# 连接池配置
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+# 创建数据库引擎（同步引擎供脚本和同步依赖使用，异步引擎供异步路由使用）
 if DATABASE_URL.startswith("sqlite"):
+    # 内存数据库使用单连接池，不支持连接池大小参数
+    in_memory = DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
+    use_pool_options = DB_PROFILE == "production" and not in_memory
     engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False}
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        **(POOL_OPTIONS if use_pool_options else {})
+    )
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **({"poolclass": AsyncAdaptedQueuePool, **POOL_OPTIONS} if use_pool_options else {})
     )
+
+    if DB_PROFILE == "production":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 else:
-    engine = create_engine(DATABASE_URL)
+    SERVER_POOL_OPTIONS = {
+        **POOL_OPTIONS,
+        # 取用连接前检测连接是否可用，避免使用已被服务端断开的连接
+        "pool_pre_ping": True,
+        # 定期回收连接，避免超过数据库或代理的空闲超时
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    }
+    engine = create_engine(DATABASE_URL, **SERVER_POOL_OPTIONS)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **SERVER_POOL_OPTIONS)
+
+class SQLiteAsyncSession(AsyncSession):
+    """SQLite同一时间只允许一个写事务：会话开始写入时在事件循环内排队，持有写锁直到事务提交或回滚
+
+    否则并发写事务会在驱动线程中忙等写锁，事件循环繁忙时持锁时间被拉长，容易超过busy_timeout。
+    写入包括提交时刷新的ORM变更，以及 insert/update/delete 等直接执行的批量语句。
+    """
+
+    _write_lock: Optional[asyncio.Lock] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._holds_write_lock = False
+
+    async def _acquire_write_lock(self):
+        if self._holds_write_lock:
+            return
+        if SQLiteAsyncSession._write_lock is None:
+            SQLiteAsyncSession._write_lock = asyncio.Lock()
+        await SQLiteAsyncSession._write_lock.acquire()
+        self._holds_write_lock = True
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            SQLiteAsyncSession._write_lock.release()
+
+    def _has_pending_changes(self) -> bool:
+        return bool(self.new or self.dirty or self.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            await self._acquire_write_lock()
+        return await super().execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            await self._acquire_write_lock()
+        return await super().scalar(statement, *args, **kwargs)
+
+    async def flush(self, objects=None):
+        if self._has_pending_changes():
+            await self._acquire_write_lock()
+        return await super().flush(objects)
+
+    async def commit(self):
+        if self._has_pending_changes():
+            await self._acquire_write_lock()
+        try:
+            return await super().commit()
+        finally:
+            self._release_write_lock()
+
+    async def rollback(self):
+        try:
+            return await super().rollback()
+        finally:
+            self._release_write_lock()
+
+    async def close(self):
+        try:
+            return await super().close()
+        finally:
+            self._release_write_lock()
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 异步会话提交后不过期对象，避免访问属性时触发隐式IO
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=SQLiteAsyncSession if DATABASE_URL.startswith("sqlite") else AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # 创建基础模型类
 Base = declarative_base()
 
+# 数据库迁移配置（alembic/ 目录）
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+# 与此前 create_all 创建的表结构一致的基线版本
+BASELINE_REVISION = "0001"
+# PostgreSQL迁移互斥使用的咨询锁编号
+MIGRATION_LOCK_KEY = 20240001
+
+def run_migrations():
+    """将数据库升级到最新迁移版本
+
+    由 create_all 创建、尚无版本记录的旧数据库先标记为基线版本，再执行后续迁移。
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    with engine.begin() as connection:
+        # 多个工作进程同时启动时，只允许一个执行迁移，其余等待后看到已是最新版本
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "alembic_version" not in tables and "users" in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
 # 数据库依赖
 def get_db():
     db = SessionLocal()
@@ -32,3 +200,7 @@ def get_db():
     finally:
         db.close()
 
+# 异步数据库依赖
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
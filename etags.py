@@ -0,0 +1,62 @@
+import hashlib
+from typing import Any, Optional
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# 响应格式变化时修改，使客户端缓存的ETag全部失效
+ETAG_FORMAT_VERSION = "1"
+
+# 客户端可以缓存，但每次使用前必须用 If-None-Match 重新验证
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts: Any) -> str:
+    """由各组成部分生成强ETag"""
+    raw = "|".join(str(part) for part in (ETAG_FORMAT_VERSION, *parts))
+    return f'"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """If-None-Match / If-Match 请求头是否包含指定的ETag（或为 *）
+
+    If-None-Match 使用弱比较（忽略 W/ 前缀），If-Match 使用强比较（弱ETag不匹配）。
+    """
+    if not header:
+        return False
+    for value in header.split(","):
+        value = value.strip()
+        if value.startswith("W/"):
+            if not weak:
+                continue
+            value = value[2:]
+        if value == "*" or value == etag:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    """返回不带响应体的304响应"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def set_etag(response: Response, etag: str):
+    """在响应上设置ETag和缓存策略"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+def row_etag(kind: str, row_id: int, updated_at) -> str:
+    """单条记录的ETag，每次更新都会刷新 updated_at"""
+    return make_etag(kind, row_id, updated_at.isoformat() if updated_at else "")
+
+def check_if_match(if_match: Optional[str], etag: str):
+    """If-Match 与当前版本不一致时返回412，防止覆盖其他客户端的修改"""
+    if if_match is not None and not etag_matches(if_match, etag, weak=False):
+        raise HTTPException(status_code=412, detail="资源已被修改，请刷新后重试")
+
+async def collection_etag(db: AsyncSession, model, user_id: int, request: Request) -> str:
+    """用户集合列表的ETag：由 (行数, 最大updated_at) 构成集合版本，再结合查询参数
+
+    新增和修改会刷新最大 updated_at，删除会改变行数；通过 (user_id, updated_at) 索引计算，不读取数据行。
+    """
+    count, last_updated = (await db.execute(
+        select(func.count(), func.max(model.updated_at)).where(model.user_id == user_id)
+    )).one()
+    query = sorted(request.query_params.multi_items())
+    return make_etag(model.__tablename__, user_id, count, last_updated.isoformat() if last_updated else "", query)
@@ -0,0 +1,148 @@
+"""本地模拟的OpenAI兼容上游，供 check_*.py 检查脚本注入延迟和错误
+
+按上游模型名分别配置延迟、失败率、错误状态码和 Retry-After，记录每个模型的调用次数：
+
+    upstream = FakeUpstream(delay=0.05)
+    upstream.configure("gpt-5", fail_rate=1.0, fail_status=503)
+    ai_service._client = httpx.AsyncClient(transport=upstream.transport())
+
+需要经过真实连接池时，用 serve() 在本地端口上以HTTP/1.1（keep-alive）提供同样的响应，并统计TCP连接数。
+"""
+import json
+import random
+import socket
+import asyncio
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+DEFAULT_SETTINGS = {
+    # 每次请求的响应延迟（秒）
+    "delay": 0.0,
+    # 失败概率，以及失败时的状态码和 Retry-After（秒，None 为不返回）
+    "fail_rate": 0.0,
+    "fail_status": 503,
+    "retry_after": None,
+    # 接下来固定失败的请求数（优先于 fail_rate）
+    "fail_next": 0,
+    # 返回的消息内容；流式响应时拆分为 stream_chunks 个增量，增量之间间隔 chunk_delay 秒
+    "content": "ok",
+    "stream_chunks": 1,
+    "chunk_delay": 0.0,
+}
+
+class FakeUpstream:
+    """进程内的模拟上游（httpx.MockTransport），随机数使用固定种子，结果可复现"""
+
+    def __init__(self, seed: int = 0, **settings: Any):
+        self.defaults = {**DEFAULT_SETTINGS, **settings}
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.random = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.failures: Counter = Counter()
+        # 同时处理中的请求数及其峰值、serve() 接受的TCP连接数
+        self.inflight = 0
+        self.max_inflight = 0
+        self.connections = 0
+
+    def configure(self, model: Optional[str] = None, **settings: Any):
+        """修改某个上游模型（为空时为所有模型的默认值）的配置"""
+        if model is None:
+            self.defaults.update(settings)
+        else:
+            self.models.setdefault(model, {}).update(settings)
+
+    def settings(self, model: str) -> Dict[str, Any]:
+        return {**self.defaults, **self.models.get(model, {})}
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.failures.clear()
+        self.max_inflight = 0
+        self.connections = 0
+
+    def _should_fail(self, model: str, settings: Dict[str, Any]) -> bool:
+        if settings["fail_next"] > 0:
+            # 在设置该值的层级（模型或默认值）上递减
+            target = self.models[model] if "fail_next" in self.models.get(model, {}) else self.defaults
+            target["fail_next"] -= 1
+            return True
+        return self.random.random() < settings["fail_rate"]
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            return await self._respond(request)
+        finally:
+            self.inflight -= 1
+
+    async def _respond(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        model = payload.get("model", "")
+        settings = self.settings(model)
+        self.calls[model] += 1
+        if settings["delay"]:
+            await asyncio.sleep(settings["delay"])
+
+        if self._should_fail(model, settings):
+            self.failures[model] += 1
+            headers = {}
+            if settings["retry_after"] is not None:
+                headers["Retry-After"] = str(settings["retry_after"])
+            return httpx.Response(settings["fail_status"], json={"error": "injected failure"}, headers=headers)
+
+        usage = {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+        if payload.get("stream"):
+            return httpx.Response(
+                200, content=self._stream_events(settings, usage), headers={"Content-Type": "text/event-stream"}
+            )
+        return httpx.Response(200, json={
+            "model": model,
+            "choices": [{"message": {"content": settings["content"]}}],
+            "usage": usage
+        })
+
+    async def _stream_events(self, settings: Dict[str, Any], usage: Dict[str, int]) -> AsyncIterator[bytes]:
+        content = settings["content"]
+        size = max(1, -(-len(content) // max(1, settings["stream_chunks"])))
+        for start in range(0, len(content), size):
+            if start and settings["chunk_delay"]:
+                await asyncio.sleep(settings["chunk_delay"])
+            event = {"choices": [{"delta": {"content": content[start:start + size]}}]}
+            yield f"data: {json.dumps(event)}\n\n".encode("utf-8")
+        yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8")
+        yield b"data: [DONE]\n\n"
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def serve(self, sock: socket.socket) -> asyncio.AbstractServer:
+        """在已绑定的套接字上提供HTTP/1.1服务（只支持带 Content-Length 的非流式请求）"""
+        return await asyncio.start_server(self._serve_connection, sock=sock)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = dict(line.split(": ", 1) for line in header_lines if line)
+                lengths = [value for name, value in headers.items() if name.lower() == "content-length"]
+                body = await reader.readexactly(int(lengths[0]) if lengths else 0)
+                method, target, _ = request_line.split(" ", 2)
+                response = await self.handle(httpx.Request(method, f"http://fake-upstream{target}", content=body))
+                content = await response.aread()
+                writer.write(
+                    f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n".encode("latin-1")
+                    + b"".join(f"{name}: {value}\r\n".encode("latin-1") for name, value in response.headers.items()
+                               if name.lower() not in ("content-length", "transfer-encoding"))
+                    + f"Content-Length: {len(content)}\r\n\r\n".encode("latin-1")
+                    + content
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,74 @@
+import os
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+    ORJSONResponse = None
+
+# 快速响应路径：列表接口直接返回序列化器生成的字典，跳过 response_model 校验，并使用orjson编码
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+if FAST_JSON_RESPONSES and orjson is None:
+    print("⚠️ 未安装orjson，已忽略 FAST_JSON_RESPONSES")
+    FAST_JSON_RESPONSES = False
+
+# 应用的默认响应类
+DefaultJSONResponse = ORJSONResponse if FAST_JSON_RESPONSES else JSONResponse
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+def compile_serializer(fields: Sequence[str], json_fields: Iterable[str] = ()) -> Callable[[Any], Dict[str, Any]]:
+    """生成按属性读取各字段、返回字典的序列化函数（ORM对象或查询结果行均可）
+
+    json_fields 中的字段以JSON字符串存储，解析为列表（空值为[]）；日期时间保持原值，由响应编码器处理。
+    """
+    json_fields = set(json_fields)
+    items = []
+    for name in fields:
+        if not name.isidentifier():
+            raise ValueError(f"无效的字段名: {name}")
+        if name in json_fields:
+            items.append(f"{name!r}: _loads(row.{name}) if row.{name} else []")
+        else:
+            items.append(f"{name!r}: row.{name}")
+
+    source = f"def serialize(row):\n    return {{{', '.join(items)}}}\n"
+    namespace = {"_loads": _loads}
+    exec(compile(source, f"<serializer: {', '.join(fields)}>", "exec"), namespace)
+    return namespace["serialize"]
+
+class RowSerializer:
+    """行序列化器：按字段投影缓存预编译的序列化函数"""
+
+    def __init__(self, fields: Sequence[str], json_fields: Iterable[str] = ()):
+        self.fields = tuple(fields)
+        self.json_fields = tuple(json_fields)
+        self._compiled: Dict[Optional[frozenset], Callable[[Any], Dict[str, Any]]] = {}
+
+    def for_fields(self, selected: Optional[Set[str]] = None) -> Callable[[Any], Dict[str, Any]]:
+        """获取只包含 selected 字段（为None时包含全部字段）的序列化函数"""
+        key = None if selected is None else frozenset(selected)
+        serialize = self._compiled.get(key)
+        if serialize is None:
+            names = [name for name in self.fields if selected is None or name in selected]
+            serialize = compile_serializer(names, [name for name in self.json_fields if name in names])
+            self._compiled[key] = serialize
+        return serialize
+
+    def many(self, rows: Iterable[Any], selected: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        serialize = self.for_fields(selected)
+        return [serialize(row) for row in rows]
+
+def json_response(content: Any, response: Optional[Response] = None) -> Response:
+    """直接返回编码后的响应（不经过 response_model 校验），保留注入的 Response 上设置的响应头"""
+    result = DefaultJSONResponse(content)
+    if response is not None:
+        for key, value in response.headers.items():
+            if key != "content-length":
+                result.headers[key] = value
+    return result
@@ -0,0 +1,30 @@
+"""检查脚本共用的进程内应用客户端：创建用户并签发令牌，通过ASGI直接请求 main.app（不经过网络）
+
+调用方需在导入前设置 DATABASE_URL（通常为临时SQLite文件），并自行执行 run_migrations()：
+
+    user_id, headers = create_user("check-user")
+    async with app_client() as client:
+        response = await client.get("/api/tasks/", headers=headers)
+"""
+from datetime import timedelta
+from typing import Dict, Tuple
+
+import httpx
+
+from database import SessionLocal
+from models import User
+from routers.auth import create_access_token, token_claims
+from main import app
+
+def create_user(username: str) -> Tuple[int, Dict[str, str]]:
+    """创建用户，返回 (用户id, 带访问令牌的请求头)"""
+    with SessionLocal() as db:
+        user = User(username=username, hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        token = create_access_token(token_claims(user), timedelta(hours=1))
+        return user.id, {"Authorization": f"Bearer {token}"}
+
+def app_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://local-app")
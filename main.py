@@ -1,29 +1,36 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 import uvicorn
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
-from database import get_db, engine, Base
-from routers import notes, auth, ai, chat, tasks, pomodoro
+from database import get_db, async_engine, run_migrations
+from routers import notes, auth, ai, chat, tasks, pomodoro, tags, sync
 from models import User, Category, Folder, Note, Task, Conversation, PomodoroSession
 from auth import create_super_user
+from ai_service import ai_service
+from passwords import password_hasher
+from search import note_search_index
+from ai_resilience import RequestDeadlineMiddleware
+from ai_usage import UsageContextMiddleware, usage_recorder
+from fast_json import DefaultJSONResponse
+from sync_log import sync_log
+from static_files import static_manifest
 
 # 加载环境变量
 load_dotenv()
 
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
-
 # 创建FastAPI应用
 app = FastAPI(
     title="Cortex AI Workspace API",
     description="AI智能工作台后端API",
-    version="1.0.0"
+    version="1.0.0",
+    # FAST_JSON_RESPONSES=true 时使用orjson编码响应
+    default_response_class=DefaultJSONResponse
 )
 
 # 配置CORS
@@ -33,8 +40,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有方法
     allow_headers=["*"],  # 允许所有头部
+    expose_headers=["X-Next-Cursor"],  # 分页游标
 )
 
+# 请求截止时间（X-Request-Timeout 请求头或默认值），上游AI调用据此缩短超时、停止重试
+app.add_middleware(
+    RequestDeadlineMiddleware,
+    default_timeout=float(os.getenv("REQUEST_DEADLINE_SECONDS") or 0) or None
+)
+
+# AI用量归属的请求上下文
+app.add_middleware(UsageContextMiddleware)
+
 # 安全配置
 security = HTTPBearer()
 
@@ -46,12 +63,29 @@ if os.path.exists("static"):
 app.include_router(auth.router, prefix="/api/auth", tags=["认证"])
 app.include_router(notes.router, prefix="/api/notes", tags=["笔记"])
 app.include_router(ai.router, prefix="/api/ai", tags=["AI服务"])
+app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
+app.include_router(pomodoro.router, prefix="/api/pomodoro", tags=["pomodoro"])
+app.include_router(tags.router, prefix="/api/tags", tags=["tags"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化"""
-    # 确保数据库表被创建
-    Base.metadata.create_all(bind=engine)
+    # 执行数据库迁移，创建或升级表结构和索引
+    run_migrations()
+    
+    # 检查笔记全文索引是否可用（索引表由迁移创建并回填）
+    note_search_index.setup()
+    
+    # 启动AI用量批量写入任务
+    usage_recorder.start()
+    
+    # 启动同步变更日志的定期压缩
+    sync_log.start()
+    
+    # 加载前端静态文件清单并预压缩
+    static_manifest.load()
     
     db = next(get_db())
     try:
@@ -66,6 +100,20 @@ async def startup_event():
     finally:
         db.close()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放资源"""
+    # 写入剩余的AI用量记录
+    await usage_recorder.stop()
+    # 停止同步变更日志压缩
+    await sync_log.stop()
+    # 关闭AI服务的HTTP连接池
+    await ai_service.close()
+    # 关闭密码哈希线程池
+    password_hasher.shutdown()
+    # 关闭异步数据库连接池
+    await async_engine.dispose()
+
 @app.get("/api/")
 async def api_root():
     return {"message": "Cortex AI Workspace API", "version": "1.0.0"}
@@ -76,22 +124,21 @@ async def health_check():
 
 # 前端路由处理
 @app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
-    """服务前端应用"""
+async def serve_frontend(
+    full_path: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """服务前端应用（从启动时构建的内存清单中返回，不访问文件系统）"""
     # 如果是API路由，返回404
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404, detail="API endpoint not found")
     
-    # 检查静态文件是否存在
-    static_file_path = f"static/{full_path}"
-    if os.path.exists(static_file_path) and os.path.isfile(static_file_path):
-        return FileResponse(static_file_path)
-    
-    # 默认返回index.html（用于SPA路由）
-    if os.path.exists("static/index.html"):
-        return FileResponse("static/index.html")
-    
-    raise HTTPException(status_code=404, detail="File not found")
+    # 查找静态文件，未知路径返回index.html（用于SPA路由）
+    static_file = static_manifest.lookup(full_path)
+    if static_file is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return static_manifest.response(static_file, accept_encoding, if_none_match)
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -100,7 +147,3 @@ if __name__ == "__main__":
         port=8000,
         reload=True
     )
-
-app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
-app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
-app.include_router(pomodoro.router, prefix="/api/pomodoro", tags=["pomodoro"])
@@ -0,0 +1,283 @@
+import os
+import time
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import List, Dict, Any, Optional, Callable, Awaitable, TypeVar
+
+from ai_resilience import upstream_resilience, UpstreamError
+
+T = TypeVar("T")
+
+class AIModel(str, Enum):
+    GPT_5 = "gpt-5"
+    GPT_4O = "gpt-4o"
+    GPT_4O_MINI = "gpt-4o-mini"
+    GPT_4_TURBO = "gpt-4-turbo"
+    GEMINI_2_5_FLASH = "google/gemini-2.5-flash"
+    GEMINI_2_5_PRO = "google/gemini-2.5-pro"
+    CLAUDE_4 = "anthropic/claude-4"
+    DEEPSEEK_V3 = "deepseek/deepseek-chat-v3"
+    DEEPSEEK_R1 = "deepseek/deepseek-r1"
+
+class Provider:
+    """OpenAI兼容的上游服务"""
+
+    def __init__(self, name: str, base_url: str, api_key: Optional[str], extra_headers: Dict[str, str] = None, always_enabled: bool = False):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.extra_headers = extra_headers or {}
+        # 默认提供方即使未配置密钥也启用（兼容自建/代理网关）
+        self.enabled = always_enabled or bool(api_key)
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            **self.extra_headers
+        }
+
+# 提供方注册表
+PROVIDERS: Dict[str, Provider] = {
+    "openai": Provider(
+        "openai",
+        os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        os.getenv("OPENAI_API_KEY"),
+        always_enabled=True
+    ),
+    "openrouter": Provider(
+        "openrouter",
+        os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+        os.getenv("OPENROUTER_API_KEY"),
+        extra_headers={
+            "HTTP-Referer": "https://cortex-ai-workspace.local",
+            "X-Title": "Cortex AI Workspace"
+        }
+    ),
+}
+
+# 模型注册表：显示信息、各提供方上的模型名（按优先级）、主模型慢或不可用时依次尝试的等价模型
+MODEL_REGISTRY: Dict[str, Dict[str, Any]] = {
+    AIModel.GPT_5: {
+        "name": "GPT-5", "provider": "OpenAI", "color": "bg-green-500",
+        "routes": [("openai", "gpt-5"), ("openrouter", "openai/gpt-5")],
+        "fallbacks": [AIModel.GPT_4O]
+    },
+    AIModel.GPT_4O: {
+        "name": "GPT-4o", "provider": "OpenAI", "color": "bg-green-600",
+        "routes": [("openai", "gpt-4o"), ("openrouter", "openai/gpt-4o")],
+        "fallbacks": [AIModel.GPT_4_TURBO, AIModel.GPT_4O_MINI]
+    },
+    AIModel.GPT_4O_MINI: {
+        "name": "GPT-4o Mini", "provider": "OpenAI", "color": "bg-green-400",
+        "routes": [("openai", "gpt-4o-mini"), ("openrouter", "openai/gpt-4o-mini")],
+        "fallbacks": [AIModel.GEMINI_2_5_FLASH, AIModel.GPT_4O]
+    },
+    AIModel.GPT_4_TURBO: {
+        "name": "GPT-4 Turbo", "provider": "OpenAI", "color": "bg-green-700",
+        "routes": [("openai", "gpt-4-turbo"), ("openrouter", "openai/gpt-4-turbo")],
+        "fallbacks": [AIModel.GPT_4O]
+    },
+    AIModel.GEMINI_2_5_FLASH: {
+        "name": "Gemini 2.5 Flash", "provider": "Google", "color": "bg-blue-500",
+        "routes": [("openrouter", "google/gemini-2.5-flash")],
+        "fallbacks": [AIModel.GPT_4O_MINI]
+    },
+    AIModel.GEMINI_2_5_PRO: {
+        "name": "Gemini 2.5 Pro", "provider": "Google", "color": "bg-blue-600",
+        "routes": [("openrouter", "google/gemini-2.5-pro")],
+        "fallbacks": [AIModel.GPT_5]
+    },
+    AIModel.CLAUDE_4: {
+        "name": "Claude-4", "provider": "Anthropic", "color": "bg-purple-500",
+        "routes": [("openrouter", "anthropic/claude-4")],
+        "fallbacks": [AIModel.GPT_5]
+    },
+    AIModel.DEEPSEEK_V3: {
+        "name": "DeepSeek V3", "provider": "DeepSeek", "color": "bg-orange-500",
+        "routes": [("openrouter", "deepseek/deepseek-chat-v3")],
+        "fallbacks": [AIModel.GPT_4O]
+    },
+    AIModel.DEEPSEEK_R1: {
+        "name": "DeepSeek R1", "provider": "DeepSeek", "color": "bg-red-500",
+        "routes": [("openrouter", "deepseek/deepseek-r1")],
+        "fallbacks": [AIModel.DEEPSEEK_V3]
+    },
+}
+
+# 兼容 OpenRouter 风格的模型名（如 "openai/gpt-5"）
+MODEL_ALIASES: Dict[str, str] = {
+    f"openai/{model.value}": model.value
+    for model in (AIModel.GPT_5, AIModel.GPT_4O, AIModel.GPT_4O_MINI, AIModel.GPT_4_TURBO)
+}
+
+class Route:
+    """某个模型在某个提供方上的调用路径，同时记录最近的延迟与成败"""
+
+    def __init__(self, model: str, provider: Provider, upstream_model: str, window: int, max_age: float):
+        self.model = model
+        self.provider = provider
+        self.upstream_model = upstream_model
+        # 熔断、统计均按 提供方:模型 区分
+        self.key = f"{provider.name}:{upstream_model}"
+        self._samples = deque(maxlen=window)
+        # 超过该时长的样本不再计入，被降级的路径因此会在一段时间后重新获得流量
+        self.max_age = max_age
+
+    def record(self, latency_ms: float, ok: bool):
+        self._samples.append((time.monotonic(), latency_ms, ok))
+
+    def stats(self) -> Dict[str, Any]:
+        """滚动窗口内的 p50/p95 延迟与错误率"""
+        since = time.monotonic() - self.max_age
+        samples = [(latency, ok) for at, latency, ok in self._samples if at >= since]
+        if not samples:
+            return {"samples": 0, "p50_ms": None, "p95_ms": None, "error_rate": 0.0}
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        return {
+            "samples": len(samples),
+            "p50_ms": round(latencies[len(latencies) // 2], 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+            "error_rate": round(errors / len(samples), 3)
+        }
+
+class ModelRouter:
+    """模型路由：将模型映射到提供方，按滚动延迟和错误率对候选路径排序，主路径慢或不可用时回退"""
+
+    def __init__(
+        self,
+        window: int = 200,
+        max_age: float = 60,
+        min_samples: int = 10,
+        slow_p95_ms: float = 10000,
+        max_error_rate: float = 0.5,
+        fallback_enabled: bool = True
+    ):
+        self.window = window
+        self.max_age = max_age
+        # 样本数达到该值后才据此判断慢或不可用
+        self.min_samples = min_samples
+        self.slow_p95_ms = slow_p95_ms
+        self.max_error_rate = max_error_rate
+        self.fallback_enabled = fallback_enabled
+        self._routes: Dict[str, Route] = {}
+        self.fallbacks_used = 0
+
+    def _route(self, model: str, provider: Provider, upstream_model: str) -> Route:
+        key = f"{provider.name}:{upstream_model}"
+        route = self._routes.get(key)
+        if route is None:
+            route = Route(model, provider, upstream_model, self.window, self.max_age)
+            self._routes[key] = route
+        return route
+
+    def resolve(self, model: str) -> str:
+        """规范化模型名"""
+        return MODEL_ALIASES.get(model, model)
+
+    def routes_for(self, model: str) -> List[Route]:
+        """模型在已启用提供方上的调用路径；未注册的模型直接发往默认提供方"""
+        model = getattr(model, "value", model)
+        entry = MODEL_REGISTRY.get(model)
+        if entry is None:
+            return [self._route(model, PROVIDERS["openai"], model)]
+        return [
+            self._route(model, PROVIDERS[provider], upstream_model)
+            for provider, upstream_model in entry["routes"]
+            if PROVIDERS[provider].enabled
+        ]
+
+    def health(self, route: Route) -> Dict[str, Any]:
+        """路径当前状态：down（熔断或错误率过高）、slow（p95超过阈值）"""
+        stats = route.stats()
+        enough = stats["samples"] >= self.min_samples
+        return {
+            **stats,
+            "circuit": upstream_resilience.circuit_state(route.key),
+            "down": upstream_resilience.is_open(route.key) or (enough and stats["error_rate"] >= self.max_error_rate),
+            "slow": enough and stats["p95_ms"] > self.slow_p95_ms
+        }
+
+    def plan(self, model: str) -> List[Route]:
+        """按优先顺序返回候选路径：健康且不慢的优先，其次按p50由快到慢，不可用的排最后"""
+        model = self.resolve(model)
+        candidates = list(self.routes_for(model))
+        if self.fallback_enabled:
+            for fallback in MODEL_REGISTRY.get(model, {}).get("fallbacks", []):
+                candidates.extend(r for r in self.routes_for(fallback) if r not in candidates)
+
+        def rank(item):
+            index, route = item
+            health = self.health(route)
+            return (health["down"], health["slow"], (health["p50_ms"] or 0) if health["slow"] else 0, index)
+
+        return [route for _, route in sorted(enumerate(candidates), key=rank)]
+
+    async def observe(self, route: Route, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        """执行一次调用并记录延迟与成败；请求参数类错误不计入提供方错误率"""
+        start = time.monotonic()
+        try:
+            result = await attempt_fn()
+        except UpstreamError as e:
+            if e.retryable or e.status_code >= 500:
+                route.record((time.monotonic() - start) * 1000, False)
+            raise
+        except (Exception, asyncio.CancelledError):
+            # 包括被 wait_for 取消的超时尝试
+            route.record((time.monotonic() - start) * 1000, False)
+            raise
+        route.record((time.monotonic() - start) * 1000, True)
+        return result
+
+    def available_models(self) -> List[Dict[str, str]]:
+        """至少有一个已启用提供方的模型"""
+        return [
+            {"id": model, "name": entry["name"], "provider": entry["provider"], "color": entry["color"]}
+            for model, entry in MODEL_REGISTRY.items()
+            if self.routes_for(model)
+        ]
+
+    def routing_table(self) -> Dict[str, Any]:
+        """当前路由表与各路径统计"""
+        models = {}
+        for model, entry in MODEL_REGISTRY.items():
+            models[model.value] = {
+                "routes": [
+                    {"provider": route.provider.name, "upstream_model": route.upstream_model, **self.health(route)}
+                    for route in self.routes_for(model)
+                ],
+                "fallbacks": [fallback.value for fallback in entry["fallbacks"]],
+                "plan": [route.key for route in self.plan(model)]
+            }
+        return {
+            "providers": {
+                name: {"base_url": provider.base_url, "enabled": provider.enabled}
+                for name, provider in PROVIDERS.items()
+            },
+            "config": {
+                "window": self.window,
+                "max_age": self.max_age,
+                "min_samples": self.min_samples,
+                "slow_p95_ms": self.slow_p95_ms,
+                "max_error_rate": self.max_error_rate,
+                "fallback_enabled": self.fallback_enabled
+            },
+            "fallbacks_used": self.fallbacks_used,
+            "models": models
+        }
+
+# 创建全局模型路由实例
+model_router = ModelRouter(
+    window=int(os.getenv("AI_ROUTER_WINDOW", "200")),
+    max_age=float(os.getenv("AI_ROUTER_MAX_AGE", "60")),
+    min_samples=int(os.getenv("AI_ROUTER_MIN_SAMPLES", "10")),
+    slow_p95_ms=float(os.getenv("AI_ROUTER_SLOW_P95_MS", "10000")),
+    max_error_rate=float(os.getenv("AI_ROUTER_MAX_ERROR_RATE", "0.5")),
+    fallback_enabled=os.getenv("AI_MODEL_FALLBACK", "true").lower() == "true"
+)
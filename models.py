@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, Index, Table, UniqueConstraint, event, inspect
 from sqlalchemy.orm import relationship, foreign
 from datetime import datetime
 from database import Base
@@ -12,6 +12,8 @@ class User(Base):
     hashed_password = Column(String(100), nullable=False)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    # 令牌版本：修改密码、停用或权限变更时递增，签发时写入令牌，版本不一致的令牌失效
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -23,6 +25,13 @@ class User(Base):
     conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
     pomodoro_sessions = relationship("PomodoroSession", back_populates="user", cascade="all, delete-orphan")
 
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target):
+    """停用或权限变更时递增令牌版本，使已签发的令牌在所有进程中失效"""
+    state = inspect(target)
+    if state.attrs.is_active.history.has_changes() or state.attrs.is_superuser.history.has_changes():
+        target.token_version = User.token_version + 1
+
 class Category(Base):
     __tablename__ = "categories"
     
@@ -41,6 +50,10 @@ class Category(Base):
     folders = relationship("Folder", back_populates="category_obj",
                           primaryjoin="and_(Category.name == foreign(Folder.category), Category.user_id == foreign(Folder.user_id))",
                           viewonly=True)
+    
+    __table_args__ = (
+        Index("ix_categories_user_id", "user_id"),
+    )
 
 class Folder(Base):
     __tablename__ = "folders"
@@ -57,6 +70,11 @@ class Folder(Base):
                                primaryjoin="and_(Folder.category == Category.name, Folder.user_id == Category.user_id)",
                                foreign_keys=[category, user_id], viewonly=True)
     notes = relationship("Note", back_populates="folder")
+    
+    __table_args__ = (
+        # 按分类列出文件夹
+        Index("ix_folders_user_id_category", "user_id", "category"),
+    )
 
 class Note(Base):
     __tablename__ = "notes"
@@ -77,6 +95,13 @@ class Note(Base):
     category_obj = relationship("Category", back_populates="notes",
                                primaryjoin="and_(Note.category == Category.name, Note.user_id == Category.user_id)",
                                foreign_keys=[category, user_id], viewonly=True)
+    
+    __table_args__ = (
+        # 笔记列表按 (updated_at, id) 倒序分页
+        Index("ix_notes_user_id_updated_at", "user_id", "updated_at"),
+        # 按文件夹筛选笔记列表、统计文件夹笔记数量
+        Index("ix_notes_user_id_folder_id", "user_id", "folder_id", "updated_at"),
+    )
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -101,6 +126,47 @@ class Task(Base):
     
     # 关系
     user = relationship("User", back_populates="tasks")
+    
+    __table_args__ = (
+        # 覆盖按状态筛选和统计分组聚合
+        Index("ix_tasks_user_id_status", "user_id", "status", "category", "priority", "ai_generated"),
+        # 任务列表按 (created_at, id) 倒序分页
+        Index("ix_tasks_user_id_created_at", "user_id", "created_at"),
+        # 任务集合版本（列表ETag）
+        Index("ix_tasks_user_id_updated_at", "user_id", "updated_at"),
+    )
+
+class Tag(Base):
+    __tablename__ = "tags"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # 按名称查找用户的标签
+        UniqueConstraint("user_id", "name", name="uq_tags_user_id_name"),
+    )
+
+# 标签倒排索引：笔记/任务的 tags 列（JSON字符串）仍用于列表展示，关联表用于按标签筛选和计数
+note_tags = Table(
+    "note_tags",
+    Base.metadata,
+    Column("note_id", Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    # 按标签查找笔记
+    Index("ix_note_tags_tag_id", "tag_id", "note_id")
+)
+
+task_tags = Table(
+    "task_tags",
+    Base.metadata,
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    # 按标签查找任务
+    Index("ix_task_tags_tag_id", "tag_id", "task_id")
+)
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -114,6 +180,12 @@ class Conversation(Base):
     # 关系
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    summary = relationship("ConversationSummary", uselist=False, cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # 对话列表按 (updated_at, id) 倒序分页
+        Index("ix_conversations_user_id_updated_at", "user_id", "updated_at"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -128,6 +200,19 @@ class Message(Base):
     
     # 关系
     conversation = relationship("Conversation", back_populates="messages")
+    
+    __table_args__ = (
+        # 按对话读取最近消息
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+    
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    content = Column(Text, nullable=False)  # 较早消息的滚动摘要
+    last_message_id = Column(Integer, nullable=False)  # 摘要已覆盖到的消息id
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class PomodoroSession(Base):
     __tablename__ = "pomodoro_sessions"
@@ -145,6 +230,13 @@ class PomodoroSession(Base):
     # 关系
     user = relationship("User", back_populates="pomodoro_sessions")
     task = relationship("Task", backref="pomodoro_sessions")
+    
+    __table_args__ = (
+        # 按时间区间统计、列出番茄钟记录
+        Index("ix_pomodoro_sessions_user_id_started_at", "user_id", "started_at"),
+        # 任务番茄钟统计，删除任务时解除关联
+        Index("ix_pomodoro_sessions_task_id", "task_id"),
+    )
 
 class AIUsage(Base):
     __tablename__ = "ai_usage"
@@ -154,11 +246,39 @@ class AIUsage(Base):
     model = Column(String(50), nullable=False)
     operation = Column(String(50), nullable=False)  # chat, enhance, parse_task, etc.
     tokens_used = Column(Integer, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    cached = Column(Boolean, default=False)  # 命中响应缓存或与进行中的相同请求合并
     cost = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # 关系
     user = relationship("User", backref="ai_usage_records")
+    
+    __table_args__ = (
+        # 用量统计按用户和时间范围聚合
+        Index("ix_ai_usage_user_id_created_at", "user_id", "created_at"),
+    )
+
+class SyncChange(Base):
+    __tablename__ = "sync_changes"
+    
+    # 自增的变更序号即同步游标（SQLite使用AUTOINCREMENT，删除最大序号的行后序号也不会回退）
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    entity = Column(String(20), nullable=False)  # note, task, folder, category, pomodoro_session
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)  # 删除记录（墓碑）
+    changed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        # 按用户读取某个序号之后的变更
+        Index("ix_sync_changes_user_id_id", "user_id", "id"),
+        # 压缩时查找同一实体更新的变更
+        Index("ix_sync_changes_entity_entity_id", "entity", "entity_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
 
 class SystemSettings(Base):
     __tablename__ = "system_settings"
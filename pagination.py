@@ -0,0 +1,67 @@
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Tuple, List, Iterable, Set, Any
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# 下一页游标通过响应头返回，保持列表响应结构不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# 单页最大条数
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """将 (排序值, id) 编码为不透明游标"""
+    raw = json.dumps([sort_value.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解码游标，格式错误时返回400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+async def paginate(
+    db: AsyncSession, stmt, sort_column, id_column, limit: Optional[int], cursor: Optional[str],
+    as_rows: bool = False
+) -> Tuple[List[Any], Optional[str]]:
+    """按 (排序列, id) 倒序对实体查询进行键集分页，返回当前页数据和下一页游标
+
+    limit 为空时返回全部数据（兼容旧客户端）；as_rows 为 True 时 stmt 为列查询（须包含排序列和id），返回结果行。
+    """
+    fetch = db.execute if as_rows else db.scalars
+    stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        # 行值比较可按 (user_id, 排序列) 索引直接定位到游标处；拆成 OR 条件时会从第一页起扫描索引，耗时随页深增长
+        stmt = stmt.where(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+
+    if limit is None:
+        return (await fetch(stmt)).all(), None
+
+    # 多取一条用于判断是否还有下一页
+    rows = (await fetch(stmt.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str], required: Iterable[str]) -> Optional[Set[str]]:
+    """解析 fields= 投影参数，必需字段总是包含在内；未指定时返回None表示全部字段"""
+    if not fields:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(sorted(unknown))}")
+
+    return requested | set(required)
@@ -0,0 +1,70 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt计算成本（修改后旧哈希会在用户下次登录时自动重新计算）
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# 密码加密上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class PasswordHasher:
+    """密码哈希服务：在独立的有界线程池中执行bcrypt，避免阻塞事件循环
+
+    正在执行和排队的任务数超过上限时直接返回429。
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 64):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        """提交到线程池执行；已满时拒绝请求"""
+        if self._pending >= self.max_workers + self.max_queue:
+            raise HTTPException(
+                status_code=429,
+                detail="请求过于频繁，请稍后重试",
+                headers={"Retry-After": "1"}
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """计算密码哈希"""
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """验证密码"""
+        return await self._run(pwd_context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """验证密码；哈希成本与当前配置不一致时同时返回新哈希"""
+        return await self._run(pwd_context.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        """关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# 创建全局密码哈希实例
+password_hasher = PasswordHasher(
+    # bcrypt为CPU密集型运算，默认线程数与CPU核数一致
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+)
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, func, case
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
 import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 
-from database import get_db
-from models import User, Category
+from database import get_db, get_async_db
+from models import User, Category, AIUsage
 from schemas import (
     AIPolishRequest, AIPolishResponse,
     AIAnalyzeNoteRequest, AIAnalyzeNoteResponse,
@@ -15,15 +17,24 @@ from schemas import (
 )
 from routers.auth import get_current_user
 from ai_service import ai_service
+from ai_cache import ai_response_cache
+from ai_resilience import upstream_resilience
+from model_router import model_router
+from ai_usage import usage_recorder
 
 router = APIRouter()
 
+# 用量统计中归为“文本增强”的操作
+TEXT_ENHANCEMENT_OPERATIONS = ("improve", "summarize", "expand", "translate", "restructure")
+
 @router.post("/polish-text", response_model=AIPolishResponse)
 async def polish_text(request: AIPolishRequest, current_user: User = Depends(get_current_user)):
     """AI文本润色"""
     try:
         result = await ai_service.polish_text(request.text, style="formal")
         return AIPolishResponse(polished_text=result["content"])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI服务调用失败: {str(e)}")
 
@@ -136,6 +147,8 @@ async def parse_tasks_batch(
             "total_count": len(parsed_tasks)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"任务解析失败: {str(e)}")
 
@@ -149,23 +162,24 @@ async def enhance_text_endpoint(
         text = request.get("text", "")
         mode = request.get("mode", "improve")
         model = request.get("model", "gpt-5")
+        use_cache = request.get("use_cache", True)
         
         if not text.strip():
             raise HTTPException(status_code=400, detail="输入文本不能为空")
         
         # 根据模式调用不同的AI服务
         if mode == "improve":
-            result = await ai_service.improve_text(text, model=model)
+            result = await ai_service.improve_text(text, model=model, use_cache=use_cache)
         elif mode == "summarize":
-            result = await ai_service.summarize_text(text, model=model)
+            result = await ai_service.summarize_text(text, model=model, use_cache=use_cache)
         elif mode == "expand":
             result = await ai_service.expand_text(text, model=model)
         elif mode == "translate":
-            result = await ai_service.translate_text(text, target_language="en", model=model)
+            result = await ai_service.translate_text(text, target_language="en", model=model, use_cache=use_cache)
         elif mode == "restructure":
-            result = await ai_service.restructure_text(text, model=model)
+            result = await ai_service.restructure_text(text, model=model, use_cache=use_cache)
         else:
-            result = await ai_service.improve_text(text, model=model)
+            result = await ai_service.improve_text(text, model=model, use_cache=use_cache)
         
         return {
             "enhanced_text": result["content"],
@@ -173,6 +187,8 @@ async def enhance_text_endpoint(
             "mode": mode,
             "usage": result.get("usage", {})
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文本增强失败: {str(e)}")
 
@@ -196,6 +212,8 @@ async def ai_chat(
             "usage": result.get("usage", {}),
             "timestamp": datetime.now().isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI聊天失败: {str(e)}")
 
@@ -213,13 +231,18 @@ async def generate_tags(
         if not (title or content):
             raise HTTPException(status_code=400, detail="标题或内容不能为空")
         
-        result = await ai_service.generate_tags(title, content, model=model)
+        result = await ai_service.generate_tags(
+            title, content, model=model, use_cache=request.get("use_cache", True)
+        )
         
         return {
             "tags": result["tags"],
             "model": result["model"],
-            "confidence": result.get("confidence", 0.8)
+            "confidence": result.get("confidence", 0.8),
+            "cached": result.get("cached", False)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"标签生成失败: {str(e)}")
 
@@ -243,7 +266,8 @@ async def categorize_note_endpoint(
         category_names = [cat.name for cat in categories] if categories else ["工作", "学习", "生活"]
         
         result = await ai_service.categorize_note_advanced(
-            title, content, available_categories=category_names, model=model
+            title, content, available_categories=category_names, model=model,
+            use_cache=request.get("use_cache", True)
         )
         
         return {
@@ -251,8 +275,11 @@ async def categorize_note_endpoint(
             "folder": result.get("folder", "默认"),
             "confidence": result.get("confidence", 0.8),
             "reasoning": result.get("reasoning", ""),
-            "model": result["model"]
+            "model": result["model"],
+            "cached": result.get("cached", False)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"笔记分类失败: {str(e)}")
 
@@ -274,25 +301,89 @@ async def test_ai_connection():
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """获取AI响应缓存及请求合并统计"""
+    return {**ai_response_cache.stats(), "single_flight": ai_service.single_flight_stats()}
+
+@router.get("/resilience-stats")
+async def get_resilience_stats(current_user: User = Depends(get_current_user)):
+    """获取上游AI调用的重试与熔断统计"""
+    return upstream_resilience.stats()
+
+@router.get("/routing")
+async def get_routing_table(current_user: User = Depends(get_current_user)):
+    """获取模型路由表及各提供方/模型的延迟与错误率统计（仅管理员）"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="需要管理员权限")
+    return model_router.routing_table()
+
 @router.get("/usage-stats")
-async def get_usage_stats(current_user: User = Depends(get_current_user)):
-    """获取AI使用统计"""
+async def get_usage_stats(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取AI使用统计（按 (user_id, created_at) 索引聚合 ai_usage 明细）"""
     try:
-        # 这里可以从数据库获取用户的AI使用统计
-        # 暂时返回模拟数据
+        # 先写入缓冲区中尚未落库的用量，保证统计包含刚完成的调用
+        await usage_recorder.flush()
+        
+        rows = (await db.execute(
+            select(
+                AIUsage.operation,
+                AIUsage.model,
+                func.count(AIUsage.id),
+                func.coalesce(func.sum(AIUsage.prompt_tokens), 0),
+                func.coalesce(func.sum(AIUsage.completion_tokens), 0),
+                func.sum(case((AIUsage.cached == True, 1), else_=0)),
+                func.avg(AIUsage.latency_ms),
+                func.max(AIUsage.created_at)
+            ).where(AIUsage.user_id == current_user.id).group_by(AIUsage.operation, AIUsage.model)
+        )).all()
+        
+        month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month_requests, month_tokens = (await db.execute(
+            select(func.count(AIUsage.id), func.coalesce(func.sum(AIUsage.tokens_used), 0)).where(
+                AIUsage.user_id == current_user.id,
+                AIUsage.created_at >= month_start
+            )
+        )).one()
+        
+        by_operation: Dict[str, Dict[str, int]] = {}
+        by_model: Dict[str, Dict[str, int]] = {}
+        total_requests = prompt_tokens = completion_tokens = cached_requests = 0
+        latency_total = 0.0
+        last_used = None
+        for operation, model, count, prompt, completion, cached, avg_latency, last in rows:
+            total_requests += count
+            prompt_tokens += prompt
+            completion_tokens += completion
+            cached_requests += cached or 0
+            latency_total += (avg_latency or 0) * count
+            last_used = max(last_used, last) if last_used else last
+            for group, key in ((by_operation, operation), (by_model, model)):
+                entry = group.setdefault(key, {"requests": 0, "tokens": 0})
+                entry["requests"] += count
+                entry["tokens"] += prompt + completion
+        
         return {
-            "total_requests": 150,
-            "text_enhancements": 45,
-            "chat_messages": 80,
-            "task_parsing": 25,
+            "total_requests": total_requests,
+            "text_enhancements": sum(by_operation.get(op, {}).get("requests", 0) for op in TEXT_ENHANCEMENT_OPERATIONS),
+            "chat_messages": by_operation.get("chat", {}).get("requests", 0),
+            "task_parsing": by_operation.get("parse_tasks", {}).get("requests", 0),
             "current_month_usage": {
-                "requests": 45,
-                "tokens": 12500
+                "requests": month_requests,
+                "tokens": month_tokens
             },
-            "favorite_model": "openai/gpt-5",
-            "last_used": datetime.now().isoformat()
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_requests": cached_requests,
+            "avg_latency_ms": round(latency_total / total_requests, 1) if total_requests else None,
+            "by_operation": by_operation,
+            "by_model": by_model,
+            "favorite_model": max(by_model, key=lambda m: by_model[m]["requests"]) if by_model else None,
+            "last_used": last_used.isoformat() if last_used else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取使用统计失败: {str(e)}")
-
-
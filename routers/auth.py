@@ -1,21 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
+import time
+from typing import Optional
 
 from database import get_db
 from models import User
+from auth_cache import user_cache, snapshot_user, attach_user, stateless_user, token_revoked, revoke_tokens
+from passwords import pwd_context, password_hasher
+from ai_usage import set_usage_user
 from schemas import UserCreate, UserResponse as UserSchema, Token, UserUpdate, UserLogin
 
 router = APIRouter()
 security = HTTPBearer()
 
-# 密码加密配置
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT配置
 SECRET_KEY = "cortex-ai-workspace-secret-key-2025"
 ALGORITHM = "HS256"
@@ -29,15 +32,29 @@ def get_password_hash(password):
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims(user: User) -> dict:
+    """生成令牌声明（含令牌版本）；无状态模式下同时携带用户id和状态"""
+    claims = {"sub": user.username, "ver": user.token_version or 0}
+    if user_cache.stateless_tokens:
+        claims.update({"uid": user.id, "active": bool(user.is_active), "su": bool(user.is_superuser)})
+    return claims
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    """获取当前用户，并将其记入本次请求的AI用量上下文"""
+    user = _load_current_user(credentials, db)
+    set_usage_user(user.id)
+    return user
+
+def _load_current_user(credentials: HTTPAuthorizationCredentials, db: Session):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,58 +69,108 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     except JWTError:
         raise credentials_exception
     
+    iat = payload.get("iat")
+    
+    # 无状态令牌：签发后用户未变更、令牌版本未提升时直接使用令牌中的信息
+    user = stateless_user(db, payload)
+    if user is not None:
+        return user
+    
+    cached = user_cache.get(username, iat)
+    if cached is not None:
+        if token_revoked(payload, user_cache.token_version(db, cached["id"])):
+            raise credentials_exception
+        return attach_user(db, cached)
+    
+    loaded_at = time.time()
     user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    if user is None or token_revoked(payload, user.token_version):
         raise credentials_exception
+    user_cache.set(username, iat, snapshot_user(user), loaded_at)
     return user
 
-@router.post("/register", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+def _check_new_user(db: Session, username: str, email: Optional[str], exclude_id: Optional[int] = None):
     # 检查用户名是否已存在
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
+    if db.query(User.id).filter(User.username == username, User.id != exclude_id).first():
         raise HTTPException(status_code=400, detail="用户名已存在")
     
     # 检查邮箱是否已存在
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    if email and db.query(User.id).filter(User.email == email, User.id != exclude_id).first():
         raise HTTPException(status_code=400, detail="邮箱已存在")
-    
-    # 创建新用户
-    hashed_password = get_password_hash(user.password)
+
+def _commit_user(db: Session, user: User):
+    """提交用户变更；并发请求抢先占用了用户名或邮箱时返回400而不是500"""
+    username, email = user.username, user.email
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        _check_new_user(db, username, email, exclude_id=user.id)
+        raise HTTPException(status_code=400, detail="用户名或邮箱已存在")
+    db.refresh(user)
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
+    # 用户和默认分类在同一事务中创建
+    from models import Category
     db_user = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        db.flush()
+    except IntegrityError:
+        # 检查之后、插入之前被并发注册占用
+        db.rollback()
+        _check_new_user(db, user.username, user.email)
+        raise HTTPException(status_code=400, detail="用户名或邮箱已存在")
     
     # 创建默认分类
-    from models import Category
     default_categories = ["工作", "学习", "生活"]
     for cat_name in default_categories:
-        category = Category(name=cat_name, user_id=db_user.id)
-        db.add(category)
+        db.add(Category(name=cat_name, user_id=db_user.id))
+    _commit_user(db, db_user)
+    return db_user
+
+def _save_password_hash(db: Session, user: User, hashed_password: str):
+    db.add(user)
+    user.hashed_password = hashed_password
     db.commit()
+    db.refresh(user)
+
+# 以下接口需要等待密码哈希线程池，因此为异步函数；同步会话的数据库操作仍放到线程池中执行，不阻塞事件循环
+@router.post("/register", response_model=UserSchema)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    await run_in_threadpool(_check_new_user, db, user.username, user.email)
     
-    return db_user
+    # 创建新用户（计算哈希前释放数据库连接，避免连接池在等待期间被占满）
+    await run_in_threadpool(db.close)
+    hashed_password = await password_hasher.hash(user.password)
+    return await run_in_threadpool(_create_user, db, user, hashed_password)
 
 @router.post("/login", response_model=Token)
-def login(user_login: UserLogin, db: Session = Depends(get_db)):
+async def login(user_login: UserLogin, db: Session = Depends(get_db)):
     username = user_login.username
     password = user_login.password
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.username == username).first())
+    verified, new_hash = (False, None)
+    if user:
+        # 验证密码前释放数据库连接，避免连接池在等待期间被占满
+        await run_in_threadpool(db.close)
+        verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # 哈希成本配置变更后，登录时透明地重新计算哈希
+        await run_in_threadpool(_save_password_hash, db, user, new_hash)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {
         "access_token": access_token, 
@@ -116,15 +183,16 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.put("/me", response_model=UserSchema)
-def update_user_me(user_update: UserUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def update_user_me(user_update: UserUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     if user_update.username:
         current_user.username = user_update.username
     if user_update.email:
         current_user.email = user_update.email
-    if user_update.pomodoro_settings:
-        current_user.pomodoro_settings = user_update.pomodoro_settings
+    if user_update.password:
+        current_user.hashed_password = await password_hasher.hash(user_update.password)
+        # 修改密码后已签发的令牌全部失效，需要重新登录
+        revoke_tokens(current_user)
     
-    db.commit()
-    db.refresh(current_user)
+    await run_in_threadpool(_commit_user, db, current_user)
     return current_user
 
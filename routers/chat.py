@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Any, AsyncIterator
 import json
 from datetime import datetime
+import anyio
 
-from database import get_db
+from database import get_async_db, AsyncSessionLocal
 from models import User, Conversation, Message
 from schemas import (
     ConversationCreate, ConversationResponse, ConversationUpdate,
@@ -12,19 +15,120 @@ from schemas import (
 )
 from routers.auth import get_current_user
 from ai_service import ai_service
+from chat_context import conversation_context
+from pagination import paginate, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+from fast_json import RowSerializer, FAST_JSON_RESPONSES, json_response
 
 router = APIRouter()
 
+# 消息列表的列，与 MessageResponse 字段一致
+MESSAGE_LIST_COLUMNS = {
+    "id": Message.id,
+    "conversation_id": Message.conversation_id,
+    "role": Message.role,
+    "content": Message.content,
+    "model": Message.model,
+    "tokens_used": Message.tokens_used,
+    "created_at": Message.created_at
+}
+
+message_serializer = RowSerializer(MESSAGE_LIST_COLUMNS)
+
+# SSE响应头（禁用代理缓冲，保证增量及时送达）
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+def _sse_event(data: Dict[str, Any]) -> str:
+    """编码一条SSE事件"""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _save_assistant_message(
+    conversation_id: int,
+    content: str,
+    model: str,
+    usage: Dict[str, Any]
+) -> Dict[str, Any]:
+    """保存流式生成的助手消息，并更新对话时间"""
+    # 流式响应在请求依赖释放后仍可能运行，因此使用独立会话（SQLite上同样经过进程内写锁）；
+    # 客户端断开时生成器所在的任务已被取消，在屏蔽取消的作用域内完成保存
+    with anyio.CancelScope(shield=True):
+        async with AsyncSessionLocal() as db:
+            ai_message = Message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content=content,
+                model=model,
+                tokens_used=usage.get("total_tokens")
+            )
+            db.add(ai_message)
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(updated_at=datetime.utcnow())
+            )
+            await db.commit()
+    
+    return {
+        "id": ai_message.id,
+        "conversation_id": ai_message.conversation_id,
+        "role": ai_message.role,
+        "content": ai_message.content,
+        "model": ai_message.model,
+        "tokens_used": ai_message.tokens_used,
+        "created_at": ai_message.created_at.isoformat()
+    }
+
+async def _stream_assistant_reply(
+    conversation_id: int,
+    chat_messages: List[Dict[str, str]],
+    model: str
+) -> AsyncIterator[str]:
+    """转发AI回复增量；生成结束或客户端断开后保存助手消息"""
+    content_parts = []
+    usage = {}
+    saved_message = None
+    try:
+        async for event in ai_service.stream_chat_completion(chat_messages, model):
+            if "delta" in event:
+                content_parts.append(event["delta"])
+                yield _sse_event({"type": "delta", "content": event["delta"]})
+            elif "usage" in event:
+                usage = event["usage"]
+            elif "model" in event:
+                # 路由回退时记录实际使用的模型
+                model = event["model"]
+    except HTTPException as e:
+        yield _sse_event({"type": "error", "detail": e.detail})
+    finally:
+        # 无论正常结束还是被取消，都保存已生成的内容
+        content = "".join(content_parts)
+        if content:
+            saved_message = await _save_assistant_message(conversation_id, content, model, usage)
+    
+    yield _sse_event({"type": "done", "message": saved_message, "usage": usage})
+
 # 对话管理
 @router.get("/conversations", response_model=List[ConversationResponse])
 async def get_conversations(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取用户的对话列表"""
-    conversations = db.query(Conversation).filter(
+    """获取用户的对话列表
+
+    传入 limit 时按 (updated_at, id) 键集分页，下一页游标通过 X-Next-Cursor 响应头返回。
+    """
+    stmt = select(Conversation).where(
         Conversation.user_id == current_user.id
-    ).order_by(Conversation.updated_at.desc()).all()
+    )
+    conversations, next_cursor = await paginate(db, stmt, Conversation.updated_at, Conversation.id, limit, cursor)
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return [
         {
@@ -40,7 +144,7 @@ async def get_conversations(
 async def create_conversation(
     conversation_data: ConversationCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新对话"""
     conversation = Conversation(
@@ -49,8 +153,8 @@ async def create_conversation(
     )
     
     db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
+    await db.refresh(conversation)
     
     return {
         "id": conversation.id,
@@ -62,49 +166,46 @@ async def create_conversation(
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
 async def get_conversation_messages(
     conversation_id: int,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取对话的消息列表"""
     # 验证对话是否属于当前用户
-    conversation = db.query(Conversation).filter(
+    conversation = await db.scalar(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
-    ).first()
+    ))
     
     if not conversation:
         raise HTTPException(status_code=404, detail="对话不存在")
     
-    messages = db.query(Message).filter(
+    messages = await db.execute(select(*MESSAGE_LIST_COLUMNS.values()).where(
         Message.conversation_id == conversation_id
-    ).order_by(Message.created_at).all()
+    ).order_by(Message.created_at))
     
-    return [
-        {
-            "id": msg.id,
-            "conversation_id": msg.conversation_id,
-            "role": msg.role,
-            "content": msg.content,
-            "model": msg.model,
-            "tokens_used": msg.tokens_used,
-            "created_at": msg.created_at
-        }
-        for msg in messages
-    ]
+    items = message_serializer.many(messages)
+    if FAST_JSON_RESPONSES:
+        return json_response(items, response)
+    return items
 
 @router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
 async def send_message(
     conversation_id: int,
     message_data: dict,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """发送消息并获取AI回复"""
+    """发送消息并获取AI回复
+
+    只有token预算内的最近消息会发送给模型；开启摘要时较早的消息以滚动摘要的形式提供。
+    """
     # 验证对话是否属于当前用户
-    conversation = db.query(Conversation).filter(
+    conversation = await db.scalar(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
-    ).first()
+    ))
     
     if not conversation:
         raise HTTPException(status_code=404, detail="对话不存在")
@@ -124,21 +225,26 @@ async def send_message(
             model=model
         )
         db.add(user_message)
-        db.commit()
-        db.refresh(user_message)
-        
-        # 获取对话历史
-        messages = db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at).all()
+        await db.commit()
+        await db.refresh(user_message)
         
         # 构建对话上下文
-        chat_messages = []
-        for msg in messages:
-            chat_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+        chat_messages, summary_upto = await conversation_context.build(
+            db, conversation_id, system_prompt=message_data.get("system_prompt")
+        )
+        if summary_upto is not None:
+            # 响应返回后在后台更新滚动摘要
+            background_tasks.add_task(
+                conversation_context.refresh_summary, conversation_id, summary_upto, model
+            )
+        
+        # 流式模式：边生成边推送，结束后保存回复
+        if message_data.get("stream", False):
+            return StreamingResponse(
+                _stream_assistant_reply(conversation_id, chat_messages, model),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
         
         # 调用AI服务
         ai_response = await ai_service.chat_completion(chat_messages, model)
@@ -156,8 +262,8 @@ async def send_message(
         # 更新对话时间
         conversation.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(ai_message)
+        await db.commit()
+        await db.refresh(ai_message)
         
         return {
             "id": ai_message.id,
@@ -169,27 +275,29 @@ async def send_message(
             "created_at": ai_message.created_at
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"AI聊天失败: {str(e)}")
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除对话"""
-    conversation = db.query(Conversation).filter(
+    conversation = await db.scalar(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
-    ).first()
+    ))
     
     if not conversation:
         raise HTTPException(status_code=404, detail="对话不存在")
     
-    db.delete(conversation)
-    db.commit()
+    await db.delete(conversation)
+    await db.commit()
     
     return {"message": "对话已删除"}
 
@@ -198,13 +306,13 @@ async def update_conversation(
     conversation_id: int,
     conversation_data: ConversationUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新对话标题"""
-    conversation = db.query(Conversation).filter(
+    conversation = await db.scalar(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
-    ).first()
+    ))
     
     if not conversation:
         raise HTTPException(status_code=404, detail="对话不存在")
@@ -213,8 +321,8 @@ async def update_conversation(
         conversation.title = conversation_data.title
         conversation.updated_at = datetime.utcnow()
         
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
+    await db.refresh(conversation)
     
     return {
         "id": conversation.id,
@@ -228,7 +336,7 @@ async def update_conversation(
 async def execute_quick_command(
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """执行快捷命令"""
     command = request.get("command")
@@ -266,9 +374,31 @@ async def execute_quick_command(
             "usage": response.get("usage", {})
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"快捷命令执行失败: {str(e)}")
 
+async def _stream_global_reply(
+    messages: List[Dict[str, str]],
+    model: str
+) -> AsyncIterator[str]:
+    """转发全局聊天的AI回复增量（不保存）"""
+    usage = {}
+    try:
+        async for event in ai_service.stream_chat_completion(messages, model):
+            if "delta" in event:
+                yield _sse_event({"type": "delta", "content": event["delta"]})
+            elif "usage" in event:
+                usage = event["usage"]
+            elif "model" in event:
+                # 路由回退时记录实际使用的模型
+                model = event["model"]
+    except HTTPException as e:
+        yield _sse_event({"type": "error", "detail": e.detail})
+    
+    yield _sse_event({"type": "done", "model": model, "usage": usage})
+
 # 全局AI聊天（不保存历史）
 @router.post("/global-chat")
 async def global_chat(
@@ -297,6 +427,14 @@ async def global_chat(
             "content": message
         })
         
+        # 流式模式：直接转发增量
+        if request.get("stream", False):
+            return StreamingResponse(
+                _stream_global_reply(messages, model),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+        
         # 调用AI服务
         response = await ai_service.chat_completion(messages, model)
         
@@ -306,6 +444,8 @@ async def global_chat(
             "usage": response.get("usage", {})
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI聊天失败: {str(e)}")
 
@@ -314,10 +454,10 @@ async def global_chat(
 async def get_available_models():
     """获取可用的AI模型列表"""
     try:
-        models = await ai_service.get_available_models()
+        models = ai_service.get_available_models()
         return {
             "models": models,
-            "default": "gpt-5"
+            "default": ai_service.default_model
         }
     except Exception as e:
         # 返回默认模型列表
@@ -1,69 +1,172 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from typing import List, Optional, Set, Dict, Any, AsyncIterator
+import os
 import json
+import asyncio
 from datetime import datetime
 
-from database import get_db
+from database import get_async_db, AsyncSessionLocal
 from models import User, Note, Category, Folder
 from schemas import (
-    NoteCreate, NoteUpdate, NoteResponse,
+    NoteCreate, NoteUpdate, NoteResponse, NoteBatchAIRequest, NoteAIOperationEnum, MAX_NOTE_BATCH_AI_CONCURRENCY,
     CategoryCreate, CategoryResponse,
     FolderCreate, FolderResponse
 )
 from routers.auth import get_current_user
 from ai_service import ai_service
+from pagination import paginate, parse_fields, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+from search import note_search_index, make_snippet
+from fast_json import RowSerializer, FAST_JSON_RESPONSES, json_response
+from tags import set_tags, clear_tags, parse_tag_filter, tag_filter
+from etags import collection_etag, row_etag, etag_matches, not_modified, set_etag, check_if_match
 
 router = APIRouter()
 
+# 列表投影：可选字段及其对应的列
+NOTE_LIST_COLUMNS = {
+    "id": Note.id,
+    "title": Note.title,
+    "content": Note.content,
+    "category": Note.category,
+    "folder_id": Note.folder_id,
+    "tags": Note.tags,
+    "created_at": Note.created_at,
+    "updated_at": Note.updated_at
+}
+NOTE_REQUIRED_FIELDS = ("id", "title", "category", "created_at", "updated_at")
+
+# 批量AI处理的默认并发数（单次请求可通过 concurrency 覆盖），限制在 1..MAX_NOTE_BATCH_AI_CONCURRENCY
+NOTE_BATCH_AI_CONCURRENCY = min(max(int(os.getenv("NOTE_BATCH_AI_CONCURRENCY", "8")), 1), MAX_NOTE_BATCH_AI_CONCURRENCY)
+
+# 用户分类名称与笔记分类取值的对应关系，写回分类时使用
+CATEGORY_NAME_TO_ENUM = {"工作": "work", "学习": "study", "生活": "life"}
+
+# 笔记行序列化器（tags 以JSON字符串存储）
+note_serializer = RowSerializer(NOTE_LIST_COLUMNS, json_fields=("tags",))
+
+def _note_list_item(note: Note, fields: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """构建笔记列表项，只读取投影中的字段"""
+    return note_serializer.for_fields(fields)(note)
+
 # 笔记相关路由
-@router.get("/", response_model=List[NoteResponse])
+@router.get("/", response_model=List[NoteResponse], response_model_exclude_unset=True)
 async def get_notes(
+    response: Response,
+    request: Request,
     category: Optional[str] = None,
     folder_id: Optional[int] = None,
     search: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: str = "any",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取用户的笔记列表"""
-    query = db.query(Note).filter(Note.user_id == current_user.id)
+    """获取用户的笔记列表
+
+    传入 limit 时按 (updated_at, id) 键集分页，下一页游标通过 X-Next-Cursor 响应头返回；
+    fields 为逗号分隔的字段投影，可跳过 content 等大字段；
+    tag 可重复传入多个，tag_mode 为 any（包含任一标签，默认）或 all（包含全部标签）；
+    If-None-Match 与笔记集合当前的ETag一致时直接返回304，不查询笔记。
+    """
+    selected_fields = parse_fields(fields, NOTE_LIST_COLUMNS, NOTE_REQUIRED_FIELDS)
+    tag_names = parse_tag_filter(tag, tag_mode)
+    
+    etag = await collection_etag(db, Note, current_user.id, request)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    # 只查询投影中的列，不构建ORM实体
+    stmt = select(*[
+        column for name, column in NOTE_LIST_COLUMNS.items()
+        if selected_fields is None or name in selected_fields
+    ]).where(Note.user_id == current_user.id)
     
     if category:
-        query = query.filter(Note.category == category)
+        stmt = stmt.where(Note.category == category)
     
     if folder_id:
-        query = query.filter(Note.folder_id == folder_id)
+        stmt = stmt.where(Note.folder_id == folder_id)
+    
+    if tag_names:
+        stmt = stmt.where(tag_filter("note", Note.id, current_user.id, tag_names, tag_mode))
     
     if search:
-        query = query.filter(
-            (Note.title.contains(search)) |
-            (Note.content.contains(search))
-        )
+        matching_ids = note_search_index.matching_ids(search) if note_search_index.ready else None
+        if matching_ids is not None:
+            stmt = stmt.where(Note.id.in_(matching_ids))
+        else:
+            stmt = stmt.where(
+                (Note.title.contains(search)) |
+                (Note.content.contains(search))
+            )
     
-    notes = query.order_by(Note.updated_at.desc()).all()
+    notes, next_cursor = await paginate(db, stmt, Note.updated_at, Note.id, limit, cursor, as_rows=True)
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     # 转换为响应格式
-    result = []
-    for note in notes:
-        note_dict = {
-            "id": note.id,
-            "title": note.title,
-            "content": note.content,
-            "category": note.category,
-            "folder_id": note.folder_id,
-            "tags": json.loads(note.tags) if note.tags else [],
-            "created_at": note.created_at.isoformat(),
-            "updated_at": note.updated_at.isoformat()
+    items = note_serializer.many(notes, selected_fields)
+    if FAST_JSON_RESPONSES:
+        # 序列化器生成的字典可信，跳过 response_model 校验
+        return json_response(items, response)
+    return items
+
+@router.get("/search")
+async def search_notes(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """全文搜索笔记，按相关度排序并返回高亮摘要"""
+    if not note_search_index.ready:
+        raise HTTPException(status_code=503, detail="全文搜索不可用")
+    
+    hits, total = await note_search_index.search(db, current_user.id, q, limit, offset)
+    
+    notes = {}
+    if hits:
+        notes = {
+            note.id: note
+            for note in await db.scalars(select(Note).where(Note.id.in_([note_id for note_id, _ in hits])))
         }
-        result.append(note_dict)
     
-    return result
+    items = []
+    for note_id, score in hits:
+        note = notes.get(note_id)
+        if note is None:
+            continue
+        item = _note_list_item(note, {*NOTE_REQUIRED_FIELDS, "folder_id", "tags"})
+        item["score"] = round(score, 4)
+        item["title_highlight"] = make_snippet(note.title, q, width=200)
+        item["snippet"] = make_snippet(note.content, q)
+        items.append(item)
+    
+    return {
+        "items": items,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < total else None
+    }
 
 @router.post("/", response_model=NoteResponse)
 async def create_note(
     note_data: NoteCreate,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新笔记"""
     # 创建笔记对象
@@ -77,62 +180,76 @@ async def create_note(
     )
     
     db.add(note)
-    db.commit()
-    db.refresh(note)
+    await db.flush()
+    await set_tags(db, "note", current_user.id, {note.id: note_data.tags or []})
+    await db.commit()
+    await db.refresh(note)
     
-    return {
-        "id": note.id,
-        "title": note.title,
-        "content": note.content,
-        "category": note.category,
-        "folder_id": note.folder_id,
-        "tags": json.loads(note.tags) if note.tags else [],
-        "created_at": note.created_at.isoformat(),
-        "updated_at": note.updated_at.isoformat()
-    }
+    set_etag(response, row_etag("note", note.id, note.updated_at))
+    return _note_list_item(note)
 
 @router.get("/{note_id}", response_model=NoteResponse)
 async def get_note(
     note_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取单个笔记"""
-    note = db.query(Note).filter(
+    """获取单个笔记；If-None-Match 与当前ETag一致时返回304，不读取笔记内容"""
+    if if_none_match:
+        updated_at = (await db.execute(select(Note.updated_at).where(
+            Note.id == note_id,
+            Note.user_id == current_user.id
+        ))).first()
+        if updated_at is not None:
+            etag = row_etag("note", note_id, updated_at[0])
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+    
+    note = await db.scalar(select(Note).where(
         Note.id == note_id,
         Note.user_id == current_user.id
-    ).first()
+    ))
     
     if not note:
         raise HTTPException(status_code=404, detail="笔记不存在")
     
-    return {
-        "id": note.id,
-        "title": note.title,
-        "content": note.content,
-        "category": note.category,
-        "folder_id": note.folder_id,
-        "tags": json.loads(note.tags) if note.tags else [],
-        "created_at": note.created_at.isoformat(),
-        "updated_at": note.updated_at.isoformat()
-    }
+    set_etag(response, row_etag("note", note.id, note.updated_at))
+    return _note_list_item(note)
 
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(
     note_id: int,
     note_data: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """更新笔记"""
-    note = db.query(Note).filter(
+    """更新笔记
+
+    传入 If-Match 时进行乐观并发控制：ETag与笔记当前版本不一致（已被其他客户端修改）时返回412。
+    """
+    note = await db.scalar(select(Note).where(
         Note.id == note_id,
         Note.user_id == current_user.id
-    ).first()
+    ))
     
     if not note:
         raise HTTPException(status_code=404, detail="笔记不存在")
     
+    now = datetime.utcnow()
+    if if_match is not None:
+        check_if_match(if_match, row_etag("note", note.id, note.updated_at))
+        # 以读取时的 updated_at 为条件更新版本，并发修改中只有一个能成功
+        result = await db.execute(update(Note).where(
+            Note.id == note.id,
+            Note.updated_at == note.updated_at
+        ).values(updated_at=now).execution_options(synchronize_session=False))
+        if result.rowcount != 1:
+            raise HTTPException(status_code=412, detail="资源已被修改，请刷新后重试")
+    
     # 更新字段
     if note_data.title is not None:
         note.title = note_data.title
@@ -144,40 +261,34 @@ async def update_note(
         note.folder_id = note_data.folder_id
     if note_data.tags is not None:
         note.tags = json.dumps(note_data.tags)
+        await set_tags(db, "note", current_user.id, {note.id: note_data.tags})
     
-    note.updated_at = datetime.utcnow()
+    note.updated_at = now
     
-    db.commit()
-    db.refresh(note)
+    await db.commit()
+    await db.refresh(note)
     
-    return {
-        "id": note.id,
-        "title": note.title,
-        "content": note.content,
-        "category": note.category,
-        "folder_id": note.folder_id,
-        "tags": json.loads(note.tags) if note.tags else [],
-        "created_at": note.created_at.isoformat(),
-        "updated_at": note.updated_at.isoformat()
-    }
+    set_etag(response, row_etag("note", note.id, note.updated_at))
+    return _note_list_item(note)
 
 @router.delete("/{note_id}")
 async def delete_note(
     note_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除笔记"""
-    note = db.query(Note).filter(
+    note = await db.scalar(select(Note).where(
         Note.id == note_id,
         Note.user_id == current_user.id
-    ).first()
+    ))
     
     if not note:
         raise HTTPException(status_code=404, detail="笔记不存在")
     
-    db.delete(note)
-    db.commit()
+    await clear_tags(db, "note", [note.id])
+    await db.delete(note)
+    await db.commit()
     
     return {"message": "笔记已删除"}
 
@@ -185,10 +296,10 @@ async def delete_note(
 @router.get("/categories/", response_model=List[CategoryResponse])
 async def get_categories(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户的分类列表"""
-    categories = db.query(Category).filter(Category.user_id == current_user.id).all()
+    categories = (await db.scalars(select(Category).where(Category.user_id == current_user.id))).all()
     
     # 如果没有分类，创建默认分类
     if not categories:
@@ -207,8 +318,8 @@ async def get_categories(
             )
             db.add(category)
         
-        db.commit()
-        categories = db.query(Category).filter(Category.user_id == current_user.id).all()
+        await db.commit()
+        categories = (await db.scalars(select(Category).where(Category.user_id == current_user.id))).all()
     
     return [
         {
@@ -225,7 +336,7 @@ async def get_categories(
 async def create_category(
     category_data: CategoryCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新分类"""
     category = Category(
@@ -236,8 +347,8 @@ async def create_category(
     )
     
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
     
     return {
         "id": category.id,
@@ -248,19 +359,26 @@ async def create_category(
     }
 
 # 文件夹相关路由
+async def _query_folders_with_note_count(db: AsyncSession, user_id: int, category: Optional[str] = None):
+    """单次查询获取文件夹及其笔记数量（LEFT JOIN + GROUP BY）"""
+    stmt = select(Folder, func.count(Note.id)).outerjoin(
+        Note,
+        and_(Note.folder_id == Folder.id, Note.user_id == user_id)
+    ).where(Folder.user_id == user_id)
+    
+    if category:
+        stmt = stmt.where(Folder.category == category)
+    
+    return (await db.execute(stmt.group_by(Folder.id).order_by(Folder.created_at))).all()
+
 @router.get("/folders/", response_model=List[FolderResponse])
 async def get_folders(
     category: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户的文件夹列表"""
-    query = db.query(Folder).filter(Folder.user_id == current_user.id)
-    
-    if category:
-        query = query.filter(Folder.category == category)
-    
-    folders = query.order_by(Folder.created_at).all()
+    folders = await _query_folders_with_note_count(db, current_user.id, category)
     
     # 如果没有文件夹，创建默认文件夹
     if not folders:
@@ -283,22 +401,13 @@ async def get_folders(
                 )
                 db.add(folder)
         
-        db.commit()
+        await db.commit()
         
         # 重新查询
-        query = db.query(Folder).filter(Folder.user_id == current_user.id)
-        if category:
-            query = query.filter(Folder.category == category)
-        folders = query.order_by(Folder.created_at).all()
+        folders = await _query_folders_with_note_count(db, current_user.id, category)
     
     result = []
-    for folder in folders:
-        # 统计文件夹中的笔记数量
-        note_count = db.query(Note).filter(
-            Note.folder_id == folder.id,
-            Note.user_id == current_user.id
-        ).count()
-        
+    for folder, note_count in folders:
         result.append({
             "id": folder.id,
             "name": folder.name,
@@ -313,7 +422,7 @@ async def get_folders(
 async def create_folder(
     folder_data: FolderCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新文件夹"""
     folder = Folder(
@@ -323,20 +432,15 @@ async def create_folder(
     )
     
     db.add(folder)
-    db.commit()
-    db.refresh(folder)
-    
-    # 统计笔记数量
-    note_count = db.query(Note).filter(
-        Note.folder_id == folder.id,
-        Note.user_id == current_user.id
-    ).count()
+    await db.commit()
+    await db.refresh(folder)
     
+    # 新建的文件夹中还没有笔记
     return {
         "id": folder.id,
         "name": folder.name,
         "category": folder.category,
-        "note_count": note_count,
+        "note_count": 0,
         "created_at": folder.created_at.isoformat()
     }
 
@@ -346,13 +450,13 @@ async def enhance_note(
     note_id: int,
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI增强笔记内容"""
-    note = db.query(Note).filter(
+    note = await db.scalar(select(Note).where(
         Note.id == note_id,
         Note.user_id == current_user.id
-    ).first()
+    ))
     
     if not note:
         raise HTTPException(status_code=404, detail="笔记不存在")
@@ -373,6 +477,8 @@ async def enhance_note(
             "model": result["model"],
             "mode": result["mode"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI增强失败: {str(e)}")
 
@@ -381,13 +487,13 @@ async def generate_note_tags(
     note_id: int,
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """为笔记生成智能标签"""
-    note = db.query(Note).filter(
+    note = await db.scalar(select(Note).where(
         Note.id == note_id,
         Note.user_id == current_user.id
-    ).first()
+    ))
     
     if not note:
         raise HTTPException(status_code=404, detail="笔记不存在")
@@ -395,8 +501,13 @@ async def generate_note_tags(
     model = request.get("model", "openai/gpt-5")
     
     try:
-        result = await ai_service.generate_tags(note.title, note.content, model=model)
+        result = await ai_service.generate_tags(
+            note.title, note.content, model=model,
+            use_cache=request.get("use_cache", True)
+        )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"标签生成失败: {str(e)}")
 
@@ -405,13 +516,13 @@ async def categorize_note(
     note_id: int,
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """智能分类笔记"""
-    note = db.query(Note).filter(
+    note = await db.scalar(select(Note).where(
         Note.id == note_id,
         Note.user_id == current_user.id
-    ).first()
+    ))
     
     if not note:
         raise HTTPException(status_code=404, detail="笔记不存在")
@@ -419,16 +530,142 @@ async def categorize_note(
     model = request.get("model", "openai/gpt-5")
     
     # 获取用户的分类
-    categories = db.query(Category).filter(Category.user_id == current_user.id).all()
+    categories = (await db.scalars(select(Category).where(Category.user_id == current_user.id))).all()
     category_names = [cat.name for cat in categories] if categories else ["工作", "学习", "生活"]
     
     try:
         result = await ai_service.categorize_note_advanced(
             note.title, note.content, 
             available_categories=category_names, 
-            model=model
+            model=model,
+            use_cache=request.get("use_cache", True)
         )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"笔记分类失败: {str(e)}")
 
+def _sse_event(data: Dict[str, Any]) -> str:
+    """编码一条SSE事件"""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _run_note_ai(note: Note, request: NoteBatchAIRequest, model: str, category_names: List[str]) -> Dict[str, Any]:
+    """对单篇笔记执行AI操作"""
+    if request.operation == NoteAIOperationEnum.generate_tags:
+        return await ai_service.generate_tags(
+            note.title, note.content, model=model, use_cache=request.use_cache
+        )
+    return await ai_service.categorize_note_advanced(
+        note.title, note.content,
+        available_categories=category_names,
+        model=model,
+        use_cache=request.use_cache
+    )
+
+def _note_update_row(note_id: int, operation: NoteAIOperationEnum, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """根据AI结果构建写回的行；分类无法对应到笔记分类时不写回"""
+    if operation == NoteAIOperationEnum.generate_tags:
+        return {"id": note_id, "tags": json.dumps(result["tags"])}
+    category = result.get("category")
+    category = CATEGORY_NAME_TO_ENUM.get(category, category)
+    if category not in CATEGORY_NAME_TO_ENUM.values():
+        return None
+    return {"id": note_id, "category": category}
+
+async def _stream_batch_ai(
+    notes: List[Note],
+    missing_ids: List[int],
+    request: NoteBatchAIRequest,
+    category_names: List[str],
+    user_id: int
+) -> AsyncIterator[str]:
+    """并发处理笔记并按完成顺序推送结果，全部完成后按需一次性批量写回"""
+    model = request.model or "openai/gpt-5"
+    semaphore = asyncio.Semaphore(request.concurrency or NOTE_BATCH_AI_CONCURRENCY)
+    
+    for note_id in missing_ids:
+        yield _sse_event({"type": "error", "note_id": note_id, "status_code": 404, "detail": "笔记不存在"})
+    
+    async def process(note: Note):
+        async with semaphore:
+            try:
+                return note.id, await _run_note_ai(note, request, model, category_names), None
+            except HTTPException as e:
+                return note.id, None, e
+            except Exception as e:
+                return note.id, None, HTTPException(status_code=500, detail=str(e))
+    
+    tasks = [asyncio.ensure_future(process(note)) for note in notes]
+    succeeded = 0
+    rows = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            note_id, result, error = await next_done
+            if error is not None:
+                yield _sse_event({
+                    "type": "error", "note_id": note_id,
+                    "status_code": error.status_code, "detail": error.detail
+                })
+                continue
+            
+            succeeded += 1
+            yield _sse_event({"type": "result", "note_id": note_id, "result": result})
+            if request.apply:
+                row = _note_update_row(note_id, request.operation, result)
+                if row is not None:
+                    rows.append(row)
+    finally:
+        # 客户端断开时取消尚未完成的调用
+        for task in tasks:
+            task.cancel()
+    
+    if rows:
+        # 按主键批量更新，一次提交；updated_at 取写回时的时间，列表ETag随之变化
+        now = datetime.utcnow()
+        for row in rows:
+            row["updated_at"] = now
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Note), rows)
+            if request.operation == NoteAIOperationEnum.generate_tags:
+                await set_tags(db, "note", user_id, {row["id"]: json.loads(row["tags"]) for row in rows})
+            await db.commit()
+    
+    yield _sse_event({
+        "type": "done",
+        "total": len(notes) + len(missing_ids),
+        "succeeded": succeeded,
+        "failed": len(notes) + len(missing_ids) - succeeded,
+        "updated": len(rows)
+    })
+
+@router.post("/batch/ai")
+async def batch_note_ai(
+    request: NoteBatchAIRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """批量为笔记生成标签或智能分类
+
+    以受限的并发数调用AI服务，每篇笔记完成后立即以SSE事件推送结果；
+    apply 为 true 时在全部完成后将标签/分类一次性批量写回。
+    """
+    note_ids = list(dict.fromkeys(request.note_ids))
+    notes = (await db.scalars(
+        select(Note).options(load_only(Note.id, Note.title, Note.content)).where(
+            Note.user_id == current_user.id,
+            Note.id.in_(note_ids)
+        )
+    )).all()
+    found = {note.id for note in notes}
+    missing_ids = [note_id for note_id in note_ids if note_id not in found]
+    
+    category_names = []
+    if request.operation == NoteAIOperationEnum.categorize:
+        categories = (await db.scalars(select(Category.name).where(Category.user_id == current_user.id))).all()
+        category_names = list(categories) or ["工作", "学习", "生活"]
+    
+    return StreamingResponse(
+        _stream_batch_ai(notes, missing_ids, request, category_names, current_user.id),
+        media_type="text/event-stream"
+    )
@@ -1,22 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select, delete, func, case, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import json
 from datetime import datetime, date, timedelta
 
-from database import get_db
+from database import get_async_db
 from models import User, PomodoroSession, UserSettings
 from schemas import PomodoroSessionCreate, PomodoroSessionResponse
 from routers.auth import get_current_user
+from fast_json import RowSerializer, FAST_JSON_RESPONSES, json_response
 
 router = APIRouter()
 
+# 会话列表的列，与 PomodoroSessionResponse 字段一致
+SESSION_LIST_COLUMNS = {
+    "id": PomodoroSession.id,
+    "session_type": PomodoroSession.session_type,
+    "duration": PomodoroSession.duration,
+    "task_id": PomodoroSession.task_id,
+    "completed": PomodoroSession.completed,
+    "theme": PomodoroSession.theme,
+    "started_at": PomodoroSession.started_at,
+    "completed_at": PomodoroSession.completed_at
+}
+
+session_serializer = RowSerializer(SESSION_LIST_COLUMNS)
+
 # 番茄钟会话管理
 @router.post("/sessions", response_model=PomodoroSessionResponse)
 async def create_pomodoro_session(
     session_data: PomodoroSessionCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建番茄钟会话"""
     session = PomodoroSession(
@@ -29,151 +45,115 @@ async def create_pomodoro_session(
     )
     
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     
-    return {
-        "id": session.id,
-        "session_type": session.session_type,
-        "duration": session.duration,
-        "task_id": session.task_id,
-        "completed": session.completed,
-        "theme": session.theme,
-        "started_at": session.started_at,
-        "completed_at": session.completed_at
-    }
+    return session_serializer.for_fields()(session)
 
 @router.get("/sessions", response_model=List[PomodoroSessionResponse])
 async def get_pomodoro_sessions(
+    response: Response,
     limit: int = 50,
     offset: int = 0,
     session_type: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取番茄钟会话列表"""
-    query = db.query(PomodoroSession).filter(
+    stmt = select(*SESSION_LIST_COLUMNS.values()).where(
         PomodoroSession.user_id == current_user.id
     )
     
     if session_type:
-        query = query.filter(PomodoroSession.session_type == session_type)
+        stmt = stmt.where(PomodoroSession.session_type == session_type)
     
     if date_from:
-        query = query.filter(PomodoroSession.created_at >= date_from)
+        stmt = stmt.where(PomodoroSession.started_at >= date_from)
     
     if date_to:
-        query = query.filter(PomodoroSession.created_at <= date_to + timedelta(days=1))
-    
-    sessions = query.order_by(PomodoroSession.created_at.desc()).offset(offset).limit(limit).all()
-    
-    return [
-        {
-            "id": session.id,
-            "session_type": session.session_type,
-            "duration": session.duration,
-            "task_id": session.task_id,
-            "completed": session.completed,
-            "theme": session.theme,
-            "created_at": session.created_at
-        }
-        for session in sessions
-    ]
+        stmt = stmt.where(PomodoroSession.started_at <= date_to + timedelta(days=1))
+    
+    sessions = await db.execute(stmt.order_by(PomodoroSession.started_at.desc()).offset(offset).limit(limit))
+    
+    items = session_serializer.many(sessions)
+    if FAST_JSON_RESPONSES:
+        return json_response(items, response)
+    return items
 
 @router.get("/stats")
 async def get_pomodoro_stats(
     days: int = 7,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取番茄钟统计信息"""
     # 计算日期范围
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
-    
-    # 总会话数
-    total_sessions = db.query(PomodoroSession).filter(
+    today_start = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    is_completed = PomodoroSession.completed == True
+    is_completed_work = and_(PomodoroSession.session_type == "work", is_completed)
+    in_period = PomodoroSession.started_at >= start_date
+    in_today = PomodoroSession.started_at >= today_start
+    
+    # 区间与今日的计数、专注时长，一次条件聚合完成
+    totals = (await db.execute(select(
+        func.sum(case((in_period, 1), else_=0)),
+        func.sum(case((and_(in_period, is_completed), 1), else_=0)),
+        func.sum(case((and_(in_period, is_completed_work), 1), else_=0)),
+        func.sum(case((and_(in_period, is_completed_work), PomodoroSession.duration), else_=0)),
+        func.sum(case((and_(in_today, is_completed), 1), else_=0)),
+        func.sum(case((and_(in_today, is_completed_work), PomodoroSession.duration), else_=0))
+    ).where(
         PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= start_date
-    ).count()
+        PomodoroSession.started_at >= min(start_date, today_start)
+    ))).one()
     
-    # 完成的会话数
-    completed_sessions = db.query(PomodoroSession).filter(
-        PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= start_date,
-        PomodoroSession.completed == True
-    ).count()
-    
-    # 工作会话数
-    work_sessions = db.query(PomodoroSession).filter(
-        PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= start_date,
-        PomodoroSession.session_type == "work",
-        PomodoroSession.completed == True
-    ).count()
-    
-    # 总专注时间（分钟）
-    total_focus_time = db.query(PomodoroSession).filter(
-        PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= start_date,
-        PomodoroSession.session_type == "work",
-        PomodoroSession.completed == True
-    ).all()
-    
-    focus_minutes = sum(session.duration for session in total_focus_time)
-    
-    # 今日统计
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_sessions = db.query(PomodoroSession).filter(
-        PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= today_start,
-        PomodoroSession.completed == True
-    ).count()
+    total_sessions, completed_sessions, work_sessions, focus_minutes, today_sessions, today_focus_minutes = (
+        int(value or 0) for value in totals
+    )
     
-    today_focus_time = db.query(PomodoroSession).filter(
+    # 每日统计：按日期分组，再补齐没有记录的日期
+    first_day = today_start - timedelta(days=days - 1)
+    day_column = func.date(PomodoroSession.started_at)
+    day_rows = (await db.execute(select(
+        day_column,
+        func.count(PomodoroSession.id),
+        func.sum(PomodoroSession.duration)
+    ).where(
         PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= today_start,
-        PomodoroSession.session_type == "work",
-        PomodoroSession.completed == True
-    ).all()
+        PomodoroSession.started_at >= first_day,
+        is_completed_work
+    ).group_by(day_column))).all()
     
-    today_focus_minutes = sum(session.duration for session in today_focus_time)
+    day_totals = {str(day): (count, int(minutes or 0)) for day, count, minutes in day_rows}
     
-    # 每日统计（最近7天）
     daily_stats = []
-    for i in range(days):
-        day_start = (end_date - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        day_sessions = db.query(PomodoroSession).filter(
-            PomodoroSession.user_id == current_user.id,
-            PomodoroSession.created_at >= day_start,
-            PomodoroSession.created_at < day_end,
-            PomodoroSession.session_type == "work",
-            PomodoroSession.completed == True
-        ).all()
-        
-        day_count = len(day_sessions)
-        day_minutes = sum(session.duration for session in day_sessions)
-        
+    for i in range(days - 1, -1, -1):
+        day = (today_start - timedelta(days=i)).date().isoformat()
+        day_count, day_minutes = day_totals.get(day, (0, 0))
         daily_stats.append({
-            "date": day_start.date().isoformat(),
+            "date": day,
             "sessions": day_count,
             "focus_time": day_minutes
         })
     
     # 主题使用统计
     theme_stats = {}
-    theme_sessions = db.query(PomodoroSession).filter(
+    theme_rows = (await db.execute(select(
+        PomodoroSession.theme,
+        func.count(PomodoroSession.id)
+    ).where(
         PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= start_date
-    ).all()
+        in_period
+    ).group_by(PomodoroSession.theme))).all()
     
-    for session in theme_sessions:
-        theme = session.theme or "classic"
-        theme_stats[theme] = theme_stats.get(theme, 0) + 1
+    for theme, count in theme_rows:
+        theme = theme or "classic"
+        theme_stats[theme] = theme_stats.get(theme, 0) + count
     
     return {
         "total_sessions": total_sessions,
@@ -184,7 +164,7 @@ async def get_pomodoro_stats(
         "average_daily_sessions": round(work_sessions / days, 1),
         "today_sessions": today_sessions,
         "today_focus_time": today_focus_minutes,
-        "daily_stats": list(reversed(daily_stats)),  # 最近的日期在前
+        "daily_stats": daily_stats,  # 按日期升序
         "theme_stats": theme_stats,
         "period_days": days
     }
@@ -194,13 +174,13 @@ async def update_pomodoro_session(
     session_id: int,
     updates: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新番茄钟会话"""
-    session = db.query(PomodoroSession).filter(
+    session = await db.scalar(select(PomodoroSession).where(
         PomodoroSession.id == session_id,
         PomodoroSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(status_code=404, detail="会话不存在")
@@ -213,8 +193,8 @@ async def update_pomodoro_session(
     if "theme" in updates:
         session.theme = updates["theme"]
     
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     
     return {"message": "会话已更新", "session_id": session.id}
 
@@ -222,19 +202,19 @@ async def update_pomodoro_session(
 async def delete_pomodoro_session(
     session_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除番茄钟会话"""
-    session = db.query(PomodoroSession).filter(
+    session = await db.scalar(select(PomodoroSession).where(
         PomodoroSession.id == session_id,
         PomodoroSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(status_code=404, detail="会话不存在")
     
-    db.delete(session)
-    db.commit()
+    await db.delete(session)
+    await db.commit()
     
     return {"message": "会话已删除"}
 
@@ -242,12 +222,12 @@ async def delete_pomodoro_session(
 @router.get("/settings")
 async def get_pomodoro_settings(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户番茄钟设置"""
-    settings = db.query(UserSettings).filter(
+    settings = await db.scalar(select(UserSettings).where(
         UserSettings.user_id == current_user.id
-    ).first()
+    ))
     
     if not settings:
         # 创建默认设置
@@ -262,8 +242,8 @@ async def get_pomodoro_settings(
             pomodoro_auto_start=False
         )
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
     
     return {
         "work_time": settings.pomodoro_work_time,
@@ -279,12 +259,12 @@ async def get_pomodoro_settings(
 async def update_pomodoro_settings(
     updates: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新用户番茄钟设置"""
-    settings = db.query(UserSettings).filter(
+    settings = await db.scalar(select(UserSettings).where(
         UserSettings.user_id == current_user.id
-    ).first()
+    ))
     
     if not settings:
         settings = UserSettings(user_id=current_user.id)
@@ -306,8 +286,8 @@ async def update_pomodoro_settings(
     if "auto_start" in updates:
         settings.pomodoro_auto_start = updates["auto_start"]
     
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
     
     return {"message": "设置已更新"}
 
@@ -317,13 +297,13 @@ async def link_task_to_session(
     session_id: int,
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """将番茄钟会话关联到任务"""
-    session = db.query(PomodoroSession).filter(
+    session = await db.scalar(select(PomodoroSession).where(
         PomodoroSession.id == session_id,
         PomodoroSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(status_code=404, detail="会话不存在")
@@ -331,8 +311,8 @@ async def link_task_to_session(
     task_id = request.get("task_id")
     if task_id:
         session.task_id = task_id
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
     
     return {"message": "任务关联成功", "session_id": session.id, "task_id": task_id}
 
@@ -340,14 +320,14 @@ async def link_task_to_session(
 async def get_task_pomodoro_stats(
     task_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取特定任务的番茄钟统计"""
-    sessions = db.query(PomodoroSession).filter(
+    sessions = (await db.scalars(select(PomodoroSession).where(
         PomodoroSession.user_id == current_user.id,
         PomodoroSession.task_id == task_id,
         PomodoroSession.completed == True
-    ).all()
+    ).order_by(PomodoroSession.started_at.desc()))).all()
     
     total_sessions = len(sessions)
     total_time = sum(session.duration for session in sessions)
@@ -360,7 +340,7 @@ async def get_task_pomodoro_stats(
             {
                 "id": session.id,
                 "duration": session.duration,
-                "created_at": session.created_at
+                "started_at": session.started_at
             }
             for session in sessions
         ]
@@ -371,7 +351,7 @@ async def get_task_pomodoro_stats(
 async def batch_delete_sessions(
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量删除番茄钟会话"""
     session_ids = request.get("session_ids", [])
@@ -379,12 +359,13 @@ async def batch_delete_sessions(
     if not session_ids:
         raise HTTPException(status_code=400, detail="会话ID列表不能为空")
     
-    deleted_count = db.query(PomodoroSession).filter(
+    result = await db.execute(delete(PomodoroSession).where(
         PomodoroSession.id.in_(session_ids),
         PomodoroSession.user_id == current_user.id
-    ).delete(synchronize_session=False)
+    ).execution_options(synchronize_session=False))
+    deleted_count = result.rowcount
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"已删除 {deleted_count} 个会话",
@@ -397,16 +378,16 @@ async def export_pomodoro_data(
     format: str = "json",
     days: int = 30,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """导出番茄钟数据"""
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
-    sessions = db.query(PomodoroSession).filter(
+    sessions = (await db.scalars(select(PomodoroSession).where(
         PomodoroSession.user_id == current_user.id,
-        PomodoroSession.created_at >= start_date
-    ).order_by(PomodoroSession.created_at.desc()).all()
+        PomodoroSession.started_at >= start_date
+    ).order_by(PomodoroSession.started_at.desc()))).all()
     
     data = {
         "export_date": datetime.utcnow().isoformat(),
@@ -420,7 +401,8 @@ async def export_pomodoro_data(
                 "task_id": session.task_id,
                 "completed": session.completed,
                 "theme": session.theme,
-                "created_at": session.created_at.isoformat()
+                "started_at": session.started_at.isoformat() if session.started_at else None,
+                "completed_at": session.completed_at.isoformat() if session.completed_at else None
             }
             for session in sessions
         ]
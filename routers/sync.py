@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, List
+import os
+
+from database import get_async_db
+from models import User, Note, Task, Folder, Category, PomodoroSession
+from routers.auth import get_current_user
+from routers.notes import note_serializer
+from routers.tasks import task_serializer
+from routers.pomodoro import session_serializer
+from fast_json import RowSerializer, FAST_JSON_RESPONSES, json_response
+from sync_log import sync_log
+
+router = APIRouter()
+
+# 单次同步返回的最大变更条数
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+MAX_SYNC_PAGE_SIZE = 5000
+
+folder_serializer = RowSerializer(("id", "name", "category", "created_at"))
+category_serializer = RowSerializer(("id", "name", "color", "icon", "created_at"))
+
+# 变更日志中的实体 -> (响应中的集合名, 模型, 序列化器)
+SYNC_ENTITIES = {
+    "note": ("notes", Note, note_serializer),
+    "task": ("tasks", Task, task_serializer),
+    "folder": ("folders", Folder, folder_serializer),
+    "category": ("categories", Category, category_serializer),
+    "pomodoro_session": ("pomodoro_sessions", PomodoroSession, session_serializer),
+}
+
+async def _load_rows(db: AsyncSession, model, serializer: RowSerializer, user_id: int, ids: List[int]) -> List[Dict[str, Any]]:
+    """按id批量读取当前数据"""
+    rows = await db.execute(
+        select(*[getattr(model, name) for name in serializer.fields])
+        .where(model.id.in_(ids), model.user_id == user_id)
+        .order_by(model.id)
+    )
+    return serializer.many(rows)
+
+@router.get("")
+async def sync_changes(
+    since: int = Query(0),
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=MAX_SYNC_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """增量同步：返回 since 游标之后新建/修改的数据和已删除的id
+
+    since=0 为全量同步；has_more 为 true 时以返回的 cursor 继续请求。
+    游标早于已清理的墓碑时返回410，客户端需要从 since=0 重新全量同步。
+    """
+    horizon = await sync_log.horizon(db)
+    # 全量同步尚未越过水位线时返回负数游标：水位线之前的页来自这次全量同步，而不是过期的游标
+    full_sync = since <= 0
+    since = abs(since)
+    if not full_sync and since < horizon:
+        raise HTTPException(status_code=410, detail="同步游标已过期，请从 since=0 重新全量同步")
+    
+    latest, cursor, has_more = await sync_log.changes_since(db, current_user.id, since, limit)
+    if full_sync and cursor < horizon:
+        cursor = -cursor
+    
+    changes = {}
+    for entity, (collection, model, serializer) in SYNC_ENTITIES.items():
+        changed_ids = [entity_id for (kind, entity_id), deleted in latest.items() if kind == entity and not deleted]
+        deleted_ids = [entity_id for (kind, entity_id), deleted in latest.items() if kind == entity and deleted]
+        
+        upserted = await _load_rows(db, model, serializer, current_user.id, changed_ids) if changed_ids else []
+        # 读取时已被删除（删除记录在后续页中）的数据按删除返回
+        found = {row["id"] for row in upserted}
+        deleted_ids.extend(entity_id for entity_id in changed_ids if entity_id not in found)
+        
+        changes[collection] = {"upserted": upserted, "deleted": sorted(deleted_ids)}
+    
+    payload = {"cursor": cursor, "has_more": has_more, "changes": changes}
+    if FAST_JSON_RESPONSES:
+        return json_response(payload)
+    return payload
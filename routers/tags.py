@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from models import User
+from routers.auth import get_current_user
+from tags import tag_counts
+
+router = APIRouter()
+
+@router.get("/")
+async def get_tags(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取用户的标签及各标签关联的笔记数、任务数"""
+    return await tag_counts(db, current_user.id)
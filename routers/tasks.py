@@ -1,160 +1,250 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, Header
+from sqlalchemy import func, select, insert, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Set, Dict, Any
 import json
 from datetime import datetime, date
 
-from database import get_db
-from models import User, Task
+from database import get_async_db
+from models import User, Task, PomodoroSession
 from schemas import (
-    TaskCreate, TaskUpdate, TaskResponse, 
+    TaskCreate, TaskUpdate, TaskResponse, TaskBatchCreate,
     StatusEnum, PriorityEnum, CategoryEnum,
     AIParseTasksRequest, AIParseTasksResponse
 )
 from routers.auth import get_current_user
 from ai_service import ai_service
+from pagination import paginate, parse_fields, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+from fast_json import RowSerializer, FAST_JSON_RESPONSES, json_response
+from tags import set_tags, clear_tags, parse_tags, parse_tag_filter, tag_filter
+from etags import collection_etag, row_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter()
 
+# 列表投影：可选字段及其对应的列
+TASK_LIST_COLUMNS = {
+    "id": Task.id,
+    "title": Task.title,
+    "description": Task.description,
+    "status": Task.status,
+    "priority": Task.priority,
+    "category": Task.category,
+    "project_id": Task.project_id,
+    "due_date": Task.due_date,
+    "estimated_time": Task.estimated_time,
+    "actual_time": Task.actual_time,
+    "tags": Task.tags,
+    "subtasks": Task.subtasks,
+    "ai_generated": Task.ai_generated,
+    "ai_model": Task.ai_model,
+    "created_at": Task.created_at,
+    "updated_at": Task.updated_at
+}
+TASK_REQUIRED_FIELDS = ("id", "title", "category", "created_at", "updated_at")
+
+# 任务行序列化器（tags、subtasks 以JSON字符串存储）
+task_serializer = RowSerializer(TASK_LIST_COLUMNS, json_fields=("tags", "subtasks"))
+
+def _task_list_item(task: Task, fields: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """构建任务列表项，只读取投影中的字段"""
+    return task_serializer.for_fields(fields)(task)
+
+def _task_row(task_data: TaskCreate, user_id: int) -> Dict[str, Any]:
+    """将创建请求转换为任务表的一行数据"""
+    return {
+        "title": task_data.title,
+        "description": task_data.description,
+        "status": task_data.status,
+        "priority": task_data.priority,
+        "category": task_data.category,
+        "project_id": task_data.project_id,
+        "due_date": task_data.due_date,
+        "estimated_time": task_data.estimated_time,
+        "tags": json.dumps(task_data.tags) if task_data.tags else "[]",
+        "subtasks": json.dumps(task_data.subtasks) if task_data.subtasks else "[]",
+        "user_id": user_id
+    }
+
+# AI解析结果中的项目分类（工作/学习/生活）对应的任务分类
+AI_PROJECT_CATEGORIES = {"工作": "work", "学习": "study", "生活": "life"}
+
+def _parsed_date(value: Any) -> Optional[datetime]:
+    """解析AI返回的截止日期（ISO日期或日期时间），无法解析时为空"""
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _parsed_task_row(task_data: Dict[str, Any], user_id: int, model: str) -> Dict[str, Any]:
+    """将 ai_service.parse_tasks_batch 返回的一项转换为任务表的一行数据"""
+    project = task_data.get("project")
+    category = project if project in AI_PROJECT_CATEGORIES.values() else AI_PROJECT_CATEGORIES.get(project, "work")
+    estimated_time = task_data.get("estimated_time")
+    return {
+        "title": str(task_data.get("title") or "未命名任务")[:200],
+        "description": task_data.get("description") or "",
+        "status": "todo",
+        "priority": task_data.get("priority", "medium"),
+        "category": category,
+        "project_id": None,
+        "due_date": _parsed_date(task_data.get("due_date")),
+        "estimated_time": estimated_time if isinstance(estimated_time, int) else None,
+        "tags": json.dumps([str(tag) for tag in task_data.get("tags") or []]),
+        # 子任务统一为 {"title", "completed"} 形式（AI可能只返回标题字符串）
+        "subtasks": json.dumps([
+            subtask if isinstance(subtask, dict) else {"title": str(subtask), "completed": False}
+            for subtask in task_data.get("subtasks") or []
+        ]),
+        "ai_generated": True,
+        "ai_model": model,
+        "user_id": user_id
+    }
+
+async def _bulk_create_tasks(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Task]:
+    """批量插入任务并提交
+
+    使用多行 INSERT ... RETURNING 一次返回创建的行，不再逐条刷新；每行的键必须一致。
+    """
+    # sort_by_parameter_order 保证 RETURNING 的行按传入顺序返回（PostgreSQL等不保证自增id按VALUES顺序分配）；
+    # SQLite上该选项会退化为逐行插入，而同一条多行INSERT中自增id按VALUES顺序分配，因此改为按id排序
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    stmt = insert(Task).returning(Task, sort_by_parameter_order=not sqlite)
+    # render_nulls：ORM批量插入默认省略值为None的键，并在相邻行的键集合不同时拆成多条INSERT
+    # （如部分任务没有截止日期）；这些列都没有默认值，按NULL写入即可保持单条语句
+    tasks = (await db.scalars(stmt.execution_options(render_nulls=True), rows)).all()
+    if tasks:
+        await set_tags(db, "task", tasks[0].user_id, {task.id: parse_tags(task.tags) for task in tasks})
+    await db.commit()
+    return sorted(tasks, key=lambda task: task.id) if sqlite else tasks
+
 # 任务管理
-@router.get("/", response_model=List[TaskResponse])
+@router.get("/", response_model=List[TaskResponse], response_model_exclude_unset=True)
 async def get_tasks(
+    response: Response,
+    request: Request,
     status: Optional[StatusEnum] = None,
     category: Optional[CategoryEnum] = None,
     priority: Optional[PriorityEnum] = None,
     project_id: Optional[int] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: str = "any",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取用户的任务列表"""
-    query = db.query(Task).filter(Task.user_id == current_user.id)
+    """获取用户的任务列表
+
+    传入 limit 时按 (created_at, id) 键集分页，下一页游标通过 X-Next-Cursor 响应头返回；
+    fields 为逗号分隔的字段投影，可跳过 description 等大字段；
+    tag 可重复传入多个，tag_mode 为 any（包含任一标签，默认）或 all（包含全部标签）；
+    If-None-Match 与任务集合当前的ETag一致时直接返回304，不查询任务。
+    """
+    selected_fields = parse_fields(fields, TASK_LIST_COLUMNS, TASK_REQUIRED_FIELDS)
+    tag_names = parse_tag_filter(tag, tag_mode)
+    
+    etag = await collection_etag(db, Task, current_user.id, request)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    # 只查询投影中的列，不构建ORM实体
+    stmt = select(*[
+        column for name, column in TASK_LIST_COLUMNS.items()
+        if selected_fields is None or name in selected_fields
+    ]).where(Task.user_id == current_user.id)
     
     if status:
-        query = query.filter(Task.status == status)
+        stmt = stmt.where(Task.status == status)
     if category:
-        query = query.filter(Task.category == category)
+        stmt = stmt.where(Task.category == category)
     if priority:
-        query = query.filter(Task.priority == priority)
+        stmt = stmt.where(Task.priority == priority)
     if project_id:
-        query = query.filter(Task.project_id == project_id)
+        stmt = stmt.where(Task.project_id == project_id)
     
-    tasks = query.order_by(Task.created_at.desc()).all()
+    if tag_names:
+        stmt = stmt.where(tag_filter("task", Task.id, current_user.id, tag_names, tag_mode))
     
-    # 转换为响应格式
-    result = []
-    for task in tasks:
-        task_dict = {
-            "id": task.id,
-            "title": task.title,
-            "description": task.description,
-            "status": task.status,
-            "priority": task.priority,
-            "category": task.category,
-            "project_id": task.project_id,
-            "due_date": task.due_date,
-            "estimated_time": task.estimated_time,
-            "actual_time": task.actual_time,
-            "tags": json.loads(task.tags) if task.tags else [],
-            "subtasks": json.loads(task.subtasks) if task.subtasks else [],
-            "ai_generated": task.ai_generated,
-            "ai_model": task.ai_model,
-            "created_at": task.created_at,
-            "updated_at": task.updated_at
-        }
-        result.append(task_dict)
+    tasks, next_cursor = await paginate(db, stmt, Task.created_at, Task.id, limit, cursor, as_rows=True)
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
-    return result
+    # 转换为响应格式
+    items = task_serializer.many(tasks, selected_fields)
+    if FAST_JSON_RESPONSES:
+        # 序列化器生成的字典可信，跳过 response_model 校验
+        return json_response(items, response)
+    return items
 
 @router.post("/", response_model=TaskResponse)
 async def create_task(
     task_data: TaskCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新任务"""
-    task = Task(
-        title=task_data.title,
-        description=task_data.description,
-        status=task_data.status,
-        priority=task_data.priority,
-        category=task_data.category,
-        project_id=task_data.project_id,
-        due_date=task_data.due_date,
-        estimated_time=task_data.estimated_time,
-        tags=json.dumps(task_data.tags) if task_data.tags else "[]",
-        subtasks=json.dumps(task_data.subtasks) if task_data.subtasks else "[]",
-        user_id=current_user.id
-    )
+    task = Task(**_task_row(task_data, current_user.id))
     
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    await db.flush()
+    await set_tags(db, "task", current_user.id, {task.id: task_data.tags or []})
+    await db.commit()
+    await db.refresh(task)
     
-    return {
-        "id": task.id,
-        "title": task.title,
-        "description": task.description,
-        "status": task.status,
-        "priority": task.priority,
-        "category": task.category,
-        "project_id": task.project_id,
-        "due_date": task.due_date,
-        "estimated_time": task.estimated_time,
-        "actual_time": task.actual_time,
-        "tags": json.loads(task.tags) if task.tags else [],
-        "subtasks": json.loads(task.subtasks) if task.subtasks else [],
-        "ai_generated": task.ai_generated,
-        "ai_model": task.ai_model,
-        "created_at": task.created_at,
-        "updated_at": task.updated_at
-    }
+    return _task_list_item(task)
+
+@router.post("/batch/create", response_model=List[TaskResponse])
+async def batch_create_tasks(
+    request: TaskBatchCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """批量创建任务（单次最多1000个），按传入顺序返回创建的任务"""
+    tasks = await _bulk_create_tasks(
+        db, [_task_row(task_data, current_user.id) for task_data in request.tasks]
+    )
+    
+    return [_task_list_item(task) for task in tasks]
 
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
     task_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取单个任务"""
-    task = db.query(Task).filter(
+    """获取单个任务；If-None-Match 与当前ETag一致时返回304"""
+    task = await db.scalar(select(Task).where(
         Task.id == task_id,
         Task.user_id == current_user.id
-    ).first()
+    ))
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    return {
-        "id": task.id,
-        "title": task.title,
-        "description": task.description,
-        "status": task.status,
-        "priority": task.priority,
-        "category": task.category,
-        "project_id": task.project_id,
-        "due_date": task.due_date,
-        "estimated_time": task.estimated_time,
-        "actual_time": task.actual_time,
-        "tags": json.loads(task.tags) if task.tags else [],
-        "subtasks": json.loads(task.subtasks) if task.subtasks else [],
-        "ai_generated": task.ai_generated,
-        "ai_model": task.ai_model,
-        "created_at": task.created_at,
-        "updated_at": task.updated_at
-    }
+    etag = row_etag("task", task.id, task.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return _task_list_item(task)
 
 @router.put("/{task_id}", response_model=TaskResponse)
 async def update_task(
     task_id: int,
     task_data: TaskUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新任务"""
-    task = db.query(Task).filter(
+    task = await db.scalar(select(Task).where(
         Task.id == task_id,
         Task.user_id == current_user.id
-    ).first()
+    ))
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -180,50 +270,35 @@ async def update_task(
         task.actual_time = task_data.actual_time
     if task_data.tags is not None:
         task.tags = json.dumps(task_data.tags)
+        await set_tags(db, "task", current_user.id, {task.id: task_data.tags})
     if task_data.subtasks is not None:
         task.subtasks = json.dumps(task_data.subtasks)
     
     task.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     
-    return {
-        "id": task.id,
-        "title": task.title,
-        "description": task.description,
-        "status": task.status,
-        "priority": task.priority,
-        "category": task.category,
-        "project_id": task.project_id,
-        "due_date": task.due_date,
-        "estimated_time": task.estimated_time,
-        "actual_time": task.actual_time,
-        "tags": json.loads(task.tags) if task.tags else [],
-        "subtasks": json.loads(task.subtasks) if task.subtasks else [],
-        "ai_generated": task.ai_generated,
-        "ai_model": task.ai_model,
-        "created_at": task.created_at,
-        "updated_at": task.updated_at
-    }
+    return _task_list_item(task)
 
 @router.delete("/{task_id}")
 async def delete_task(
     task_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除任务"""
-    task = db.query(Task).filter(
+    task = await db.scalar(select(Task).where(
         Task.id == task_id,
         Task.user_id == current_user.id
-    ).first()
+    ))
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    db.delete(task)
-    db.commit()
+    await clear_tags(db, "task", [task.id])
+    await db.delete(task)
+    await db.commit()
     
     return {"message": "任务已删除"}
 
@@ -232,65 +307,25 @@ async def delete_task(
 async def parse_tasks_with_ai(
     request: AIParseTasksRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """使用AI解析文本并创建任务"""
+    """使用AI解析文本并批量创建任务（单条多行INSERT）"""
     try:
         # 调用AI服务解析任务
-        result = await ai_service.parse_tasks_advanced(
-            request.text, 
-            model=request.model or "gpt-5"
-        )
-        
-        # 保存解析出的任务到数据库
-        created_tasks = []
-        for task_data in result["tasks"]:
-            task = Task(
-                title=task_data.get("title", "未命名任务"),
-                description=task_data.get("description", ""),
-                status="todo",
-                priority=task_data.get("priority", "medium"),
-                category=task_data.get("project", "work"),
-                due_date=datetime.fromisoformat(task_data["due_date"]) if task_data.get("due_date") else None,
-                estimated_time=task_data.get("estimated_time"),
-                tags=json.dumps(task_data.get("tags", [])),
-                subtasks=json.dumps(task_data.get("subtasks", [])),
-                ai_generated=True,
-                ai_model=request.model or "gpt-5",
-                user_id=current_user.id
-            )
-            
-            db.add(task)
-            created_tasks.append(task)
-        
-        db.commit()
+        result = await ai_service.parse_tasks_batch(request.text, model=request.model or "gpt-5")
         
-        # 刷新任务数据
-        for task in created_tasks:
-            db.refresh(task)
+        # 批量保存解析出的任务到数据库；ai_model 记录实际使用的模型（可能为回退模型）
+        rows = [_parsed_task_row(task_data, current_user.id, result["model"]) for task_data in result["tasks"]]
+        created_tasks = await _bulk_create_tasks(db, rows) if rows else []
         
         return {
-            "tasks": [
-                {
-                    "id": task.id,
-                    "title": task.title,
-                    "description": task.description,
-                    "status": task.status,
-                    "priority": task.priority,
-                    "category": task.category,
-                    "due_date": task.due_date,
-                    "estimated_time": task.estimated_time,
-                    "tags": json.loads(task.tags) if task.tags else [],
-                    "subtasks": json.loads(task.subtasks) if task.subtasks else [],
-                    "ai_generated": task.ai_generated,
-                    "ai_model": task.ai_model
-                }
-                for task in created_tasks
-            ],
-            "model": request.model or "gpt-5",
+            "tasks": [_task_list_item(task) for task in created_tasks],
+            "model": result["model"],
             "total_count": len(created_tasks)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI任务解析失败: {str(e)}")
 
@@ -299,13 +334,13 @@ async def complete_task(
     task_id: int,
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """完成任务"""
-    task = db.query(Task).filter(
+    task = await db.scalar(select(Task).where(
         Task.id == task_id,
         Task.user_id == current_user.id
-    ).first()
+    ))
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -314,8 +349,8 @@ async def complete_task(
     task.actual_time = request.get("actual_time")
     task.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     
     return {"message": "任务已完成", "task_id": task.id}
 
@@ -323,13 +358,13 @@ async def complete_task(
 async def start_task(
     task_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """开始任务"""
-    task = db.query(Task).filter(
+    task = await db.scalar(select(Task).where(
         Task.id == task_id,
         Task.user_id == current_user.id
-    ).first()
+    ))
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -337,8 +372,8 @@ async def start_task(
     task.status = "in_progress"
     task.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     
     return {"message": "任务已开始", "task_id": task.id}
 
@@ -346,63 +381,42 @@ async def start_task(
 @router.get("/stats/summary")
 async def get_task_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取任务统计信息"""
-    total_tasks = db.query(Task).filter(Task.user_id == current_user.id).count()
-    
-    completed_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.status == "completed"
-    ).count()
-    
-    in_progress_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.status == "in_progress"
-    ).count()
-    
-    todo_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.status == "todo"
-    ).count()
-    
-    # 按分类统计
-    work_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.category == "work"
-    ).count()
-    
-    study_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.category == "study"
-    ).count()
-    
-    life_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.category == "life"
-    ).count()
-    
-    # 按优先级统计
-    high_priority = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.priority == "high"
-    ).count()
-    
-    medium_priority = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.priority == "medium"
-    ).count()
-    
-    low_priority = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.priority == "low"
-    ).count()
-    
-    # AI生成的任务数量
-    ai_generated_tasks = db.query(Task).filter(
-        Task.user_id == current_user.id,
-        Task.ai_generated == True
-    ).count()
+    # 单次分组聚合，在内存中汇总各维度计数
+    rows = (await db.execute(select(
+        Task.status,
+        Task.category,
+        Task.priority,
+        Task.ai_generated,
+        func.count(Task.id)
+    ).where(
+        Task.user_id == current_user.id
+    ).group_by(
+        Task.status, Task.category, Task.priority, Task.ai_generated
+    ))).all()
+    
+    status_counts = {"todo": 0, "in_progress": 0, "completed": 0}
+    category_counts = {"work": 0, "study": 0, "life": 0}
+    priority_counts = {"high": 0, "medium": 0, "low": 0}
+    total_tasks = 0
+    ai_generated_tasks = 0
+    
+    for task_status, task_category, task_priority, ai_generated, count in rows:
+        total_tasks += count
+        if task_status in status_counts:
+            status_counts[task_status] += count
+        if task_category in category_counts:
+            category_counts[task_category] += count
+        if task_priority in priority_counts:
+            priority_counts[task_priority] += count
+        if ai_generated:
+            ai_generated_tasks += count
+    
+    completed_tasks = status_counts["completed"]
+    in_progress_tasks = status_counts["in_progress"]
+    todo_tasks = status_counts["todo"]
     
     return {
         "total_tasks": total_tasks,
@@ -410,16 +424,8 @@ async def get_task_stats(
         "in_progress_tasks": in_progress_tasks,
         "todo_tasks": todo_tasks,
         "completion_rate": round(completed_tasks / total_tasks * 100, 1) if total_tasks > 0 else 0,
-        "category_stats": {
-            "work": work_tasks,
-            "study": study_tasks,
-            "life": life_tasks
-        },
-        "priority_stats": {
-            "high": high_priority,
-            "medium": medium_priority,
-            "low": low_priority
-        },
+        "category_stats": category_counts,
+        "priority_stats": priority_counts,
         "ai_generated_tasks": ai_generated_tasks,
         "ai_usage_rate": round(ai_generated_tasks / total_tasks * 100, 1) if total_tasks > 0 else 0
     }
@@ -429,7 +435,7 @@ async def get_task_stats(
 async def batch_update_status(
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量更新任务状态"""
     task_ids = request.get("task_ids", [])
@@ -443,15 +449,15 @@ async def batch_update_status(
         raise HTTPException(status_code=400, detail="无效的状态值")
     
     # 批量更新
-    updated_count = db.query(Task).filter(
+    result = await db.execute(update(Task).where(
         Task.id.in_(task_ids),
         Task.user_id == current_user.id
-    ).update(
-        {"status": new_status, "updated_at": datetime.utcnow()},
-        synchronize_session=False
-    )
+    ).values(
+        status=new_status, updated_at=datetime.utcnow()
+    ).execution_options(synchronize_session=False))
+    updated_count = result.rowcount
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"已更新 {updated_count} 个任务的状态",
@@ -462,7 +468,7 @@ async def batch_update_status(
 async def batch_delete_tasks(
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量删除任务"""
     task_ids = request.get("task_ids", [])
@@ -470,13 +476,24 @@ async def batch_delete_tasks(
     if not task_ids:
         raise HTTPException(status_code=400, detail="任务ID列表不能为空")
     
+    # 先解除番茄钟记录与这些任务的关联，避免违反外键约束
+    owned_task_ids = select(Task.id).where(
+        Task.id.in_(task_ids),
+        Task.user_id == current_user.id
+    )
+    await db.execute(update(PomodoroSession).where(
+        PomodoroSession.task_id.in_(owned_task_ids)
+    ).values(task_id=None).execution_options(synchronize_session=False))
+    await clear_tags(db, "task", (await db.scalars(owned_task_ids)).all())
+    
     # 批量删除
-    deleted_count = db.query(Task).filter(
+    result = await db.execute(delete(Task).where(
         Task.id.in_(task_ids),
         Task.user_id == current_user.id
-    ).delete(synchronize_session=False)
+    ).execution_options(synchronize_session=False))
+    deleted_count = result.rowcount
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"已删除 {deleted_count} 个任务",
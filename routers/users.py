@@ -8,6 +8,7 @@ from schemas import UserResponse as UserSchema, UserCreate, UserUpdate, UserLogi
 from auth import (
     authenticate_user, 
     create_access_token, 
+    token_claims,
     get_password_hash, 
     get_current_active_user, 
     get_current_super_user,
@@ -35,7 +36,7 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -19,6 +19,10 @@ class CategoryEnum(str, Enum):
     study = "study"
     life = "life"
 
+class NoteAIOperationEnum(str, Enum):
+    generate_tags = "generate_tags"
+    categorize = "categorize"
+
 # 用户相关模式
 class UserBase(BaseModel):
     username: str = Field(..., min_length=2, max_length=50)
@@ -121,6 +125,17 @@ class NoteResponse(NoteBase):
     class Config:
         from_attributes = True
 
+# 批量AI处理的最大并发数
+MAX_NOTE_BATCH_AI_CONCURRENCY = 32
+
+class NoteBatchAIRequest(BaseModel):
+    note_ids: List[int] = Field(..., min_length=1, max_length=500)
+    operation: NoteAIOperationEnum
+    model: Optional[str] = None
+    apply: bool = False  # 是否将生成的标签/分类写回笔记
+    use_cache: bool = True
+    concurrency: Optional[int] = Field(None, ge=1, le=MAX_NOTE_BATCH_AI_CONCURRENCY)
+
 # 任务相关模式
 class TaskBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
@@ -150,6 +165,9 @@ class TaskUpdate(BaseModel):
     tags: Optional[List[str]] = None
     subtasks: Optional[List[Dict[str, Any]]] = None
 
+class TaskBatchCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=1000)
+
 class TaskResponse(TaskBase):
     id: int
     actual_time: Optional[int] = None
@@ -0,0 +1,187 @@
+import re
+import html
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import event, inspect, text, Integer, column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import engine
+from models import Note
+
+# CJK字符范围（中日韩统一表意文字、扩展A、假名、韩文音节）
+CJK_RANGES = "一-鿿㐀-䶿぀-ヿ가-힯"
+TOKEN_PATTERN = re.compile(f"[{CJK_RANGES}]+|[^\\W_{CJK_RANGES}]+")
+CJK_PATTERN = re.compile(f"^[{CJK_RANGES}]+$")
+
+def tokenize(value: Optional[str], unigrams: bool = False) -> List[str]:
+    """分词：英文按单词切分并转小写，中日韩文本切分为重叠二元组
+
+    unigrams 为真时（写入索引）同时输出单字，使单字查询能命中词中任意位置（包括末尾）的字。
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer((value or "").lower()):
+        word = match.group(0)
+        if CJK_PATTERN.match(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            if unigrams:
+                tokens.extend(word)
+        else:
+            tokens.append(word)
+    return tokens
+
+def segment_text(value: Optional[str]) -> str:
+    """将文本转换为以空格分隔的索引词串（二元组和单字）
+
+    规则需与 alembic/versions/0008_note_search_index.py 中回填使用的分词一致。
+    """
+    return " ".join(tokenize(value, unigrams=True))
+
+def make_snippet(value: Optional[str], query: str, width: int = 80) -> str:
+    """截取首个命中位置附近的文本，并用 <mark> 标记命中词"""
+    value = value or ""
+    terms = [term for term in query.split() if term]
+    if not terms:
+        return html.escape(value[:width])
+
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(value)
+    start = max(match.start() - width // 4, 0) if match else 0
+    end = min(start + width, len(value))
+    fragment = value[start:end]
+
+    highlighted = []
+    position = 0
+    for hit in pattern.finditer(fragment):
+        highlighted.append(html.escape(fragment[position:hit.start()]))
+        highlighted.append(f"<mark>{html.escape(hit.group(0))}</mark>")
+        position = hit.end()
+    highlighted.append(html.escape(fragment[position:]))
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(value) else ""
+    return prefix + "".join(highlighted) + suffix
+
+class NoteSearchIndex:
+    """笔记全文索引：SQLite使用FTS5虚拟表，PostgreSQL使用tsvector + GIN索引"""
+
+    def __init__(self, bind):
+        self.engine = bind
+        self.dialect = bind.dialect.name
+        self.ready = False
+
+    def setup(self):
+        """检查索引表是否存在（由迁移 0008 创建并回填）；不存在时退回LIKE查询"""
+        if self.dialect not in ("sqlite", "postgresql"):
+            return
+        if not inspect(self.engine).has_table(self._table):
+            print("⚠️ 全文索引不可用，使用LIKE搜索")
+            return
+        self.ready = True
+
+    @property
+    def _table(self) -> str:
+        return "notes_fts" if self.dialect == "sqlite" else "notes_search"
+
+    @staticmethod
+    def _params(note_id: int, title: Optional[str], content: Optional[str]) -> Dict[str, Any]:
+        return {"note_id": note_id, "title": segment_text(title), "content": segment_text(content)}
+
+    def _insert_sql(self):
+        if self.dialect == "sqlite":
+            return text("INSERT INTO notes_fts (rowid, title, content) VALUES (:note_id, :title, :content)")
+        return text(
+            "INSERT INTO notes_search (note_id, document) VALUES (:note_id, "
+            "setweight(to_tsvector('simple', :title), 'A') || setweight(to_tsvector('simple', :content), 'B')) "
+            "ON CONFLICT (note_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+    def _delete_sql(self):
+        if self.dialect == "sqlite":
+            return text("DELETE FROM notes_fts WHERE rowid = :note_id")
+        return text("DELETE FROM notes_search WHERE note_id = :note_id")
+
+    def index_note(self, conn, note: Note):
+        """写入或更新单条笔记的索引（在笔记所在事务中执行）"""
+        if self.dialect == "sqlite":
+            conn.execute(self._delete_sql(), {"note_id": note.id})
+        conn.execute(self._insert_sql(), self._params(note.id, note.title, note.content))
+
+    def remove_note(self, conn, note_id: int):
+        """删除单条笔记的索引"""
+        conn.execute(self._delete_sql(), {"note_id": note_id})
+
+    def _match_query(self, query: str) -> Optional[str]:
+        """将用户输入转换为全文检索表达式，所有词都需命中"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+
+        # 单个中文字符直接匹配索引中的单字
+        terms = []
+        for token in dict.fromkeys(tokens):
+            if self.dialect == "sqlite":
+                terms.append('"' + token.replace('"', '""') + '"')
+            else:
+                escaped = token.replace("'", "''").replace("\\", "\\\\")
+                terms.append(f"'{escaped}'")
+        return " ".join(terms) if self.dialect == "sqlite" else " & ".join(terms)
+
+    def matching_ids(self, query: str):
+        """返回命中笔记id的子查询，可用于 Note.id.in_(...)；查询中没有可索引的词时返回None"""
+        match_query = self._match_query(query)
+        if not match_query:
+            return None
+        if self.dialect == "sqlite":
+            sql = text("SELECT rowid FROM notes_fts WHERE notes_fts MATCH :match_query")
+        else:
+            sql = text("SELECT note_id FROM notes_search WHERE document @@ to_tsquery('simple', :match_query)")
+        return sql.bindparams(match_query=match_query).columns(column("id", Integer))
+
+    async def search(self, db: AsyncSession, user_id: int, query: str, limit: int, offset: int) -> Tuple[List[Tuple[int, float]], int]:
+        """按相关度排序检索用户的笔记，返回 ([(note_id, score)], 命中总数)"""
+        match_query = self._match_query(query)
+        if not match_query:
+            return [], 0
+
+        params = {"match_query": match_query, "user_id": user_id, "limit": limit, "offset": offset}
+        if self.dialect == "sqlite":
+            # bm25越小越相关，标题权重更高
+            base = (
+                "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+                "WHERE notes_fts MATCH :match_query AND notes.user_id = :user_id"
+            )
+            rows_sql = f"SELECT notes.id, -bm25(notes_fts, 10.0, 1.0) AS score {base} ORDER BY score DESC, notes.id DESC LIMIT :limit OFFSET :offset"
+        else:
+            base = (
+                "FROM notes_search JOIN notes ON notes.id = notes_search.note_id "
+                "WHERE notes_search.document @@ to_tsquery('simple', :match_query) AND notes.user_id = :user_id"
+            )
+            rows_sql = (
+                "SELECT notes.id, ts_rank(notes_search.document, to_tsquery('simple', :match_query)) AS score "
+                f"{base} ORDER BY score DESC, notes.id DESC LIMIT :limit OFFSET :offset"
+            )
+
+        rows = (await db.execute(text(rows_sql), params)).all()
+        total = (await db.execute(text(f"SELECT COUNT(*) {base}"), params)).scalar()
+        return [(row[0], float(row[1])) for row in rows], total
+
+# 创建全局索引实例
+note_search_index = NoteSearchIndex(engine)
+
+# 笔记增删改时同步索引
+@event.listens_for(Note, "after_insert")
+def _index_inserted_note(mapper, connection, target):
+    if note_search_index.ready:
+        note_search_index.index_note(connection, target)
+
+@event.listens_for(Note, "after_update")
+def _index_updated_note(mapper, connection, target):
+    if not note_search_index.ready:
+        return
+    state = inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes():
+        note_search_index.index_note(connection, target)
+
+@event.listens_for(Note, "after_delete")
+def _remove_deleted_note(mapper, connection, target):
+    if note_search_index.ready:
+        note_search_index.remove_note(connection, target.id)
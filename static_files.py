@@ -0,0 +1,154 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+from typing import Dict, Optional
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # 未安装brotli时仅提供gzip压缩（构建时生成的 .br 文件仍会使用）
+    brotli = None
+
+from etags import etag_matches
+
+# 带内容哈希的构建产物（如 assets/index-DwMZZCCq.js），内容变化时文件名随之变化，可永久缓存
+HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html 等固定文件名的文件每次使用前都需要重新验证
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# 已压缩的格式，不再压缩
+INCOMPRESSIBLE_TYPES = {
+    "image/png", "image/jpeg", "image/gif", "image/webp", "image/avif",
+    "font/woff", "font/woff2", "application/zip", "application/gzip", "video/mp4", "audio/mpeg",
+}
+# 小于该大小或压缩率不足时不保存压缩版本
+MIN_COMPRESS_SIZE = 256
+MIN_COMPRESS_RATIO = 0.9
+
+# 协商顺序：优先brotli
+ENCODINGS = ("br", "gzip")
+PRECOMPRESSED_SUFFIXES = {".br": "br", ".gz": "gzip"}
+
+class StaticFile:
+    """内存中的静态文件：原始内容与各压缩版本"""
+
+    __slots__ = ("media_type", "cache_control", "etag", "bodies")
+
+    def __init__(self, media_type: str, cache_control: str, etag: str, bodies: Dict[str, bytes]):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = etag
+        # 编码 -> 内容，identity 为原始内容
+        self.bodies = bodies
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """解析 Accept-Encoding 请求头为 {编码: q值}"""
+    accepted = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+class StaticManifest:
+    """前端静态文件清单：启动时读取 static 目录，预先压缩并计算ETag
+
+    请求路径只查询内存中的清单，不访问文件系统；未知路径直接回退到 index.html。
+    """
+
+    def __init__(self, root: str = "static", gzip_level: int = 9, brotli_quality: int = 11):
+        self.root = root
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.files: Dict[str, StaticFile] = {}
+
+    def load(self):
+        """遍历静态目录构建清单（应用启动时调用）"""
+        files = {}
+        if os.path.isdir(self.root):
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    path = posixpath.join(*os.path.relpath(os.path.join(directory, name), self.root).split(os.sep))
+                    base, suffix = posixpath.splitext(path)
+                    # 构建时生成的压缩文件作为原文件的压缩版本，不单独提供
+                    if suffix in PRECOMPRESSED_SUFFIXES and os.path.isfile(os.path.join(self.root, base)):
+                        continue
+                    files[path] = self._load_file(path)
+        self.files = files
+        compressed = sum(1 for f in files.values() if len(f.bodies) > 1)
+        print(f"✅ 静态文件清单已加载: {len(files)} 个文件，{compressed} 个已预压缩"
+              f"（brotli: {'开启' if brotli is not None else '未安装'}）")
+
+    def _load_file(self, path: str) -> StaticFile:
+        full_path = os.path.join(self.root, *path.split("/"))
+        with open(full_path, "rb") as f:
+            content = f.read()
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        bodies = {"identity": content}
+        if len(content) >= MIN_COMPRESS_SIZE and media_type not in INCOMPRESSIBLE_TYPES:
+            for suffix, encoding in PRECOMPRESSED_SUFFIXES.items():
+                if os.path.isfile(full_path + suffix):
+                    with open(full_path + suffix, "rb") as f:
+                        bodies[encoding] = f.read()
+            if "gzip" not in bodies:
+                bodies["gzip"] = gzip.compress(content, compresslevel=self.gzip_level, mtime=0)
+            if "br" not in bodies and brotli is not None:
+                bodies["br"] = brotli.compress(content, quality=self.brotli_quality)
+            for encoding in ENCODINGS:
+                if encoding in bodies and len(bodies[encoding]) > len(content) * MIN_COMPRESS_RATIO:
+                    del bodies[encoding]
+
+        cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_ASSET.match(path) else REVALIDATE_CACHE_CONTROL
+        etag = hashlib.sha256(content).hexdigest()[:32]
+        return StaticFile(media_type, cache_control, etag, bodies)
+
+    def lookup(self, path: str) -> Optional[StaticFile]:
+        """按请求路径查找文件；路径只做字符串规范化（.. 无法越出静态目录）"""
+        path = posixpath.normpath("/" + path).lstrip("/")
+        static_file = self.files.get(path or "index.html")
+        if static_file is None and not path.startswith("assets/"):
+            # SPA路由回退到 index.html；缺失的构建产物返回404，避免以HTML作为脚本加载
+            static_file = self.files.get("index.html")
+        return static_file
+
+    def response(self, static_file: StaticFile, accept_encoding: Optional[str], if_none_match: Optional[str]) -> Response:
+        """按 Accept-Encoding 选择压缩版本，ETag匹配时返回304"""
+        encoding = "identity"
+        if len(static_file.bodies) > 1:
+            accepted = parse_accept_encoding(accept_encoding)
+            for candidate in ENCODINGS:
+                if candidate in static_file.bodies and accepted.get(candidate, accepted.get("*", 0)) > 0:
+                    encoding = candidate
+                    break
+
+        # 不同编码的内容不同，使用不同的强ETag
+        etag = f'"{static_file.etag}"' if encoding == "identity" else f'"{static_file.etag}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": static_file.cache_control}
+        if len(static_file.bodies) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=static_file.bodies[encoding], media_type=static_file.media_type, headers=headers)
+
+# 创建全局静态文件清单
+static_manifest = StaticManifest(
+    root=os.getenv("STATIC_DIR", "static"),
+    gzip_level=int(os.getenv("STATIC_GZIP_LEVEL", "9")),
+    brotli_quality=int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+)
@@ -0,0 +1,151 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import select, delete, update, insert, func, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import engine
+from models import SyncChange, SystemSettings
+
+# 已清理墓碑的最大序号，记录在 system_settings 中；早于该序号的游标无法再得到完整的删除记录
+HORIZON_KEY = "sync_tombstone_horizon"
+
+class SyncLog:
+    """增量同步的变更日志（sync_changes 由数据库触发器写入）：读取变更，并定期压缩日志"""
+
+    def __init__(
+        self,
+        tombstone_days: int = 30,
+        compact_interval: float = 3600.0,
+        settle_seconds: float = 0.0
+    ):
+        # 墓碑保留天数，超过后清理并提升水位线
+        self.tombstone_days = tombstone_days
+        self.compact_interval = compact_interval
+        # 游标不越过最近 settle_seconds 秒内的变更：PostgreSQL中序号先分配、事务后提交，
+        # 较小的序号可能晚于较大的序号可见，这些变更在下一次同步时会再次返回
+        self.settle_seconds = settle_seconds
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.compactions = 0
+        self.superseded_removed = 0
+        self.tombstones_removed = 0
+
+    async def horizon(self, db: AsyncSession) -> int:
+        """获取墓碑水位线"""
+        value = await db.scalar(select(SystemSettings.value).where(SystemSettings.key == HORIZON_KEY))
+        return int(value) if value else 0
+
+    async def changes_since(
+        self, db: AsyncSession, user_id: int, since: int, limit: int
+    ) -> Tuple[Dict[Tuple[str, int], bool], int, bool]:
+        """读取用户在 since 之后的变更，同一实体只保留最后一次
+
+        返回 ({(实体, id): 是否已删除}, 新游标, 是否还有更多变更)。
+        """
+        rows = (await db.execute(
+            select(SyncChange.id, SyncChange.entity, SyncChange.entity_id, SyncChange.deleted, SyncChange.changed_at)
+            .where(SyncChange.user_id == user_id, SyncChange.id > since)
+            .order_by(SyncChange.id)
+            .limit(limit + 1)
+        )).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        latest = {}
+        for _, entity, entity_id, deleted, _ in rows:
+            latest[(entity, entity_id)] = deleted
+
+        cursor = rows[-1][0] if rows else since
+        if self.settle_seconds:
+            # 每一页都在第一条未稳定的变更之前停止游标：之后的序号之间可能还有未提交的变更
+            settled_before = datetime.utcnow() - timedelta(seconds=self.settle_seconds)
+            for index, row in enumerate(rows):
+                if row[4] > settled_before:
+                    cursor = rows[index - 1][0] if index else since
+                    # 其余变更尚未稳定，客户端稍后从该游标继续
+                    has_more = False
+                    break
+        return latest, cursor, has_more
+
+    def compact(self) -> Dict[str, int]:
+        """压缩变更日志（在线程池中执行）
+
+        同一实体只保留最后一条变更；超过保留期的墓碑删除后提升水位线，游标早于水位线的客户端需要全量同步。
+        """
+        later = aliased(SyncChange)
+        cutoff = datetime.utcnow() - timedelta(days=self.tombstone_days)
+        with engine.begin() as connection:
+            superseded = connection.execute(delete(SyncChange).where(exists().where(
+                later.entity == SyncChange.entity,
+                later.entity_id == SyncChange.entity_id,
+                later.id > SyncChange.id
+            ))).rowcount
+
+            tombstones = 0
+            horizon = connection.execute(select(func.max(SyncChange.id)).where(
+                SyncChange.deleted == True,
+                SyncChange.changed_at < cutoff
+            )).scalar()
+            if horizon:
+                tombstones = connection.execute(delete(SyncChange).where(
+                    SyncChange.deleted == True,
+                    SyncChange.id <= horizon
+                )).rowcount
+                updated = connection.execute(update(SystemSettings).where(
+                    SystemSettings.key == HORIZON_KEY
+                ).values(value=str(horizon), updated_at=datetime.utcnow())).rowcount
+                if not updated:
+                    connection.execute(insert(SystemSettings).values(
+                        key=HORIZON_KEY, value=str(horizon), description="增量同步墓碑水位线",
+                        created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+                    ))
+
+        self.compactions += 1
+        self.superseded_removed += superseded
+        self.tombstones_removed += tombstones
+        return {"superseded": superseded, "tombstones": tombstones}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception as e:
+                print(f"❌ 同步变更日志压缩失败: {e}")
+            await asyncio.sleep(self.compact_interval)
+
+    def start(self):
+        """启动后台压缩任务"""
+        if self._task is None and self.compact_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台压缩任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取压缩统计"""
+        return {
+            "compactions": self.compactions,
+            "superseded_removed": self.superseded_removed,
+            "tombstones_removed": self.tombstones_removed
+        }
+
+# 创建全局变更日志实例
+sync_log = SyncLog(
+    tombstone_days=int(os.getenv("SYNC_TOMBSTONE_DAYS", "30")),
+    compact_interval=float(os.getenv("SYNC_COMPACT_INTERVAL", "3600")),
+    settle_seconds=float(os.getenv(
+        "SYNC_SETTLE_SECONDS", "0" if engine.dialect.name == "sqlite" else "5"
+    ))
+)
@@ -0,0 +1,128 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Tag, note_tags, task_tags
+
+# 标签名最大长度（与 tags.name 列一致）
+MAX_TAG_LENGTH = 50
+# 单次筛选最多的标签数
+MAX_FILTER_TAGS = 20
+
+# 实体类型 -> (关联表, 关联表中的实体id列)
+TAG_LINKS = {
+    "note": (note_tags, note_tags.c.note_id),
+    "task": (task_tags, task_tags.c.task_id),
+}
+
+def normalize_tags(tags: Any) -> List[str]:
+    """规范化标签列表：去除首尾空白、截断过长的标签，丢弃空值和非字符串，按首次出现去重"""
+    if not isinstance(tags, list):
+        return []
+    names = []
+    for tag in tags:
+        if isinstance(tag, str):
+            name = tag.strip()[:MAX_TAG_LENGTH]
+            if name:
+                names.append(name)
+    return list(dict.fromkeys(names))
+
+def parse_tags(value: Optional[str]) -> List[str]:
+    """解析 tags 列中的JSON字符串"""
+    try:
+        return normalize_tags(json.loads(value)) if value else []
+    except ValueError:
+        return []
+
+def _insert_ignore(dialect_name: str):
+    """插入标签，(user_id, name) 已存在时跳过（并发创建同名标签时不报错）"""
+    if dialect_name == "postgresql":
+        return postgresql.insert(Tag).on_conflict_do_nothing(index_elements=["user_id", "name"])
+    if dialect_name == "sqlite":
+        return sqlite.insert(Tag).on_conflict_do_nothing(index_elements=["user_id", "name"])
+    return insert(Tag)
+
+async def ensure_tags(db: AsyncSession, user_id: int, names: Iterable[str]) -> Dict[str, int]:
+    """获取标签名到标签id的映射，不存在的标签一次性批量创建"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+
+    stmt = select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(names))
+    tag_ids = dict((await db.execute(stmt)).all())
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        await db.execute(
+            _insert_ignore(db.bind.dialect.name),
+            [{"user_id": user_id, "name": name} for name in missing]
+        )
+        tag_ids.update((await db.execute(stmt.where(Tag.name.in_(missing)))).all())
+    return tag_ids
+
+async def set_tags(db: AsyncSession, kind: str, user_id: int, tags_by_id: Dict[int, List[str]]):
+    """批量替换笔记/任务的标签关联（不提交，由调用方与实体变更一起提交）"""
+    if not tags_by_id:
+        return
+    link, entity_column = TAG_LINKS[kind]
+    tags_by_id = {entity_id: normalize_tags(tags) for entity_id, tags in tags_by_id.items()}
+    tag_ids = await ensure_tags(db, user_id, [name for names in tags_by_id.values() for name in names])
+
+    await db.execute(delete(link).where(entity_column.in_(list(tags_by_id))))
+    rows = [
+        {entity_column.key: entity_id, "tag_id": tag_ids[name]}
+        for entity_id, names in tags_by_id.items()
+        for name in names
+    ]
+    if rows:
+        await db.execute(insert(link), rows)
+
+async def clear_tags(db: AsyncSession, kind: str, entity_ids: List[int]):
+    """删除笔记/任务时移除其标签关联（SQLite未开启外键约束时不会级联删除）"""
+    if entity_ids:
+        link, entity_column = TAG_LINKS[kind]
+        await db.execute(delete(link).where(entity_column.in_(entity_ids)))
+
+def parse_tag_filter(tags: Optional[List[str]], mode: str) -> Optional[List[str]]:
+    """解析 ?tag= 筛选参数，未指定时返回None"""
+    if mode not in ("any", "all"):
+        raise HTTPException(status_code=400, detail="tag_mode 只能为 any 或 all")
+    names = normalize_tags(tags or [])
+    if len(names) > MAX_FILTER_TAGS:
+        raise HTTPException(status_code=400, detail=f"最多同时按 {MAX_FILTER_TAGS} 个标签筛选")
+    return names or None
+
+def tag_filter(kind: str, id_column, user_id: int, names: List[str], mode: str = "any"):
+    """按标签筛选的条件：any 为包含任一标签，all 为包含全部标签
+
+    通过 (user_id, name) 唯一索引找到标签id，再由关联表的 tag_id 索引取得实体id。
+    """
+    link, entity_column = TAG_LINKS[kind]
+    matching = select(entity_column).join(Tag, Tag.id == link.c.tag_id).where(
+        Tag.user_id == user_id,
+        Tag.name.in_(names)
+    )
+    if mode == "all" and len(names) > 1:
+        matching = matching.group_by(entity_column).having(func.count() == len(names))
+    return id_column.in_(matching)
+
+def tag_counts_query(user_id: int):
+    """统计用户每个标签关联的笔记数和任务数（按关联表的 tag_id 索引计数），按使用次数倒序"""
+    note_count = select(func.count()).where(note_tags.c.tag_id == Tag.id).correlate(Tag).scalar_subquery()
+    task_count = select(func.count()).where(task_tags.c.tag_id == Tag.id).correlate(Tag).scalar_subquery()
+    return (
+        select(Tag.name, note_count.label("note_count"), task_count.label("task_count"))
+        .where(Tag.user_id == user_id)
+        .order_by((note_count + task_count).desc(), Tag.name)
+    )
+
+async def tag_counts(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    """单次查询获取用户的标签计数，未被使用的标签不返回"""
+    rows = (await db.execute(tag_counts_query(user_id))).all()
+    return [
+        {"name": name, "note_count": notes, "task_count": tasks, "total": notes + tasks}
+        for name, notes, tasks in rows
+        if notes or tasks
+    ]